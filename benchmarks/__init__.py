@@ -0,0 +1,4 @@
+"""Performance benchmarks for the app.
+
+Each module is a standalone script, e.g. ``python -m benchmarks.hashing``.
+"""
@@ -0,0 +1,77 @@
+"""Importing posts one request at a time versus through the bulk endpoint.
+
+    python -m benchmarks.bulk --posts 10000
+
+Both run through the test client against a SQLite file. ``--single`` posts
+are sent one request at a time, then all ``--posts`` in one bulk request;
+each reports posts per second.
+"""
+import argparse
+import base64
+import os
+import tempfile
+import time
+
+from .common import create_bench_app, report
+
+PASSWORD = "benchmark-password"
+
+
+def run(posts, single):
+    """Import ``posts`` posts with the bulk endpoint and ``single`` posts one by one."""
+    from flask_blog_api.extensions import db
+    from flask_blog_api.user.models import User
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    app = create_bench_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}", BCRYPT_LOG_ROUNDS=4)
+    try:
+        with app.app_context():
+            db.create_all()
+            User.create(username="bench", email="bench@example.com", password=PASSWORD)
+        basic = base64.b64encode(f"bench:{PASSWORD}".encode()).decode()
+        headers = {"Authorization": f"Basic {basic}"}
+        client = app.test_client()
+        items = [
+            {"title": f"title {i}", "content": f"content {i} " * 20, "active": True}
+            for i in range(posts)
+        ]
+        results = {}
+
+        started = time.perf_counter()
+        for item in items[:single]:
+            response = client.post("/api/v0/users/bench/posts", json=item, headers=headers)
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - started
+        results["single"] = {
+            "posts": single,
+            "seconds": elapsed,
+            "posts_per_second": single / elapsed,
+        }
+
+        started = time.perf_counter()
+        response = client.post("/api/v0/users/bench/posts/bulk", json=items, headers=headers)
+        assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - started
+        results["bulk"] = {
+            "posts": posts,
+            "seconds": elapsed,
+            "posts_per_second": posts / elapsed,
+        }
+        return results
+    finally:
+        os.unlink(path)
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10000, help="posts sent to the bulk endpoint")
+    parser.add_argument("--single", type=int, default=500, help="posts sent one request at a time")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    args = parser.parse_args()
+    report("bulk", run(args.posts, args.single), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import platform
+import statistics
+import sys
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Return the requested percentiles of ``samples`` (in the samples' unit)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{point}": None for point in points}
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, max(0, int(round(point / 100 * len(ordered))) - 1))
+        result[f"p{point}"] = ordered[index]
+    return result
+
+
+UNITS = {"ms": 1e3, "us": 1e6}
+
+
+def summarize(samples, unit="ms"):
+    """Summarize latency samples in seconds as milliseconds (or ``unit``: ``ms`` or ``us``)."""
+    scale = UNITS[unit]
+    summary = {"count": len(samples)}
+    if samples:
+        summary[f"mean_{unit}"] = statistics.mean(samples) * scale
+        summary[f"max_{unit}"] = max(samples) * scale
+    for key, value in percentiles(samples).items():
+        summary[f"{key}_{unit}"] = None if value is None else value * scale
+    return summary
+
+
+def report(name, results, as_json=False):
+    """Print benchmark ``results`` (a mapping of case name to summary dict)."""
+    if as_json:
+        print(json.dumps({"benchmark": name, "results": results}, sort_keys=True))
+        return
+    print(f"== {name}")
+    width = max([24] + [len(case) + 1 for case in results])
+    for case, summary in results.items():
+        fields = "  ".join(
+            f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in sorted(summary.items())
+        )
+        print(f"{case:<{width}} {fields}")
+
+
+def create_bench_app(**overrides):
+    """Create an app from ``benchmarks.settings`` with ``overrides`` applied."""
+    from flask_blog_api.app import create_app
+
+    from . import settings
+
+    config = {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+    config.update(overrides)
+    return create_app(type("BenchConfig", (), config))
+
+
+def environment():
+    """Describe the interpreter and libraries, so saved results are compared like for like."""
+    import flask
+    import sqlalchemy
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "flask": flask.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+    }
+
+
+def save_results(path, name, results):
+    """Write ``results`` with the environment to ``path`` as JSON, as a baseline for :func:`compare`."""
+    with open(path, "w") as fp:
+        json.dump({"benchmark": name, "environment": environment(), "results": results}, fp,
+                  indent=2, sort_keys=True)
+
+
+def compare(path, results, key="p50_ms", threshold=0.1):
+    """Compare ``results`` with the baseline saved at ``path`` on the ``key`` statistic.
+
+    Prints one line per case with the relative change, and returns the cases
+    that got slower by more than ``threshold`` (a fraction).
+    """
+    with open(path) as fp:
+        baseline = json.load(fp)
+    if baseline["environment"] != environment():
+        print(f"warning: baseline environment differs: {baseline['environment']}", file=sys.stderr)
+    regressions = []
+    print(f"== compared with {path} on {key}")
+    width = max([32] + [len(case) + 1 for case in results])
+    for case, summary in results.items():
+        before = baseline["results"].get(case, {}).get(key)
+        after = summary.get(key)
+        if not before or after is None:
+            print(f"{case:<{width}} {'new':>10}")
+            continue
+        change = after / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(case)
+            flag = "  REGRESSION"
+        print(f"{case:<{width}} {before:>10.4f} -> {after:>10.4f}  {change:+.1%}{flag}")
+    return regressions
@@ -0,0 +1,96 @@
+"""Tail latency of API reads while other requests are hashing passwords.
+
+Runs under gevent, like the production workers: a few greenlets authenticate
+with HTTP Basic (a bcrypt check per request, the credential cache is off)
+while the rest issue bearer-token reads, which never hash. With the
+``inline`` executor every bcrypt check stalls the hub and the reads queue
+behind it; with ``thread``/``process`` the reads keep flowing.
+
+    python -m benchmarks.hashing --modes inline thread --duration 5
+"""
+# isort:skip_file -- gevent must patch before anything imports socket/threading
+from gevent import monkey
+
+monkey.patch_all()  # noqa: E402 -- must run before anything imports socket/threading
+
+import argparse  # noqa: E402
+import base64  # noqa: E402
+import os  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+
+from .common import create_bench_app, report, summarize  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+
+def run(mode, rounds, logins, readers, duration):
+    """Run the mixed load against an app using the ``mode`` executor."""
+    from flask_blog_api.extensions import access_tokens, db
+    from flask_blog_api.user.models import User
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    app = create_bench_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}",
+        BCRYPT_LOG_ROUNDS=rounds,
+        BCRYPT_EXECUTOR=mode,
+        AUTH_CACHE_TTL=0,
+    )
+    try:
+        with app.app_context():
+            db.create_all()
+            user = User.create(username="bench", email="bench@example.com", password=PASSWORD)
+            token = access_tokens.issue(user.username, user.id, user.token_generation)
+        basic = base64.b64encode(f"bench:{PASSWORD}".encode()).decode()
+        headers = {
+            "login": {"Authorization": f"Basic {basic}"},
+            "read": {"Authorization": f"Bearer {token}"},
+        }
+        samples = {"login": [], "read": []}
+        launched = time.perf_counter()
+        deadline = launched + duration
+
+        def worker(kind):
+            client = app.test_client()
+            # The first request counts from launch and is always issued, so a
+            # client starved by the hub still reports how long it waited.
+            started = launched
+            while True:
+                response = client.get("/api/v0/users/bench", headers=headers[kind])
+                assert response.status_code == 200, response.status_code
+                samples[kind].append(time.perf_counter() - started)
+                # Stands in for the socket I/O that yields to the hub in production
+                gevent.sleep(0)
+                started = time.perf_counter()
+                if started >= deadline:
+                    break
+
+        greenlets = [gevent.spawn(worker, "login") for _ in range(logins)]
+        greenlets += [gevent.spawn(worker, "read") for _ in range(readers)]
+        gevent.joinall(greenlets, raise_error=True)
+        return {f"{mode}/{kind}": summarize(values) for kind, values in samples.items()}
+    finally:
+        os.unlink(path)
+
+
+def main():
+    """Parse arguments and run every requested executor mode."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--logins", type=int, default=2, help="concurrent Basic auth clients")
+    parser.add_argument("--readers", type=int, default=20, help="concurrent bearer clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per mode")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    args = parser.parse_args()
+    results = {}
+    for mode in args.modes:
+        results.update(run(mode, args.rounds, args.logins, args.readers, args.duration))
+    report("hashing", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Posts lookup cost versus table size, with and without the author indexes.
+
+    python -m benchmarks.indexes --sizes 1000 10000 100000
+
+For each table size the posts are spread over ``--authors`` users, and the
+two queries behind ``/users/<username>/posts`` (first page, ordered by
+``created_at, id``) and ``/users/<username>/posts/<id>`` are timed for
+random authors, first with the indexes and then after dropping them.
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import tempfile
+import time
+
+from .common import create_bench_app, report, summarize
+
+INDEXES = ("ix_posts_user_id_created_at_id", "ix_posts_user_id_id")
+
+
+def seed(db, posts, authors):
+    """Insert ``authors`` users and ``posts`` posts spread evenly over them."""
+    from flask_blog_api.user.models import Post, User
+
+    now = dt.datetime.utcnow()
+    db.session.execute(User.__table__.insert().values([
+        {"id": i + 1, "username": f"user{i}", "email": f"user{i}@example.com",
+         "created_at": now, "updated_at": now, "token_generation": 0}
+        for i in range(authors)
+    ]))
+    rows = [
+        {"user_id": i % authors + 1, "title": f"title {i}", "content": "content",
+         "created_at": now + dt.timedelta(seconds=i), "updated_at": now, "active": True}
+        for i in range(posts)
+    ]
+    for start in range(0, posts, 5000):
+        db.session.execute(Post.__table__.insert().values(rows[start:start + 5000]))
+    db.session.commit()
+
+
+def time_lookups(db, authors, lookups):
+    """Time the listing and single post queries for ``lookups`` random authors."""
+    from flask_blog_api.user.models import Post
+
+    listing, single = [], []
+    rng = random.Random(0)
+    for _ in range(lookups):
+        user_id = rng.randint(1, authors)
+        started = time.perf_counter()
+        posts = (
+            Post.query.filter_by(user_id=user_id)
+            .order_by(Post.created_at, Post.id)
+            .limit(50)
+            .all()
+        )
+        listing.append(time.perf_counter() - started)
+        post_id = posts[-1].id
+        db.session.expunge_all()
+        started = time.perf_counter()
+        Post.query.filter_by(user_id=user_id, id=post_id).first()
+        single.append(time.perf_counter() - started)
+        db.session.expunge_all()
+    return listing, single
+
+
+def run(sizes, authors, lookups):
+    """Benchmark every table size with and without the indexes."""
+    from flask_blog_api.extensions import db
+
+    results = {}
+    for size in sizes:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        app = create_bench_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}")
+        try:
+            with app.app_context():
+                db.create_all()
+                seed(db, size, authors)
+                for mode in ("indexed", "unindexed"):
+                    if mode == "unindexed":
+                        for name in INDEXES:
+                            db.session.execute(f"DROP INDEX {name}")
+                        db.session.commit()
+                    listing, single = time_lookups(db, authors, lookups)
+                    results[f"{mode}_{size}_listing"] = summarize(listing)
+                    results[f"{mode}_{size}_single"] = summarize(single)
+                db.session.remove()
+        finally:
+            os.unlink(path)
+    return results
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="posts table sizes")
+    parser.add_argument("--authors", type=int, default=100, help="users the posts are spread over")
+    parser.add_argument("--lookups", type=int, default=200, help="lookups timed per case")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    args = parser.parse_args()
+    report("indexes", run(args.sizes, args.authors, args.lookups), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
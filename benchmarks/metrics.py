@@ -0,0 +1,65 @@
+"""Per-request cost of the Prometheus instrumentation.
+
+    python -m benchmarks.metrics --requests 2000
+
+An authenticated ``GET /api/v0/users/<username>/posts`` (response cache off,
+so every request runs its SQL) is timed with ``METRICS_ENABLED`` off and on.
+The disabled case runs first, before the SQL listeners are installed.
+"""
+import argparse
+import base64
+import time
+
+from .common import create_bench_app, report, summarize
+
+PASSWORD = "benchpass"
+NO_CACHE = {"users": 0, "user": 0, "posts": 0, "post": 0, "search": 0}
+
+
+def time_requests(enabled, count, posts):
+    """Time ``count`` listing requests against an app with metrics ``enabled`` or not."""
+    from flask_blog_api.extensions import db
+    from flask_blog_api.user.models import Post, User
+
+    app = create_bench_app(METRICS_ENABLED=enabled, API_CACHE_TTL=NO_CACHE, BCRYPT_LOG_ROUNDS=4)
+    with app.app_context():
+        db.create_all()
+        user = User.create(username="bench", email="bench@example.com", password=PASSWORD)
+        db.session.add_all([Post(user=user, title=f"title {i}", content="content") for i in range(posts)])
+        db.session.commit()
+    client = app.test_client()
+    credentials = base64.b64encode(f"bench:{PASSWORD}".encode()).decode()
+    headers = {"Authorization": f"Basic {credentials}"}
+    url = "/api/v0/users/bench/posts"
+    client.get(url, headers=headers)
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        client.get(url, headers=headers)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run(count, posts):
+    """Compare request latency without and with the instrumentation."""
+    results = {}
+    for name, enabled in (("disabled", False), ("enabled", True)):
+        results[name] = summarize(time_requests(enabled, count, posts))
+    results["overhead"] = {
+        "mean_us": (results["enabled"]["mean_ms"] - results["disabled"]["mean_ms"]) * 1000,
+    }
+    return results
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests timed per case")
+    parser.add_argument("--posts", type=int, default=20, help="posts in the listing")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    args = parser.parse_args()
+    report("metrics", run(args.requests, args.posts), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
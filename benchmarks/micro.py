@@ -0,0 +1,281 @@
+"""Microbenchmarks of the model, serialization, parsing, auth and route hot paths.
+
+    python -m benchmarks.micro --save baseline.json
+    python -m benchmarks.micro --compare baseline.json
+
+Runs offline against a seeded SQLite file. Every case reports per-call
+latency in microseconds. ``--save`` writes the results (with the Python and
+library versions) as a baseline, and ``--compare`` prints the change of each
+case's median against one and exits with status 1 if any got slower than
+``--threshold``. ``--only`` selects cases by glob pattern, e.g.
+``--only 'route.*'``.
+
+Cases:
+
+* ``as_dict.*`` - ``User.as_dict`` and ``Post.as_dict`` (author loaded)
+* ``body.*`` - validating the JSON body of each resource method with its
+  schema, on an already decoded body
+* ``password.*`` - ``set_password`` / ``check_password`` at ``--rounds``
+* ``lookup.*`` - ``User.get_by_id`` and ``filter_by(username=)`` with an
+  empty identity map
+* ``route.*`` - every ``/api/v0`` route through the test client, with HTTP
+  Basic auth served from the credential cache and the response cache off
+"""
+import argparse
+import base64
+import datetime as dt
+import fnmatch
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+from . import settings
+from .common import compare, create_bench_app, report, save_results, summarize
+
+PASSWORD = "benchmark-password"
+NO_CACHE = {"users": 0, "user": 0, "posts": 0, "post": 0, "search": 0}
+
+
+def measure(fn, repeat, number=1, setup=None):
+    """Return ``repeat`` samples of the mean time of ``number`` calls to ``fn``.
+
+    ``setup`` runs untimed before each sample.
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return samples
+
+
+def seed(db, users, posts):
+    """Insert ``users`` users and ``posts`` posts spread over them; return the benchmark user."""
+    from flask_blog_api.user.models import Post, User
+
+    now = dt.datetime.utcnow()
+    db.session.execute(User.__table__.insert().values([
+        {"username": f"user{i}", "email": f"user{i}@example.com", "first_name": "User", "last_name": str(i),
+         "created_at": now, "updated_at": now, "token_generation": 0, "active": True, "is_admin": False}
+        for i in range(users)
+    ]))
+    rows = [
+        {"user_id": i % users + 1, "title": f"title {i}", "content": f"content of post {i} " * 5,
+         "created_at": now + dt.timedelta(seconds=i), "updated_at": now, "active": True}
+        for i in range(posts)
+    ]
+    for start in range(0, posts, 5000):
+        db.session.execute(Post.__table__.insert().values(rows[start:start + 5000]))
+    db.session.commit()
+    return User.create(username="bench", email="bench@example.com", password=PASSWORD,
+                       first_name="Bench", last_name="Mark")
+
+
+def model_cases(db, user, repeat):
+    """Serialization and lookup cases."""
+    from flask_blog_api.user.models import Post, User
+
+    post = Post.query.filter_by(user_id=user.id).first() or Post.create(user=user, title="t", content="c")
+    post.as_dict()  # load the author before timing
+
+    def clear():
+        db.session.expunge_all()
+
+    yield "as_dict.user", lambda: measure(user.as_dict, repeat, number=100)
+    yield "as_dict.post", lambda: measure(post.as_dict, repeat, number=100)
+    user_id, username = user.id, user.username
+    yield "lookup.get_by_id", lambda: measure(lambda: User.get_by_id(user_id), repeat, setup=clear)
+    yield "lookup.filter_by_username", lambda: measure(
+        lambda: User.query.filter_by(username=username).first(), repeat, setup=clear
+    )
+
+
+def body_cases(app, repeat):
+    """Body validation cases, one per resource method that reads a body."""
+    from flask_blog_api.resources import schemas
+
+    bodies = {
+        "body.users_post": (schemas.USER_CREATE, {
+            "username": "new", "email": "new@example.com", "password": PASSWORD,
+            "first_name": "New", "last_name": "User", "is_admin": False,
+        }),
+        "body.user_put": (schemas.USER_UPDATE, {"email": "changed@example.com"}),
+        "body.posts_post": (schemas.POST_CREATE, {"title": "title", "content": "content", "active": True}),
+        "body.post_put": (schemas.POST_UPDATE, {"title": "new title"}),
+    }
+    for name, (schema, body) in bodies.items():
+        def run(schema=schema, body=body):
+            with app.test_request_context(method="POST", json=body):
+                return measure(schema.load, repeat, number=10)
+
+        yield name, run
+
+
+def password_cases(user, rounds, repeat):
+    """Password hashing cases at the configured bcrypt rounds."""
+    from flask_blog_api.user.models import User
+
+    scratch = User(username="scratch", email="scratch@example.com")
+    count = max(1, repeat // 20)
+    yield f"password.set_{rounds}_rounds", lambda: measure(lambda: scratch.set_password(PASSWORD), count)
+    yield f"password.check_{rounds}_rounds", lambda: measure(lambda: user.check_password(PASSWORD), count)
+
+
+def route_cases(app, db, user, repeat):
+    """One case per ``/api/v0`` route and method."""
+    from flask_blog_api.user.models import Post, User
+
+    client = app.test_client()
+    basic = base64.b64encode(f"{user.username}:{PASSWORD}".encode()).decode()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Basic {basic}"
+    # Pay for the bcrypt check once; later requests hit the credential cache
+    client.get("/api/v0/users?limit=1")
+
+    # PUT /users/<username> drops the cached credentials of the account it
+    # updates, so it runs as its own account whose cache is re-warmed untimed
+    editor = User.create(username="bench-put", email="bench-put@example.com", password=PASSWORD,
+                         first_name="Bench", last_name="Put")
+    editor_name = editor.username
+    editor_basic = base64.b64encode(f"{editor_name}:{PASSWORD}".encode()).decode()
+    editor_headers = {"Authorization": f"Basic {editor_basic}"}
+
+    name, user_id = user.username, user.id
+    post_id = Post.query.filter_by(user_id=user.id).first().id
+    counter = itertools.count()
+    victims = []
+    writes = max(1, repeat // 20)
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    def call(method, url, **kwargs):
+        return lambda: check(client.open(url, method=method, **kwargs))
+
+    def warm_editor():
+        check(client.get(f"/api/v0/users/{editor_name}", headers=editor_headers))
+
+    def new_user():
+        victims.append(f"victim{next(counter)}")
+        db.session.execute(User.__table__.insert().values(
+            username=victims[-1], email=f"{victims[-1]}@example.com", created_at=dt.datetime.utcnow(),
+            updated_at=dt.datetime.utcnow(), token_generation=0,
+        ))
+        db.session.commit()
+
+    def new_post():
+        now = dt.datetime.utcnow()
+        result = db.session.execute(Post.__table__.insert().values(
+            user_id=user_id, title="victim", content="victim", created_at=now, updated_at=now, active=True,
+        ))
+        victims.append(result.inserted_primary_key[0])
+        db.session.commit()
+
+    def fresh_user():
+        return {"username": f"created{next(counter)}", "email": f"created{next(counter)}@example.com",
+                "password": PASSWORD, "first_name": "Created", "last_name": "User", "is_admin": False}
+
+    yield "route.GET /users", lambda: measure(call("GET", "/api/v0/users"), repeat)
+    yield "route.POST /users", lambda: measure(lambda: check(client.post("/api/v0/users", json=fresh_user())),
+                                               writes)
+    yield "route.POST /bulk/users", lambda: measure(
+        lambda: check(client.post("/api/v0/bulk/users", json=[fresh_user(), fresh_user()])), writes
+    )
+    yield "route.GET /users/<username>", lambda: measure(call("GET", f"/api/v0/users/{name}"), repeat)
+    yield "route.PUT /users/<username>", lambda: measure(
+        call("PUT", f"/api/v0/users/{editor_name}", json={"first_name": "Bench"}, headers=editor_headers),
+        repeat, setup=warm_editor,
+    )
+    yield "route.DELETE /users/<username>", lambda: measure(
+        lambda: check(client.delete(f"/api/v0/users/{victims.pop()}")), repeat, setup=new_user
+    )
+    yield "route.GET /users/<username>/posts", lambda: measure(
+        call("GET", f"/api/v0/users/{name}/posts"), repeat
+    )
+    yield "route.POST /users/<username>/posts", lambda: measure(
+        call("POST", f"/api/v0/users/{name}/posts", json={"title": "t", "content": "c", "active": True}), repeat
+    )
+    yield "route.POST /users/<username>/posts/bulk", lambda: measure(
+        call("POST", f"/api/v0/users/{name}/posts/bulk",
+             json=[{"title": "t", "content": "c", "active": True}] * 10), repeat
+    )
+    yield "route.GET /users/<username>/posts/<id>", lambda: measure(
+        call("GET", f"/api/v0/users/{name}/posts/{post_id}"), repeat
+    )
+    yield "route.PUT /users/<username>/posts/<id>", lambda: measure(
+        call("PUT", f"/api/v0/users/{name}/posts/{post_id}", json={"title": "edited"}), repeat
+    )
+    yield "route.DELETE /users/<username>/posts/<id>", lambda: measure(
+        lambda: check(client.delete(f"/api/v0/users/{name}/posts/{victims.pop()}")), repeat, setup=new_post
+    )
+    yield "route.GET /posts/search", lambda: measure(call("GET", "/api/v0/posts/search?q=content"), repeat)
+    yield "route.POST /token", lambda: measure(call("POST", "/api/v0/token"), repeat)
+    # Revoking tokens does not affect Basic auth
+    yield "route.DELETE /token", lambda: measure(call("DELETE", "/api/v0/token"), repeat)
+
+
+def run(patterns, users, posts, rounds, repeat):
+    """Seed a database and run every case matching ``patterns``."""
+    from flask_blog_api.extensions import db
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    app = create_bench_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}",
+        BCRYPT_LOG_ROUNDS=rounds,
+        API_CACHE_TTL=NO_CACHE,
+        AUTH_CACHE_TTL=24 * 3600,
+        METRICS_ENABLED=False,
+    )
+    results = {}
+    try:
+        with app.app_context():
+            db.create_all()
+            user = seed(db, users, posts)
+            cases = itertools.chain(
+                model_cases(db, user, repeat),
+                body_cases(app, repeat),
+                password_cases(user, rounds, repeat),
+                route_cases(app, db, user, repeat),
+            )
+            for name, case in cases:
+                if patterns and not any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+                    continue
+                results[name] = summarize(case(), unit="us")
+                # Re-attach the benchmark user after cases that cleared the session
+                user = db.session.merge(user)
+            db.session.remove()
+            db.drop_all()
+    finally:
+        os.unlink(path)
+    return results
+
+
+def main():
+    """Parse arguments, run the cases and save or compare the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="*", default=[], help="glob patterns of the cases to run")
+    parser.add_argument("--users", type=int, default=1000, help="seeded users")
+    parser.add_argument("--posts", type=int, default=10000, help="seeded posts")
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_LOG_ROUNDS, help="bcrypt log rounds")
+    parser.add_argument("--repeat", type=int, default=200, help="samples per case")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--save", metavar="PATH", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+    results = run(args.only, args.users, args.posts, args.rounds, args.repeat)
+    report("micro", results, as_json=args.json)
+    if args.save:
+        save_results(args.save, "micro", results)
+    if args.compare and compare(args.compare, results, key="p50_us", threshold=args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
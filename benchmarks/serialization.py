@@ -0,0 +1,80 @@
+"""Encoding a page of posts: ``as_dict`` + ``json.dumps`` versus the API encoder.
+
+    python -m benchmarks.serialization --posts 200 --repeat 500
+
+Cases:
+
+* ``stdlib`` - the previous path: ``as_dict`` for every row and ``json.dumps``
+* ``<backend>_cold`` - ``as_dict`` for every row, encoded by the backend
+* ``<backend>_fragments`` - cached per-row fragments spliced into the page
+"""
+import argparse
+import datetime as dt
+import json
+import time
+
+from .common import create_bench_app, report, summarize
+
+
+def make_posts(count):
+    """Build ``count`` transient posts by a single author."""
+    from flask_blog_api.user.models import Post, User
+
+    now = dt.datetime.utcnow()
+    user = User(username="bench", email="bench@example.com", first_name="Bench", last_name="Mark")
+    user.id, user.created_at, user.updated_at = 1, now, now
+    posts = []
+    for i in range(count):
+        post = Post(title=f"title {i}", content=f"content {i} " * 20, user=user)
+        post.id, post.user_id, post.created_at, post.updated_at = i + 1, user.id, now, now
+        posts.append(post)
+    return posts
+
+
+def timed(fn, repeat):
+    """Call ``fn`` ``repeat`` times and return the latency samples."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run(count, repeat):
+    """Time every case on a page of ``count`` posts."""
+    from flask_blog_api.serialization import BACKENDS, JSONEncoder
+
+    posts = make_posts(count)
+    results = {
+        "stdlib": summarize(timed(
+            lambda: json.dumps({"posts": [post.as_dict() for post in posts], "next": None}), repeat
+        )),
+    }
+    for backend in sorted(BACKENDS):
+        app = create_bench_app(API_JSON_BACKEND=backend, API_FRAGMENT_CACHE_SIZE=0)
+        cold = JSONEncoder(app)
+        results[f"{backend}_cold"] = summarize(timed(
+            lambda: cold.dumps({"posts": [post.as_dict() for post in posts], "next": None}), repeat
+        ))
+        app = create_bench_app(API_JSON_BACKEND=backend, API_FRAGMENT_CACHE_SIZE=count)
+        warm = JSONEncoder(app)
+        results[f"{backend}_fragments"] = summarize(timed(
+            lambda: warm.dumps({"posts": [warm.fragment(post) for post in posts], "next": None}),
+            repeat,
+        ))
+    return results
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=200, help="posts per encoded page")
+    parser.add_argument("--repeat", type=int, default=500, help="pages encoded per case")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    args = parser.parse_args()
+    report("serialization", run(args.posts, args.repeat), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Settings module for benchmark apps."""
+ENV = "production"
+TESTING = False
+SQLALCHEMY_DATABASE_URI = "sqlite://"
+SECRET_KEY = "not-so-secret-in-benchmarks"
+BCRYPT_LOG_ROUNDS = 12
+DEBUG_TB_ENABLED = False
+CACHE_TYPE = "simple"
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+WTF_CSRF_ENABLED = False
+SINGLE_PROCESS = True  # Per-process caches are consistent
+API_CACHE_TTL = {"users": 30, "user": 60, "posts": 30, "post": 60, "search": 30}
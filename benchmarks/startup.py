@@ -0,0 +1,48 @@
+"""Cold start of a worker: importing the app and running ``create_app``.
+
+    python -m benchmarks.startup --runs 20 --save startup.json
+    python -m benchmarks.startup --compare startup.json
+
+Each run starts a new interpreter, as gunicorn does for every new or
+recycled (``--max-requests``) worker, once per ``APP_PROFILE``. ``flask
+importtime`` shows where the time goes.
+"""
+import argparse
+import sys
+
+from .common import compare, report, save_results, summarize
+
+ENV = {
+    "DATABASE_URL": "sqlite://",
+    "SECRET_KEY": "not-so-secret-in-benchmarks",
+    "SEND_FILE_MAX_AGE_DEFAULT": "0",
+    "FLASK_ENV": "production",
+}
+
+
+def main():
+    """Time ``--runs`` cold starts of each profile."""
+    from flask_blog_api.importtime import measure
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--save", metavar="PATH", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    for profile in ("full", "api"):
+        measure(profile, ENV, importtime=False)  # Warm the OS file cache
+        samples = [measure(profile, ENV, importtime=False)["seconds"] for _ in range(args.runs)]
+        results[f"APP_PROFILE={profile}"] = summarize(samples)
+    report("startup", results, as_json=args.json)
+    if args.save:
+        save_results(args.save, "startup", results)
+    if args.compare and compare(args.compare, results, threshold=args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
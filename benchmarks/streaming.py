@@ -0,0 +1,125 @@
+"""Peak memory of a buffered versus a streamed post listing.
+
+    python -m benchmarks.streaming --posts 100000
+
+Each mode runs in a fresh interpreter so that its peak RSS is not hidden by
+the other one; the reported ``rss_growth_mb`` is the peak RSS after the
+request minus the peak RSS just before it.
+"""
+import argparse
+import base64
+import datetime as dt
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import create_bench_app, report
+
+PASSWORD = "benchmark-password"
+MODES = ("buffered", "streamed")
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _app(path, posts):
+    return create_bench_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}",
+        BCRYPT_LOG_ROUNDS=4,
+        API_MAX_PAGE_SIZE=posts,
+        API_CACHE_TTL={"users": 0, "user": 0, "posts": 0, "post": 0},
+    )
+
+
+def seed(path, posts):
+    """Create the benchmark user and ``posts`` posts in the SQLite file at ``path``."""
+    from flask_blog_api.extensions import db
+    from flask_blog_api.user.models import Post, User
+
+    app = _app(path, posts)
+    with app.app_context():
+        db.create_all()
+        user = User.create(username="bench", email="bench@example.com", password=PASSWORD)
+        now = dt.datetime.utcnow()
+        rows = [
+            {"title": f"title {i}", "content": f"content {i} " * 50, "active": True,
+             "user_id": user.id, "created_at": now, "updated_at": now}
+            for i in range(posts)
+        ]
+        for start in range(0, posts, 5000):
+            db.session.execute(Post.__table__.insert().values(rows[start:start + 5000]))
+        db.session.commit()
+
+
+def measure(path, posts, mode):
+    """Fetch the whole listing once in ``mode`` and return its RSS growth and timing."""
+    app = _app(path, posts)
+    basic = base64.b64encode(f"bench:{PASSWORD}".encode()).decode()
+    headers = {"Authorization": f"Basic {basic}"}
+    query = {"stream": 1} if mode == "streamed" else {"limit": posts}
+    client = app.test_client()
+    # Warm up imports, the connection and the credential cache
+    client.get("/api/v0/users/bench", headers=headers)
+
+    before = _peak_rss_mb()
+    started = time.perf_counter()
+    response = client.get(
+        "/api/v0/users/bench/posts", query_string=query, headers=headers, buffered=False
+    )
+    first_byte = time.perf_counter() - started
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200, response.status_code
+    return {
+        "posts": posts,
+        "bytes": size,
+        "first_byte_ms": first_byte * 1000,
+        "seconds": elapsed,
+        "rss_growth_mb": _peak_rss_mb() - before,
+    }
+
+
+def run(posts):
+    """Seed ``posts`` posts and measure every mode in its own subprocess."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        seed(path, posts)
+        results = {}
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.streaming", "--posts", str(posts),
+                 "--measure", mode, "--db", path],
+                check=True, stdout=subprocess.PIPE, universal_newlines=True,
+            ).stdout
+            results[mode] = json.loads(output.splitlines()[-1])
+        return results
+    finally:
+        os.unlink(path)
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100000, help="posts in the listing")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(args.db, args.posts, args.measure)))
+        return
+    report("streaming", run(args.posts), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Write throughput with a commit per CRUD call versus one commit per unit of work.
+
+Each simulated request creates a user, a few posts and then updates the user,
+against a file-backed SQLite database so that every commit pays for an fsync.
+
+    python -m benchmarks.unit_of_work --requests 200
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import nullcontext
+
+from .common import create_bench_app, report
+
+
+def run(requests, posts_per_request):
+    """Time ``requests`` simulated requests with and without a unit of work."""
+    from flask_blog_api.database import unit_of_work
+    from flask_blog_api.extensions import db
+    from flask_blog_api.user.models import Post, User
+
+    results = {}
+    for mode in ("commit_per_call", "unit_of_work"):
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        app = create_bench_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{path}")
+        try:
+            with app.app_context():
+                db.create_all()
+                started = time.perf_counter()
+                for i in range(requests):
+                    block = unit_of_work() if mode == "unit_of_work" else nullcontext()
+                    with block:
+                        user = User.create(username=f"user{i}", email=f"user{i}@example.com")
+                        for j in range(posts_per_request):
+                            Post.create(user=user, title=f"title{j}", content="content")
+                        user.update(first_name="Bench")
+                elapsed = time.perf_counter() - started
+                db.session.remove()
+            results[mode] = {
+                "requests": requests,
+                "writes_per_request": posts_per_request + 2,
+                "seconds": elapsed,
+                "requests_per_second": requests / elapsed,
+            }
+        finally:
+            os.unlink(path)
+    return results
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--posts-per-request", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    args = parser.parse_args()
+    report("unit_of_work", run(args.requests, args.posts_per_request), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Per-request body parsing: a ``reqparse`` parser built per request versus the precompiled schemas.
+
+    python -m benchmarks.validation --repeat 2000
+
+Cases, for the body of each resource method that reads one:
+
+* ``reqparse.<method>`` - the previous path: a ``RequestParser`` built with
+  an ``add_argument`` per field (defaults from the row for ``user_put``),
+  then ``parse_args(strict=True)``
+* ``schema.<method>`` - ``load`` of the method's precompiled schema
+
+Bodies are sent as JSON, and ``posts_post_form`` as a form. Latencies are in
+microseconds per parsed body.
+"""
+import argparse
+import time
+
+from flask_restful import reqparse
+
+from .common import create_bench_app, report, summarize
+
+USER_BODY = {
+    "username": "new", "email": "new@example.com", "password": "password",
+    "first_name": "New", "last_name": "User", "is_admin": False,
+}
+POST_BODY = {"title": "title", "content": "content", "active": True}
+
+
+def user_create_parser():
+    """The parser ``POST /users`` used to build."""
+    parser = reqparse.RequestParser()
+    parser.add_argument('username', type=str, required=True)
+    parser.add_argument('email', type=str, required=True)
+    parser.add_argument('password', type=str, required=True)
+    parser.add_argument('first_name', type=str, required=True)
+    parser.add_argument('last_name', type=str, required=True)
+    parser.add_argument('is_admin', type=bool, required=True)
+    return parser
+
+
+def user_update_parser(user):
+    """The parser ``PUT /users/<username>`` used to build."""
+    parser = reqparse.RequestParser()
+    parser.add_argument('username', type=str, default=user.username)
+    parser.add_argument('email', type=str, default=user.email)
+    parser.add_argument('password', type=str, default=None)
+    parser.add_argument('first_name', type=str, default=user.first_name)
+    parser.add_argument('last_name', type=str, default=user.last_name)
+    parser.add_argument('is_admin', type=bool, default=user.is_admin)
+    return parser
+
+
+def post_parser(required):
+    """The parser ``POST`` (``required``) or ``PUT`` of a post used to build."""
+    parser = reqparse.RequestParser()
+    parser.add_argument('title', type=str, required=required)
+    parser.add_argument('content', type=str, required=required)
+    parser.add_argument('active', type=bool, required=required)
+    return parser
+
+
+def timed(fn, repeat, number=10):
+    """Return ``repeat`` samples of the mean time of ``number`` calls to ``fn``."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return samples
+
+
+def run(repeat):
+    """Time both paths on every body."""
+    from flask_blog_api.resources import schemas
+    from flask_blog_api.user.models import User
+
+    app = create_bench_app()
+    user = User(username="bench", email="bench@example.com", first_name="Bench", last_name="Mark", is_admin=False)
+    cases = {
+        "users_post": (user_create_parser, schemas.USER_CREATE, {"json": USER_BODY}),
+        "user_put": (lambda: user_update_parser(user), schemas.USER_UPDATE, {"json": {"email": "new@example.com"}}),
+        "posts_post": (lambda: post_parser(True), schemas.POST_CREATE, {"json": POST_BODY}),
+        "posts_post_form": (lambda: post_parser(True), schemas.POST_CREATE,
+                            {"data": dict(POST_BODY, active="true")}),
+        "post_put": (lambda: post_parser(False), schemas.POST_UPDATE, {"json": {"title": "new title"}}),
+    }
+    results = {}
+    for name, (make_parser, schema, body) in cases.items():
+        with app.test_request_context(method="POST", **body):
+            results[f"reqparse.{name}"] = summarize(
+                timed(lambda: make_parser().parse_args(strict=True), repeat), unit="us"
+            )
+            results[f"schema.{name}"] = summarize(timed(schema.load, repeat), unit="us")
+    return results
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000, help="samples per case")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    args = parser.parse_args()
+    report("validation", run(args.repeat), as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,22 +3,38 @@
 import logging
 import sys
 
-from flask import Flask, render_template, jsonify, make_response
-from flask_blog_api import commands, public, user, resources
+from flask import Flask, g, render_template, jsonify, make_response
+from flask_blog_api import commands, user, resources, search
+from flask_blog_api.database import begin_unit_of_work, end_unit_of_work
 from flask_restful import Api
-from flask_httpauth import HTTPBasicAuth
+from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth, MultiAuth
 from flask_blog_api.extensions import (
+    access_tokens,
     bcrypt,
     cache,
+    compressor,
+    credential_cache,
     csrf_protect,
+    database_pool,
     db,
     debug_toolbar,
     flask_static_digest,
+    json_encoder,
     login_manager,
+    metrics,
     migrate,
+    password_hasher,
+    replica_router,
+    request_budget,
+    response_cache,
 )
 
 
+UNAUTHORIZED_MESSAGE = "Unauthorized Access: Please make an account at http://0.0.0.0:5000/register/"
+#: ``APP_PROFILE`` values: the API and the HTML site, or the API alone
+PROFILES = ("full", "api")
+
+
 def create_app(config_object="flask_blog_api.settings"):
     """Create application factory, as explained here: http://flask.pocoo.org/docs/patterns/appfactories/.
 
@@ -26,7 +42,11 @@ def create_app(config_object="flask_blog_api.settings"):
     """
     app = Flask(__name__.split(".")[0])
     app.config.from_object(config_object)
+    app.config.setdefault("APP_PROFILE", "full")
+    if app.config["APP_PROFILE"] not in PROFILES:
+        raise ValueError(f"APP_PROFILE must be one of {PROFILES}, not {app.config['APP_PROFILE']!r}")
     register_extensions(app)
+    register_unit_of_work(app)
     register_api(app)
     register_blueprints(app)
     register_errorhandlers(app)
@@ -39,54 +59,143 @@ def create_app(config_object="flask_blog_api.settings"):
 def register_extensions(app):
     """Register Flask extensions."""
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
     cache.init_app(app)
+    response_cache.init_app(app)
+    # Registered first so their after_request hooks run last, on the final body
+    metrics.init_app(app)
+    compressor.init_app(app)
+    request_budget.init_app(app)
+    credential_cache.init_app(app)
+    access_tokens.init_app(app)
+    json_encoder.init_app(app)
+    database_pool.init_app(app)
+    replica_router.init_app(app)
+    search.init_app(app)
     db.init_app(app)
+    if app.config["APP_PROFILE"] == "full":
+        register_site_extensions(app)
+    return None
+
+
+def register_site_extensions(app):
+    """Register the extensions used by the HTML site, the toolbar and migrations.
+
+    Each is imported here, on first use.
+    """
     csrf_protect.init_app(app)
     login_manager.init_app(app)
-    debug_toolbar.init_app(app)
-    migrate.init_app(app, db)
+    if app.config.get("DEBUG_TB_ENABLED", app.debug):
+        debug_toolbar.init_app(app)
+    migrate.init_app(app, db, include_object=search.include_object)
     flask_static_digest.init_app(app)
     return None
 
 
+def register_unit_of_work(app):
+    """Commit each request's writes once, when DB_UNIT_OF_WORK is enabled."""
+    app.config.setdefault("DB_UNIT_OF_WORK", False)
+
+    @app.before_request
+    def begin_request_unit_of_work():
+        if app.config["DB_UNIT_OF_WORK"]:
+            begin_unit_of_work()
+            g.unit_of_work = True
+
+    @app.after_request
+    def commit_request_unit_of_work(response):
+        if g.pop("unit_of_work", False):
+            end_unit_of_work(commit=response.status_code < 400)
+        return response
+
+    @app.teardown_request
+    def rollback_request_unit_of_work(exc):
+        # Only still set if the view raised before after_request ran
+        if g.pop("unit_of_work", False):
+            end_unit_of_work(commit=False)
+
+    return None
+
+
 def register_blueprints(app):
-    """Register Flask blueprints."""
-    app.register_blueprint(public.views.blueprint)
-    app.register_blueprint(user.views.blueprint)
+    """Register Flask blueprints; the HTML site's only in the full profile."""
+    if app.config["APP_PROFILE"] == "full":
+        from flask_blog_api.public import views as public_views
+        from flask_blog_api.user import views as user_views
+
+        app.register_blueprint(public_views.blueprint)
+        app.register_blueprint(user_views.blueprint)
     app.register_blueprint(resources.api.blueprint)
     return None
 
 
 def register_api(app):
     """Register REST API endpoints"""
-    auth = HTTPBasicAuth()
+    basic_auth = HTTPBasicAuth()
+    token_auth = HTTPTokenAuth(scheme="Bearer")
+    auth = MultiAuth(basic_auth, token_auth)
 
-    @auth.verify_password
+    @basic_auth.verify_password
     def verify_password(username, password):
+        if credential_cache.check(username, password):
+            g.api_username = username
+            return True
         verify_user = user.models.User.query.filter_by(username=username).first()
-        if not verify_user:
+        if not verify_user or not verify_user.check_password(password):
             return False
-        return verify_user.check_password(password)
+        credential_cache.remember(username, password)
+        g.api_username = username
+        return True
+
+    @token_auth.verify_token
+    def verify_token(token):
+        username = access_tokens.verify(token)
+        if username is None:
+            return False
+        g.api_username = username
+        return True
+
+    @access_tokens.account_loader
+    def load_token_account(username):
+        row = (
+            user.models.User.query.with_entities(user.models.User.id, user.models.User.token_generation)
+            .filter_by(username=username)
+            .first()
+        )
+        return row and (row.id, row.token_generation)
 
-    @auth.error_handler
     def unauthorized():
-        return make_response(jsonify(message='Unauthorized Access: Please make an account at http://0.0.0.0:5000/register/', status=403), 403)
-
-    rest_api = Api(app, prefix="/api/v0", decorators=[csrf_protect.exempt, auth.login_required])
+        return make_response(jsonify(message=UNAUTHORIZED_MESSAGE, status=403), 403)
+
+    basic_auth.error_handler(unauthorized)
+    token_auth.error_handler(unauthorized)
+
+    decorators = [auth.login_required]
+    if app.config["APP_PROFILE"] == "full":
+        decorators.insert(0, csrf_protect.exempt)
+    rest_api = Api(app, prefix="/api/v0", decorators=decorators)
+    rest_api.representation("application/json")(json_encoder.output_json)
+    rest_api.add_resource(resources.api.Token, '/token')
+    rest_api.add_resource(resources.api.UsersBulk, '/bulk/users')
+    rest_api.add_resource(resources.api.PostSearch, '/posts/search')
     rest_api.add_resource(resources.api.Users, '/users')
     rest_api.add_resource(resources.api.User,  '/users/<string:username>')
     rest_api.add_resource(resources.api.Posts, '/users/<string:username>/posts')
+    rest_api.add_resource(resources.api.PostsBulk, '/users/<string:username>/posts/bulk')
     rest_api.add_resource(resources.api.Post,  '/users/<string:username>/posts/<int:id>')
     return None
 
 
 def register_errorhandlers(app):
-    """Register error handlers."""
+    """Register error handlers; the API profile answers errors in JSON."""
 
     def render_error(error):
         """Render error template."""
         # If a HTTPException, pull the `code` attribute; default to 500
         error_code = getattr(error, "code", 500)
+        if app.config["APP_PROFILE"] == "api":
+            message = getattr(error, "description", "Internal Server Error")
+            return jsonify(message=message, status=error_code), error_code
         return render_template(f"{error_code}.html"), error_code
 
     for errcode in [401, 404, 500]:
@@ -99,7 +208,14 @@ def register_shellcontext(app):
 
     def shell_context():
         """Shell context objects."""
-        return {"db": db, "User": user.models.User}
+        return {
+            "db": db,
+            "User": user.models.User,
+            "credential_cache": credential_cache,
+            "response_cache": response_cache,
+            "json_encoder": json_encoder,
+            "database_pool": database_pool,
+        }
 
     app.shell_context_processor(shell_context)
 
@@ -108,6 +224,9 @@ def register_commands(app):
     """Register Click commands."""
     app.cli.add_command(commands.test)
     app.cli.add_command(commands.lint)
+    app.cli.add_command(commands.rebuild_search_index)
+    app.cli.add_command(commands.loadtest)
+    app.cli.add_command(commands.importtime)
 
 
 def configure_logger(app):
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""ASGI entry point for the REST API.
+
+    gunicorn 'flask_blog_api.asgi:create_asgi_app()' -k uvicorn.workers.UvicornWorker -w 4
+    uvicorn --factory flask_blog_api.asgi:create_asgi_app
+
+The ``GET`` routes of ``/api/v0`` that only read rows (the user and post
+listings and lookups) are served by async handlers on an
+:class:`~flask_blog_api.asyncdb.AsyncDatabase`, reusing the ``User`` and
+``Post`` models, the sparse fieldsets, the keyset cursors and the JSON
+encoder's fragments, so the bodies are the ones the Flask resources return.
+Every other request (writes, tokens, search, streamed listings and the HTML
+site) is passed to the Flask app, which runs on ``ASGI_WSGI_THREADS``
+threads.
+
+Concurrency is explicit:
+
+* ``ASGI_MAX_CONCURRENCY`` async requests run at once per worker. Others
+  queue for up to ``ASGI_QUEUE_TIMEOUT`` seconds, then get a ``503`` with a
+  ``Retry-After`` header.
+* ``ASGI_DB_POOL_SIZE`` database connections per worker.
+* ``ASGI_DATABASE_URL`` defaults to ``SQLALCHEMY_DATABASE_URI``.
+
+The async reads get the ``ETag`` and ``Last-Modified`` validators of
+:func:`~flask_blog_api.resources.conditional.conditional`, from the same
+probes, and answer ``If-None-Match`` / ``If-Modified-Since`` with a ``304``.
+They are recorded in the request metrics under the same endpoint names as the
+Flask resources. They do not go through the response cache, compression or
+replica routing, which are Flask hooks: they always read
+``ASGI_DATABASE_URL`` and send uncompressed bodies.
+
+The ASGI dependencies are in ``requirements/asgi.txt`` and are imported when
+the app is created, so this module imports without them.
+"""
+import asyncio
+import base64
+import binascii
+import contextvars
+import re
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import http_date, parse_date, parse_etags
+from werkzeug.urls import url_decode
+
+from flask_blog_api.app import UNAUTHORIZED_MESSAGE, create_app
+from flask_blog_api.asyncdb import AsyncDatabase
+from flask_blog_api.extensions import (
+    access_tokens,
+    credential_cache,
+    json_encoder,
+    password_hasher,
+)
+from flask_blog_api.metrics import RequestStats, async_request_stats
+from flask_blog_api.resources.conditional import (
+    not_modified,
+    probe_statement,
+    validators,
+)
+from flask_blog_api.resources.fields import field_columns, requested_fields, wants
+from flask_blog_api.resources.pagination import keyset_condition, page_args, split_page
+from flask_blog_api.user.models import Post, User
+
+PREFIX = "/api/v0"
+JSON_HEADERS = [(b"content-type", b"application/json")]
+
+
+def build(model, values):
+    """Return a detached ``model`` instance holding ``values``, as if loaded by the ORM."""
+    instance = model.__mapper__.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(instance, key, value)
+    return instance
+
+
+def _columns(model, fields, *extra):
+    return [model.__table__.c[name] for name in field_columns(model, fields, *extra)]
+
+
+def _string_port(wsgi_app):
+    """Wrap ``wsgi_app`` so ``SERVER_PORT`` is a string, as WSGI requires (a2wsgi 1.7 passes an int)."""
+
+    def app(environ, start_response):
+        environ["SERVER_PORT"] = str(environ.get("SERVER_PORT", ""))
+        return wsgi_app(environ, start_response)
+
+    return app
+
+
+class Request(object):
+    """The parts of an HTTP request the async handlers read."""
+
+    __slots__ = ("method", "path", "args", "headers")
+
+    def __init__(self, scope):
+        """Create instance from an ASGI ``http`` scope."""
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = url_decode(scope.get("query_string", b""))
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+
+
+class AsyncAPI(object):
+    """ASGI app serving the ``/api/v0`` reads with async handlers and everything else with ``flask_app``."""
+
+    def __init__(self, flask_app):
+        """Create instance."""
+        from a2wsgi import WSGIMiddleware
+
+        config = flask_app.config
+        self.flask_app = flask_app
+        self.config = config
+        self.database = AsyncDatabase(
+            config["ASGI_DATABASE_URL"] or config["SQLALCHEMY_DATABASE_URI"], config["ASGI_DB_POOL_SIZE"]
+        )
+        self.fallback = WSGIMiddleware(_string_port(flask_app), workers=config["ASGI_WSGI_THREADS"])
+        self.queue_timeout = config["ASGI_QUEUE_TIMEOUT"]
+        self.max_concurrency = config["ASGI_MAX_CONCURRENCY"]
+        self.slots = None
+        self.metrics = flask_app.extensions.get("metrics")
+        if self.metrics is not None:
+            self.database.timer(self.metrics.record_statement)
+        # Named after the Flask resources' endpoints, for the validators and the metrics
+        self.routes = [
+            (re.compile(r"/users"), "users", self.list_users),
+            (re.compile(r"/users/(?P<username>[^/]+)"), "user", self.get_user),
+            (re.compile(r"/users/(?P<username>[^/]+)/posts"), "posts", self.list_posts),
+            (re.compile(r"/users/(?P<username>[^/]+)/posts/(?P<id>\d+)"), "post", self.get_post),
+        ]
+
+    def match(self, scope):
+        """Return the endpoint, async handler and path arguments for ``scope``, or ``(None, None, None)``."""
+        if scope["method"] != "GET" or not scope["path"].startswith(PREFIX):
+            return None, None, None
+        if b"stream=" in scope.get("query_string", b""):
+            return None, None, None  # Streamed listings stay on the WSGI generator
+        path = scope["path"][len(PREFIX):]
+        for pattern, endpoint, handler in self.routes:
+            found = pattern.fullmatch(path)
+            if found:
+                # Converted like Flask's <int:id>, so the validators match the Flask resource's
+                kwargs = {key: int(value) if key == "id" else value for key, value in found.groupdict().items()}
+                return endpoint, handler, kwargs
+        return None, None, None
+
+    async def __call__(self, scope, receive, send):
+        """Serve one ASGI connection."""
+        if self.slots is None:
+            # Made on the serving loop: before Python 3.10 it binds to the loop it is created on
+            self.slots = asyncio.Semaphore(self.max_concurrency)
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        handler = None
+        if scope["type"] == "http":
+            endpoint, handler, kwargs = self.match(scope)
+        if handler is None:
+            return await self.fallback(scope, receive, send)
+        stats = RequestStats()
+        token = async_request_stats.set(stats)
+        try:
+            status, body, headers = await self.serve(endpoint, handler, Request(scope), kwargs)
+        finally:
+            async_request_stats.reset(token)
+        if self.metrics is not None:
+            self.metrics.observe(endpoint, scope["method"], status, stats, len(body))
+        await self.respond(send, status, body, headers)
+
+    async def serve(self, endpoint, handler, request, kwargs):
+        """Wait for a concurrency slot and dispatch ``request``; returns ``(status, body, headers)``."""
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            body = json_encoder.dumps({"message": "Server busy, retry later", "status": 503})
+            return 503, body, [(b"retry-after", b"1")]
+        try:
+            return await self.dispatch(endpoint, handler, request, kwargs)
+        finally:
+            self.slots.release()
+
+    async def lifespan(self, receive, send):
+        """Open the database pool on startup and close it on shutdown."""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.database.connect()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.database.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def respond(self, send, status, body, headers=()):
+        """Send a complete JSON response, or a bodiless ``304``."""
+        if status != 304:
+            headers = JSON_HEADERS + [(b"content-length", str(len(body)).encode())] + list(headers)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def dispatch(self, endpoint, handler, request, kwargs):
+        """Authenticate ``request`` and run ``handler``; returns ``(status, body, headers)``.
+
+        Like ``conditional``, the probe of ``endpoint`` gives the validators,
+        and a request that already holds the current ones gets a ``304``
+        without running ``handler``.
+        """
+        if not await self.authenticate(request):
+            return 403, json_encoder.dumps({"message": UNAUTHORIZED_MESSAGE, "status": 403}), []
+        version = await self.database.fetch_one(probe_statement(endpoint, kwargs))
+        headers = []
+        if version is not None:
+            etag, last_modified = validators(endpoint, kwargs, version.values(), request.args)
+            headers.append((b"etag", f'"{etag}"'.encode()))
+            if last_modified is not None:
+                headers.append((b"last-modified", http_date(last_modified).encode()))
+            if_none_match = parse_etags(request.headers.get("if-none-match"))
+            if_modified_since = parse_date(request.headers.get("if-modified-since"))
+            if not_modified(etag, last_modified, if_none_match, if_modified_since):
+                return 304, b"", headers
+        try:
+            data = await handler(request, **kwargs)
+        except HTTPException as error:
+            # Raised by flask_restful.abort in the shared helpers
+            data = getattr(error, "data", None) or {"message": error.description}
+            return error.code, json_encoder.dumps(data), []
+        return 200, json_encoder.dumps(data), headers
+
+    async def authenticate(self, request):
+        """Check HTTP Basic credentials or a bearer token, like the Flask API's ``MultiAuth``."""
+        scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "basic":
+            try:
+                username, _, password = base64.b64decode(credentials).decode("utf-8").partition(":")
+            except (binascii.Error, UnicodeDecodeError):
+                return False
+            return await self.check_password(username, password)
+        if scheme == "Bearer":
+            return await self.check_token(credentials)
+        return False
+
+    async def check_password(self, username, password):
+        """Verify a password through the credential cache, hashing on the executor on a miss."""
+        if credential_cache.check(username, password):
+            return True
+        table = User.__table__
+        row = await self.database.fetch_one(select([table.c.password]).where(table.c.username == username))
+        if row is None or row["password"] is None:
+            return False
+        loop = asyncio.get_running_loop()
+        # In this request's context, so the hashing time is recorded in its metrics
+        valid = await loop.run_in_executor(
+            None, contextvars.copy_context().run, password_hasher.check_password_hash, row["password"], password
+        )
+        if valid:
+            credential_cache.remember(username, password)
+        return valid
+
+    async def check_token(self, token):
+        """Verify a bearer token against the account's id and current token generation."""
+        decoded = access_tokens.decode(token)
+        if decoded is None:
+            return False
+        username, user_id, generation = decoded
+        current = access_tokens.cached_account(username)
+        if current is None:
+            table = User.__table__
+            row = await self.database.fetch_one(
+                select([table.c.id, table.c.token_generation]).where(table.c.username == username)
+            )
+            current = row and (row["id"], row["token_generation"])
+            access_tokens.remember_account(username, current)
+        return current is not None and tuple(current) == (user_id, generation)
+
+    async def list_users(self, request):
+        """``GET /users``."""
+        limit, after = page_args(request.args, self.config)
+        fields = requested_fields(User, request.args)
+        table = User.__table__
+        statement = select(_columns(User, fields)).order_by(table.c.id).limit(limit + 1)
+        if after is not None:
+            statement = statement.where(keyset_condition([table.c.id], after))
+        users = [build(User, row) for row in await self.database.fetch_all(statement)]
+        users, next_cursor = split_page(users, [table.c.id], limit)
+        return {
+            'users': [json_encoder.fragment(user, fields) for user in users],
+            'next': next_cursor,
+        }
+
+    async def get_user(self, request, username):
+        """``GET /users/<username>``."""
+        fields = requested_fields(User, request.args)
+        table = User.__table__
+        row = await self.database.fetch_one(
+            select(_columns(User, fields)).where(table.c.username == username).limit(1)
+        )
+        if row is None:
+            return {}
+        return json_encoder.fragment(build(User, row), fields)
+
+    async def list_posts(self, request, username):
+        """``GET /users/<username>/posts``."""
+        users, posts = User.__table__, Post.__table__
+        row = await self.database.fetch_one(select(users.c).where(users.c.username == username).limit(1))
+        if row is None:
+            return {}
+        user = build(User, row)
+        limit, after = page_args(request.args, self.config)
+        fields = requested_fields(Post, request.args)
+        columns = [posts.c.created_at, posts.c.id]
+        statement = (
+            select(_columns(Post, fields, *columns))
+            .where(posts.c.user_id == user.id)
+            .order_by(*columns)
+            .limit(limit + 1)
+        )
+        if after is not None:
+            statement = statement.where(keyset_condition(columns, after))
+        page = []
+        for values in await self.database.fetch_all(statement):
+            post = build(Post, values)
+            set_committed_value(post, 'user', user)
+            page.append(post)
+        page, next_cursor = split_page(page, columns, limit)
+        return {
+            'posts': [json_encoder.fragment(post, fields) for post in page],
+            'next': next_cursor,
+        }
+
+    async def get_post(self, request, username, id):
+        """``GET /users/<username>/posts/<id>``."""
+        fields = requested_fields(Post, request.args)
+        users, posts = User.__table__, Post.__table__
+        columns = _columns(Post, fields)
+        if not wants(fields, 'user'):
+            author = select([users.c.id]).where(users.c.username == username).as_scalar()
+            row = await self.database.fetch_one(
+                select(columns).where(and_(posts.c.id == int(id), posts.c.user_id == author))
+            )
+            if row is None:
+                return {}
+            return {'post': json_encoder.fragment(build(Post, row), fields)}
+        authors = [column.label(f"author_{column.key}") for column in users.c]
+        row = await self.database.fetch_one(
+            select(columns + authors)
+            .select_from(posts.join(users, posts.c.user_id == users.c.id))
+            .where(and_(users.c.username == username, posts.c.id == int(id)))
+        )
+        if row is None:
+            return {}
+        post = build(Post, {key: value for key, value in row.items() if not key.startswith("author_")})
+        set_committed_value(post, 'user', build(User, {
+            column.key: row[f"author_{column.key}"] for column in users.c
+        }))
+        return {'post': json_encoder.fragment(post, fields)}
+
+
+def create_asgi_app(config_object="flask_blog_api.settings"):
+    """Create the ASGI app around a Flask app made by :func:`~flask_blog_api.app.create_app`."""
+    flask_app = create_app(config_object)
+    flask_app.config.setdefault("ASGI_DATABASE_URL", None)
+    flask_app.config.setdefault("ASGI_DB_POOL_SIZE", 10)
+    flask_app.config.setdefault("ASGI_MAX_CONCURRENCY", 100)
+    flask_app.config.setdefault("ASGI_QUEUE_TIMEOUT", 5.0)
+    flask_app.config.setdefault("ASGI_WSGI_THREADS", 10)
+    return AsyncAPI(flask_app)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""SQLAlchemy Core selects on asyncio database drivers.
+
+SQLAlchemy 1.3 has no asyncio support, so :class:`AsyncDatabase` compiles
+Core statements built from the models' tables with the SQLAlchemy dialect,
+runs the SQL on an asyncio driver and applies the column types' result
+processing itself:
+
+* PostgreSQL URLs run on an ``asyncpg`` pool.
+* SQLite files run on a pool of ``aiosqlite`` connections (each one a thread).
+
+Both drivers are optional: they are imported when :meth:`AsyncDatabase.connect`
+is first awaited.
+"""
+import asyncio
+import re
+import time
+
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlalchemy.dialects.sqlite.base import SQLiteDialect
+from sqlalchemy.engine.url import URL, make_url
+
+_FORMAT_PARAMETER = re.compile(r"%%|%s")
+
+
+def _numbered(sql):
+    """Turn ``format`` placeholders (``%s``, with ``%%`` escapes) into asyncpg's ``$1, $2, ...``."""
+    position = 0
+
+    def replace(match):
+        nonlocal position
+        if match.group() == "%%":
+            return "%"
+        position += 1
+        return f"${position}"
+
+    return _FORMAT_PARAMETER.sub(replace, sql)
+
+
+class _SQLitePool(object):
+    """A fixed set of ``aiosqlite`` connections handed out one query at a time."""
+
+    def __init__(self, path, size):
+        """Create instance."""
+        self.path = path
+        self.size = size
+        self._idle = None
+        self._connections = []
+
+    async def open(self):
+        """Open the connections, in autocommit mode so reads hold no locks between queries."""
+        import aiosqlite
+
+        # Made on the serving loop: before Python 3.10 it binds to the loop it is created on
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            connection = await aiosqlite.connect(self.path, isolation_level=None)
+            self._connections.append(connection)
+            self._idle.put_nowait(connection)
+
+    async def fetch(self, sql, parameters):
+        """Return the rows of ``sql`` as tuples."""
+        connection = await self._idle.get()
+        try:
+            async with connection.execute(sql, parameters) as cursor:
+                return await cursor.fetchall()
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def close(self):
+        """Close every connection."""
+        for connection in self._connections:
+            await connection.close()
+        self._connections = []
+        self._idle = None
+
+
+class _PostgresPool(object):
+    """An ``asyncpg`` pool."""
+
+    def __init__(self, url, size):
+        """Create instance."""
+        self.dsn = str(URL("postgresql", url.username, url.password, url.host, url.port, url.database))
+        self.size = size
+        self._pool = None
+
+    async def open(self):
+        """Open the pool."""
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.size)
+
+    async def fetch(self, sql, parameters):
+        """Return the rows of ``sql`` as tuples."""
+        async with self._pool.acquire() as connection:
+            return [tuple(record) for record in await connection.fetch(_numbered(sql), *parameters)]
+
+    async def close(self):
+        """Close the pool."""
+        await self._pool.close()
+
+
+class AsyncDatabase(object):
+    """Run SQLAlchemy Core selects on asyncpg (PostgreSQL) or aiosqlite (SQLite files).
+
+    ``pool_size`` connections are opened by :meth:`connect`; queries beyond
+    that wait for a free one.
+    """
+
+    def __init__(self, url, pool_size=10):
+        """Create instance."""
+        self.url = make_url(url)
+        self.pool_size = pool_size
+        backend = self.url.get_backend_name()
+        if backend == "postgresql":
+            self.dialect = PGDialect(paramstyle="format")
+            self._pool = _PostgresPool(self.url, pool_size)
+        elif backend == "sqlite":
+            if self.url.database in (None, "", ":memory:"):
+                raise ValueError("The async database needs a SQLite file, not an in-memory database")
+            self.dialect = SQLiteDialect(paramstyle="qmark")
+            self._pool = _SQLitePool(self.url.database, pool_size)
+        else:
+            raise ValueError(f"No asyncio driver for {backend!r} databases, only postgresql and sqlite")
+        self._connected = False
+        self._connecting = None
+        self._timers = []
+
+    def timer(self, f):
+        """Register ``f(seconds)`` to be called after every statement."""
+        self._timers.append(f)
+        return f
+
+    async def connect(self):
+        """Open the connection pool; later calls return at once."""
+        if self._connected:
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._pool.open())
+        await asyncio.shield(self._connecting)
+        self._connected = True
+
+    async def close(self):
+        """Close the connection pool."""
+        if self._connected:
+            await self._pool.close()
+        self._connected = False
+        self._connecting = None
+
+    def _compile(self, statement):
+        compiled = statement.compile(dialect=self.dialect)
+        values = compiled.construct_params()
+        parameters = []
+        for name in compiled.positiontup:
+            value = values[name]
+            process = self.dialect.type_descriptor(compiled.binds[name].type).bind_processor(self.dialect)
+            parameters.append(process(value) if process is not None and value is not None else value)
+        columns = [
+            (column.key, self.dialect.type_descriptor(column.type).result_processor(self.dialect, None))
+            for column in statement.c
+        ]
+        return compiled.string, parameters, columns
+
+    async def fetch_all(self, statement):
+        """Return the rows selected by ``statement`` as dicts keyed by column key."""
+        await self.connect()
+        sql, parameters, columns = self._compile(statement)
+        started = time.perf_counter()
+        try:
+            rows = await self._pool.fetch(sql, parameters)
+        finally:
+            for timer in self._timers:
+                timer(time.perf_counter() - started)
+        return [
+            {
+                key: process(value) if process is not None else value
+                for (key, process), value in zip(columns, row)
+            }
+            for row in rows
+        ]
+
+    async def fetch_one(self, statement):
+        """Return the first row selected by ``statement`` as a dict, or ``None``."""
+        rows = await self.fetch_all(statement)
+        return rows[0] if rows else None
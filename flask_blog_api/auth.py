@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Authentication helpers for the REST API."""
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+#: Longest ``AUTH_CACHE_TTL`` honoured when several worker processes keep their own caches
+MAX_PER_PROCESS_TTL = 5
+
+
+def cache_ttl(app):
+    """Return the TTL of the per-process auth caches.
+
+    A password change or a token revocation only clears the caches of the
+    worker that served it, so unless ``SINGLE_PROCESS`` is set the others may
+    accept the old credentials for up to :data:`MAX_PER_PROCESS_TTL` seconds.
+    """
+    ttl = app.config["AUTH_CACHE_TTL"]
+    if app.config.get("SINGLE_PROCESS"):
+        return ttl
+    return min(ttl, MAX_PER_PROCESS_TTL)
+
+
+class TTLCache(object):
+    """A bounded, thread-safe LRU mapping whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=60, clock=time.monotonic):
+        """Create instance."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the live value stored under ``key``, or ``None``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store ``value`` under ``key``, evicting the least recently used entry if full."""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Drop ``key`` from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class CredentialCache(object):
+    """Cache of recently verified HTTP Basic credentials.
+
+    Verifying a password costs a ``users`` lookup and a full bcrypt round, so
+    successful verifications are remembered for ``AUTH_CACHE_TTL`` seconds.
+    Entries map a username to an HMAC (keyed with ``SECRET_KEY``) of the
+    password that was accepted; the plaintext is never stored. The cache is
+    per process, so its TTL (see :func:`cache_ttl`) also bounds how long
+    another worker may keep accepting credentials after an account changes.
+    """
+
+    def __init__(self, app=None):
+        """Create instance."""
+        self._cache = TTLCache()
+        self._key = b""
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the cache from the application config."""
+        app.config.setdefault("AUTH_CACHE_SIZE", 1024)
+        app.config.setdefault("AUTH_CACHE_TTL", MAX_PER_PROCESS_TTL)
+        self._cache = TTLCache(
+            maxsize=app.config["AUTH_CACHE_SIZE"], ttl=cache_ttl(app)
+        )
+        self._key = str(app.config["SECRET_KEY"]).encode("utf-8")
+        self.hits = self.misses = 0
+        app.extensions["credential_cache"] = self
+
+    def _digest(self, username, password):
+        message = f"{username}\0{password}".encode("utf-8")
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def check(self, username, password):
+        """Return ``True`` if these credentials were verified recently."""
+        digest = self._cache.get(username)
+        if digest is not None and hmac.compare_digest(
+            digest, self._digest(username, password)
+        ):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, username, password):
+        """Record that these credentials were just verified."""
+        self._cache.set(username, self._digest(username, password))
+
+    def invalidate(self, username):
+        """Forget any cached credentials for ``username``."""
+        self._cache.pop(username)
+
+    def clear(self):
+        """Forget every cached credential and reset the counters."""
+        self._cache.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current size."""
+        return dict(self._cache.stats(), hits=self.hits, misses=self.misses)
+
+
+class AccessTokens(object):
+    """Signed, expiring bearer tokens for the REST API.
+
+    A token carries the username, the user id and the account's
+    ``token_generation`` and is signed with ``SECRET_KEY``, so signature and
+    expiry are checked without touching the database. The id ties a token to
+    one account, so a username that is deleted and registered again does not
+    inherit the old account's tokens (SQLite without ``AUTOINCREMENT`` may
+    hand the highest deleted id out again; PostgreSQL sequences never do).
+    Bumping ``User.token_generation``
+    revokes every token issued before it; the id and current generation of
+    each account are cached per process (see :func:`cache_ttl`), which bounds
+    how long a revoked token can still be accepted by another worker.
+    """
+
+    salt = "api-access-token"
+
+    def __init__(self, app=None):
+        """Create instance."""
+        self._serializer = None
+        self._accounts = TTLCache()
+        self.max_age = 3600
+        self.account_loader_callback = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the signer from the application config."""
+        app.config.setdefault("AUTH_TOKEN_TTL", 3600)
+        app.config.setdefault("AUTH_CACHE_SIZE", 1024)
+        app.config.setdefault("AUTH_CACHE_TTL", MAX_PER_PROCESS_TTL)
+        self.max_age = app.config["AUTH_TOKEN_TTL"]
+        self._serializer = URLSafeTimedSerializer(app.config["SECRET_KEY"], salt=self.salt)
+        self._accounts = TTLCache(
+            maxsize=app.config["AUTH_CACHE_SIZE"], ttl=cache_ttl(app)
+        )
+        app.extensions["access_tokens"] = self
+
+    def account_loader(self, f):
+        """Register the callback returning an account's id and current token generation.
+
+        The callback receives a username and returns ``(user_id,
+        generation)``, or ``None`` if the account does not exist.
+        """
+        self.account_loader_callback = f
+        return f
+
+    def issue(self, username, user_id, generation):
+        """Return a new token for the account ``user_id`` named ``username`` at the given token generation."""
+        return self._serializer.dumps({"u": username, "i": user_id, "g": generation})
+
+    def decode(self, token):
+        """Return the ``(username, user_id, generation)`` a token was issued for, or ``None`` if it is invalid or expired.
+
+        The id and generation still have to be checked against the account's,
+        which :meth:`verify` does.
+        """
+        try:
+            payload = self._serializer.loads(token, max_age=self.max_age)
+            return payload["u"], payload["i"], payload["g"]
+        except (BadSignature, KeyError, TypeError):
+            return None
+
+    def cached_account(self, username):
+        """Return the cached ``(user_id, generation)`` of ``username``, or ``None``."""
+        return self._accounts.get(username)
+
+    def remember_account(self, username, account):
+        """Cache the ``(user_id, generation)`` of ``username``."""
+        if account is not None:
+            self._accounts.set(username, tuple(account))
+
+    def verify(self, token):
+        """Return the username a valid, unrevoked token was issued to, or ``None``."""
+        decoded = self.decode(token)
+        if decoded is None:
+            return None
+        username, user_id, generation = decoded
+        current = self.cached_account(username)
+        if current is None and self.account_loader_callback is not None:
+            current = self.account_loader_callback(username)
+            self.remember_account(username, current)
+        if current is None or tuple(current) != (user_id, generation):
+            return None
+        return username
+
+    def invalidate(self, username):
+        """Forget the cached id and token generation of ``username``."""
+        self._accounts.pop(username)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""SQL statement budgets and N+1 detection.
+
+:class:`query_budget` counts the statements executed inside a block (or a
+decorated function) and raises :class:`QueryBudgetExceeded` when there are
+more than its limit; the tests use it through the ``query_budget`` fixture.
+It can also fail when one statement shape repeats, the signature of an N+1
+pattern such as serializing rows that each lazy-load a relationship.
+
+:class:`QueryBudget` applies the same checks to every request, for staging:
+
+* ``QUERY_BUDGET`` is the most statements a request may run (``None`` to
+  not count them).
+* ``QUERY_N_PLUS_ONE_THRESHOLD`` flags a request that runs one statement
+  shape this many times (``None`` to not look for repeats), with the stack
+  trace of the first repetition.
+* ``QUERY_BUDGET_ACTION`` is ``"warn"`` to log the problems or ``"raise"`` to
+  fail the request with :class:`QueryBudgetExceeded`.
+"""
+import re
+import threading
+import traceback
+from collections import Counter
+from contextlib import ContextDecorator
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ACTIONS = ("warn", "raise")
+
+_BIND_PARAMETER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_PARAMETER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block or request runs more statements than its budget allows."""
+
+
+def statement_shape(statement):
+    """Return ``statement`` with its bind parameters and whitespace normalized."""
+    shape = _BIND_PARAMETER.sub("?", statement)
+    shape = _PARAMETER_LIST.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _active_logs():
+    logs = getattr(_local, "logs", None)
+    if logs is None:
+        logs = _local.logs = []
+    return logs
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    for log in _active_logs():
+        log.record(statement)
+
+
+def _listen():
+    # On the Engine class, so every bind and replica is counted
+    if not event.contains(Engine, "before_cursor_execute", _record):
+        event.listen(Engine, "before_cursor_execute", _record)
+
+
+def _application_stack():
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if "site-packages" not in frame.filename and frame.filename != __file__
+    ]
+    return "".join(traceback.format_list(frames))
+
+
+class QueryLog(object):
+    """The statements executed while the log is active on the current thread."""
+
+    def __init__(self, stacks=False):
+        """Create instance; ``stacks`` keeps the stack trace of every statement."""
+        self.statements = []
+        self.stacks = [] if stacks else None
+
+    def __len__(self):
+        """Return the number of statements executed."""
+        return len(self.statements)
+
+    def record(self, statement):
+        """Add ``statement`` to the log."""
+        self.statements.append(statement)
+        if self.stacks is not None:
+            self.stacks.append(_application_stack())
+
+    def start(self):
+        """Record the statements executed from now on, on this thread."""
+        _listen()
+        _active_logs().append(self)
+        return self
+
+    def stop(self):
+        """Stop recording."""
+        logs = _active_logs()
+        if self in logs:
+            logs.remove(self)
+
+    def repeated(self, threshold):
+        """Return ``(shape, count)`` for every statement shape executed at least ``threshold`` times."""
+        counts = Counter(statement_shape(statement) for statement in self.statements)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+    def problems(self, limit=None, n_plus_one=None):
+        """Describe how the log breaks ``limit`` or repeats a shape ``n_plus_one`` times."""
+        problems = []
+        if limit is not None and len(self) > limit:
+            listing = "\n".join(f"  {index}. {statement}" for index, statement in enumerate(self.statements, 1))
+            problems.append(f"{len(self)} statements executed, the budget is {limit}:\n{listing}")
+        if n_plus_one is not None:
+            for shape, count in self.repeated(n_plus_one):
+                problem = f"Likely N+1: this statement ran {count} times:\n  {shape}"
+                if self.stacks:
+                    # The second execution is the first repetition: it points into the loop
+                    shapes = [statement_shape(statement) for statement in self.statements]
+                    second = [index for index, value in enumerate(shapes) if value == shape][1]
+                    problem += f"\nSecond execution from:\n{self.stacks[second]}"
+                problems.append(problem)
+        return problems
+
+
+class query_budget(ContextDecorator):  # noqa: N801 - used like a function
+    """Fail a block or function that runs more than ``limit`` SQL statements.
+
+    ``n_plus_one`` also fails it when one statement shape runs that many
+    times. Entering the block returns its :class:`QueryLog`, which keeps the
+    statements for inspection.
+    """
+
+    def __init__(self, limit=None, n_plus_one=None):
+        """Create instance."""
+        self.limit = limit
+        self.n_plus_one = n_plus_one
+        self.log = None
+
+    def __enter__(self):
+        """Start counting."""
+        self.log = QueryLog(stacks=self.n_plus_one is not None).start()
+        return self.log
+
+    def __exit__(self, exc_type, exc, tb):
+        """Stop counting and raise :class:`QueryBudgetExceeded` if the budget was broken."""
+        self.log.stop()
+        if exc_type is None:
+            problems = self.log.problems(self.limit, self.n_plus_one)
+            if problems:
+                raise QueryBudgetExceeded("\n\n".join(problems))
+        return False
+
+
+class QueryBudget(object):
+    """Check the statements executed by every request against the configured budget."""
+
+    def __init__(self, app=None):
+        """Create instance."""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the request hooks if a budget or N+1 threshold is configured."""
+        app.config.setdefault("QUERY_BUDGET", None)
+        app.config.setdefault("QUERY_N_PLUS_ONE_THRESHOLD", None)
+        app.config.setdefault("QUERY_BUDGET_ACTION", "warn")
+        if app.config["QUERY_BUDGET_ACTION"] not in ACTIONS:
+            raise ValueError(
+                f"QUERY_BUDGET_ACTION must be one of {ACTIONS}, not {app.config['QUERY_BUDGET_ACTION']!r}"
+            )
+        app.extensions["query_budget"] = self
+        if app.config["QUERY_BUDGET"] is None and app.config["QUERY_N_PLUS_ONE_THRESHOLD"] is None:
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._check_request)
+        app.teardown_request(self._stop_request)
+
+    def _start_request(self):
+        stacks = current_app.config["QUERY_N_PLUS_ONE_THRESHOLD"] is not None
+        _local.request_log = QueryLog(stacks=stacks).start()
+
+    def _stop_request(self, exc):
+        log = getattr(_local, "request_log", None)
+        if log is not None:
+            log.stop()
+            _local.request_log = None
+        return log
+
+    def _check_request(self, response):
+        log = self._stop_request(None)
+        if log is None:
+            return response
+        config = current_app.config
+        problems = log.problems(config["QUERY_BUDGET"], config["QUERY_N_PLUS_ONE_THRESHOLD"])
+        if problems:
+            message = f"{request.method} {request.path}: " + "\n\n".join(problems)
+            if config["QUERY_BUDGET_ACTION"] == "raise":
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Response caching for the REST API read endpoints."""
+import os
+import zlib
+from functools import wraps
+from itertools import chain
+from urllib.parse import urlencode
+
+from flask import g, request
+from sqlalchemy import event, inspect
+from werkzeug.wrappers import Response as ResponseBase
+
+#: Flask-Caching backends whose entries are only seen by the process that stored them
+PROCESS_LOCAL_BACKENDS = frozenset(["null", "simple", "NullCache", "SimpleCache"])
+
+
+def _new_version():
+    return os.urandom(8).hex()
+
+
+def require_shared_cache(app, feature):
+    """Raise ``ValueError`` if ``CACHE_TYPE`` is not shared by every worker process.
+
+    ``feature`` names what needs it in the message. ``SINGLE_PROCESS`` allows
+    a per-process backend for apps served by one process (tests, ``flask run``).
+    """
+    if app.config.get("SINGLE_PROCESS"):
+        return
+    backend = app.config.get("CACHE_TYPE") or "null"
+    if backend.rsplit(".", 1)[-1] in PROCESS_LOCAL_BACKENDS:
+        raise ValueError(
+            f"{feature} needs a CACHE_TYPE shared by every worker process, such as redis or memcached, "
+            f"not {backend!r}; set SINGLE_PROCESS if the app runs in one process"
+        )
+
+
+class ResponseCache(object):
+    """Cache GET responses of the API resources in Flask-Caching.
+
+    Every key embeds the current version of a namespace (``users``,
+    ``user:<username>``, ``posts:<username>``, ``search``). Writes to ``User`` and ``Post``
+    rows are collected while the session flushes, and when the transaction
+    commits the affected namespaces get a fresh random version. Every entry
+    that could show the changed rows is then unreachable, and left to expire.
+    A response computed concurrently with the write is stored under the
+    version it started from, so it can never be served after the commit.
+
+    Keys also hold where the response was read from (the primary or a
+    replica bind) and the ``ETag`` that ``conditional`` computed for it, so
+    a body read from a lagging replica is never served to a client that
+    reads the primary, nor under a newer ``ETag`` than its own.
+
+    ``API_CACHE_TTL`` maps each endpoint to its TTL in seconds; ``0`` or a
+    missing endpoint disables caching for that endpoint. Versions only reach
+    every worker through a shared backend, so any TTL needs one (see
+    :func:`require_shared_cache`).
+
+    Encoded variants of a cached response, such as its gzipped body, can be
+    stored next to the entry with :meth:`set_variant` for the same TTL.
+    """
+
+    def __init__(self, cache, db, app=None):
+        """Create instance."""
+        self.cache = cache
+        self.db = db
+        self.ttls = {}
+        self.hits = {}
+        self.misses = {}
+        event.listen(db.session, "before_flush", self._collect_changes)
+        event.listen(db.session, "after_commit", self._apply_changes)
+        event.listen(db.session, "after_soft_rollback", self._discard_changes)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the TTLs from the application config."""
+        app.config.setdefault("API_CACHE_TTL", {})
+        self.ttls = dict(app.config["API_CACHE_TTL"])
+        if any(self.ttls.values()):
+            require_shared_cache(app, "API_CACHE_TTL")
+        self.hits = {endpoint: 0 for endpoint in self.ttls}
+        self.misses = {endpoint: 0 for endpoint in self.ttls}
+        app.teardown_request(self._forget_entry)
+        app.extensions["response_cache"] = self
+
+    def _forget_entry(self, exc):
+        g.pop("response_cache_entry", None)
+
+    def _version(self, namespace):
+        key = f"api:version:{namespace}"
+        version = self.cache.get(key)
+        if version is None:
+            version = _new_version()
+            # ``add`` so concurrent first readers agree on a single version
+            if not self.cache.add(key, version, timeout=0):
+                version = self.cache.get(key) or version
+        return version
+
+    def _key(self, endpoint, kwargs):
+        username = kwargs.get("username")
+        if endpoint == "users":
+            namespace = "users"
+        elif endpoint == "user":
+            namespace = f"user:{username}"
+        elif endpoint == "search":
+            namespace = "search"
+        else:
+            namespace = f"posts:{username}"
+        args = urlencode(sorted(request.args.items(multi=True)))
+        parts = [str(kwargs[name]) for name in sorted(kwargs)]
+        # Set by ReplicaRouter while reads are routed to a replica
+        route = self.db.session.info.get("db_replica") or "primary"
+        validator = g.get("response_etag") or ""
+        return ":".join(["api", endpoint, self._version(namespace), route, validator, *parts, args])
+
+    def cached(self, endpoint):
+        """Cache successful responses of a resource ``get`` method as ``endpoint``."""
+
+        def decorator(f):
+            @wraps(f)
+            def decorated(resource, **kwargs):
+                ttl = self.ttls.get(endpoint, 0)
+                if not ttl:
+                    return f(resource, **kwargs)
+                key = self._key(endpoint, kwargs)
+                rv = self.cache.get(key)
+                if rv is not None:
+                    self.hits[endpoint] += 1
+                    g.response_cache_entry = (key, ttl)
+                    return rv
+                self.misses[endpoint] += 1
+                rv = f(resource, **kwargs)
+                if isinstance(rv, ResponseBase):
+                    # Streamed listings are never buffered into the cache
+                    return rv
+                status = rv[1] if isinstance(rv, tuple) else 200
+                if status == 200:
+                    self.cache.set(key, rv, timeout=ttl)
+                    g.response_cache_entry = (key, ttl)
+                return rv
+
+            return decorated
+
+        return decorator
+
+    def get_variant(self, encoding, body):
+        """Return the stored ``encoding`` variant of the current request's cached ``body``, if any."""
+        entry = g.get("response_cache_entry")
+        if entry is None:
+            return None
+        variant = self.cache.get(f"{entry[0]}:{encoding}")
+        # The checksum guards against a variant outliving the entry it was made from
+        if variant is None or variant[0] != zlib.crc32(body):
+            return None
+        return variant[1]
+
+    def set_variant(self, encoding, body, data):
+        """Store ``data`` as the ``encoding`` variant of the current request's cached ``body``."""
+        entry = g.get("response_cache_entry")
+        if entry is not None:
+            key, ttl = entry
+            self.cache.set(f"{key}:{encoding}", (zlib.crc32(body), data), timeout=ttl)
+
+    def invalidate(self, session, *namespaces):
+        """Invalidate ``namespaces`` once ``session`` commits."""
+        session.info.setdefault("response_cache_changes", set()).update(namespaces)
+
+    def invalidate_user(self, session, username):
+        """Invalidate everything that shows ``username`` once ``session`` commits."""
+        self.invalidate(session, "users", f"user:{username}", f"posts:{username}")
+
+    def _collect_changes(self, session, flush_context, instances):
+        for obj in chain(session.new, session.dirty, session.deleted):
+            tablename = getattr(obj, "__tablename__", None)
+            if tablename == "users":
+                state = inspect(obj)
+                for username in chain([obj.username], state.attrs.username.history.deleted):
+                    self.invalidate_user(session, username)
+            elif tablename == "posts" and obj.user is not None:
+                self.invalidate(session, f"posts:{obj.user.username}")
+
+    def _apply_changes(self, session):
+        namespaces = session.info.pop("response_cache_changes", set())
+        if any(namespace.startswith("posts:") for namespace in namespaces):
+            # Search results can show any post
+            namespaces.add("search")
+        for namespace in namespaces:
+            self.cache.set(f"api:version:{namespace}", _new_version(), timeout=0)
+
+    def _discard_changes(self, session, previous_transaction):
+        # Savepoint rollbacks keep the changes: the outer transaction may still commit
+        if previous_transaction.parent is None:
+            session.info.pop("response_cache_changes", None)
+
+    def stats(self):
+        """Return hits, misses and hit ratio per endpoint."""
+        stats = {}
+        for endpoint in self.ttls:
+            hits, misses = self.hits.get(endpoint, 0), self.misses.get(endpoint, 0)
+            stats[endpoint] = {
+                "ttl": self.ttls[endpoint],
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            }
+        return stats
@@ -5,6 +5,7 @@ from glob import glob
 from subprocess import call
 
 import click
+from flask.cli import with_appcontext
 
 HERE = os.path.abspath(os.path.dirname(__file__))
 PROJECT_ROOT = os.path.join(HERE, os.pardir)
@@ -63,3 +64,142 @@ def lint(fix_imports, check):
         execute_tool("Fixing import order", "isort", *isort_args)
     execute_tool("Formatting style", "black", *black_args)
     execute_tool("Checking code style", "flake8")
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index():
+    """Rebuild the full-text search index over posts."""
+    from flask_blog_api.extensions import db
+    from flask_blog_api.search import rebuild_index
+
+    with db.engine.begin() as connection:
+        rebuild_index(connection)
+    click.echo("Search index rebuilt.")
+
+
+def _int_list(ctx, param, value):
+    try:
+        values = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise click.BadParameter("expected comma-separated integers")
+    if not values or min(values) < 1:
+        raise click.BadParameter("expected comma-separated positive integers")
+    return values
+
+
+def _mix(ctx, param, value):
+    from flask_blog_api.loadtest import DEFAULT_MIX, parse_mix
+
+    if value is None:
+        return DEFAULT_MIX
+    try:
+        return parse_mix(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+@click.command()
+@click.option("-w", "--workers", default="1,2,4", callback=_int_list, help="Comma-separated gunicorn worker counts")
+@click.option(
+    "-c", "--concurrency", default="10,50", callback=_int_list, help="Comma-separated numbers of client threads"
+)
+@click.option("-d", "--duration", default=10.0, help="Seconds measured per run")
+@click.option("--warmup", default=2.0, help="Seconds of unrecorded requests before each run")
+@click.option("--mix", callback=_mix, help="Scenario weights as name=weight,... (default: a read-heavy mix)")
+@click.option("--users", default=100, help="Seeded authors")
+@click.option("--posts", default=10000, help="Seeded posts")
+@click.option("--database-url", help="An empty database to seed (default: a temporary SQLite file)")
+@click.option("--worker-class", default="gevent", help="gunicorn worker class")
+@click.option("--seed", default=0, help="Random seed of the request mix")
+@click.option("--json", "as_json", is_flag=True, help="Print one JSON object per run")
+@with_appcontext
+def loadtest(workers, concurrency, duration, warmup, mix, users, posts, database_url, worker_class, seed, as_json):
+    """Load test the API under gunicorn, sweeping worker counts and concurrency."""
+    import json
+    import tempfile
+
+    from flask import current_app
+
+    from flask_blog_api.loadtest import Server, drive
+    from flask_blog_api.loadtest import seed as seed_database
+
+    scratch = None
+    if database_url is None:
+        scratch = tempfile.mkdtemp(prefix="loadtest-")
+        database_url = f"sqlite:///{os.path.join(scratch, 'loadtest.db')}"
+    env = {
+        # The server hashes at the rounds the accounts were seeded with
+        "BCRYPT_LOG_ROUNDS": str(current_app.config["BCRYPT_LOG_ROUNDS"]),
+        "SECRET_KEY": os.environ.get("SECRET_KEY", current_app.config["SECRET_KEY"]),
+        "SEND_FILE_MAX_AGE_DEFAULT": os.environ.get("SEND_FILE_MAX_AGE_DEFAULT", "0"),
+        "FLASK_ENV": "production",
+    }
+    try:
+        try:
+            seed_database(database_url, users, posts, max(concurrency))
+        except ValueError as error:
+            raise click.UsageError(str(error))
+        for worker_count in workers:
+            with Server(database_url, worker_count, env=env, worker_class=worker_class) as server:
+                for clients in concurrency:
+                    result = drive(server, mix, clients, duration, warmup, users, posts, seed)
+                    if as_json:
+                        click.echo(json.dumps(dict(result, workers=worker_count, concurrency=clients)))
+                        continue
+                    total = result["total"]
+                    click.echo(
+                        f"== {worker_count} worker(s), {clients} client(s): "
+                        f"{total['rps']:.1f} req/s, {total['errors']} error(s)"
+                    )
+                    for label, summary in sorted(result["endpoints"].items()) + [("total", total)]:
+                        latencies = "  ".join(
+                            f"{point}={summary[point + '_ms']:8.2f}ms" if summary[point + "_ms"] is not None
+                            else f"{point}=       -"
+                            for point in ("p50", "p95", "p99")
+                        )
+                        click.echo(
+                            f"  {label:<36} {summary['rps']:8.1f} req/s  {latencies}  errors={summary['errors']}"
+                        )
+    finally:
+        if scratch is not None:
+            import shutil
+
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+@click.command()
+@click.option(
+    "-p", "--profile", "profiles", multiple=True, type=click.Choice(["full", "api"]),
+    help="APP_PROFILE to measure; repeat for several (default: both)",
+)
+@click.option("-n", "--top", default=15, help="Number of packages to list")
+@click.option("--json", "as_json", is_flag=True, help="Print one JSON object per profile")
+def importtime(profiles, top, as_json):
+    """Report the import time of a new worker, per package, for each app profile."""
+    import json
+
+    from flask_blog_api.importtime import by_package, measure
+
+    for profile in profiles or ("full", "api"):
+        try:
+            result = measure(profile)
+        except RuntimeError as error:
+            raise click.ClickException(str(error))
+        packages = by_package(result["modules"])
+        imports_ms = sum(self_us for _, self_us in packages) / 1e3
+        if as_json:
+            click.echo(json.dumps({
+                "profile": profile,
+                "create_app_ms": result["seconds"] * 1e3,
+                "imports_ms": imports_ms,
+                "modules": len(result["modules"]),
+                "packages": {package: self_us / 1e3 for package, self_us in packages},
+            }))
+            continue
+        click.echo(
+            f"== APP_PROFILE={profile}: create_app {result['seconds'] * 1e3:.0f}ms, "
+            f"{len(result['modules'])} modules imported in {imports_ms:.0f}ms"
+        )
+        for package, self_us in packages[:top]:
+            click.echo(f"  {package:<32} {self_us / 1e3:8.1f}ms")
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Negotiated gzip and brotli compression of responses."""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is always available
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    "application/json",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "application/javascript",
+)
+
+
+def _gzip(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # Sync-flush every chunk so the client gets it now, not when the buffer fills
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, level):
+    compressor = brotli.Compressor(quality=level)
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+#: ``Content-Encoding`` -> (compress, compress stream, level config key), in order of preference
+ENCODINGS = {"gzip": (_gzip, _gzip_stream, "COMPRESS_LEVEL")}
+if brotli is not None:
+    ENCODINGS = dict(br=(_brotli, _brotli_stream, "COMPRESS_BROTLI_LEVEL"), **ENCODINGS)
+
+
+class Compressor(object):
+    """Compress responses with the best encoding the client accepts.
+
+    Responses whose mimetype is in ``COMPRESS_MIMETYPES`` are compressed with
+    brotli (when the ``brotli`` package is installed) or gzip, at
+    ``COMPRESS_BROTLI_LEVEL`` and ``COMPRESS_LEVEL`` respectively. Bodies
+    shorter than ``COMPRESS_MIN_SIZE`` bytes are sent as they are. Streamed
+    responses are compressed chunk by chunk and flushed after every chunk, so
+    they are still delivered progressively.
+
+    Responses served from the response cache keep their compressed body next
+    to the cache entry, so a cache hit is not compressed again.
+
+    Must be initialized before the extensions that register ``after_request``
+    hooks changing the body, so that it runs after them.
+    """
+
+    def __init__(self, response_cache, app=None):
+        """Create instance."""
+        self.response_cache = response_cache
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the compression hook."""
+        app.config.setdefault("COMPRESS_ENABLED", True)
+        app.config.setdefault("COMPRESS_MIN_SIZE", 500)
+        app.config.setdefault("COMPRESS_LEVEL", 6)
+        app.config.setdefault("COMPRESS_BROTLI_LEVEL", 4)
+        app.config.setdefault("COMPRESS_MIMETYPES", DEFAULT_MIMETYPES)
+        self.config = app.config
+        app.after_request(self.compress_response)
+        app.extensions["compressor"] = self
+
+    def negotiate(self):
+        """Return the accepted encoding with the highest quality, or ``None``."""
+        best, best_quality = None, 0
+        for encoding in ENCODINGS:
+            quality = request.accept_encodings.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress_response(self, response):
+        """Compress ``response`` if the client accepts it and it is worth it."""
+        if not self.config["COMPRESS_ENABLED"] or response.mimetype not in self.config["COMPRESS_MIMETYPES"]:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if response.direct_passthrough or "Content-Encoding" in response.headers:
+            return response
+        if "no-transform" in response.headers.get("Cache-Control", ""):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        compress, compress_stream, level_key = ENCODINGS[encoding]
+        level = self.config[level_key]
+
+        if response.is_streamed:
+            response.response = compress_stream(response.iter_encoded(), level)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.config["COMPRESS_MIN_SIZE"]:
+                return response
+            compressed = self.response_cache.get_variant(encoding, data)
+            if compressed is None:
+                compressed = compress(data, level)
+                self.response_cache.set_variant(encoding, data, compressed)
+            response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        # The compressed body is a different representation of the same content
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
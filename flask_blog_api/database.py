@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
 """Database module, including the SQLAlchemy database object and DB-related utilities."""
+import sqlite3
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
 from .compat import basestring
 from .extensions import db
 
@@ -8,6 +14,87 @@ Column = db.Column
 relationship = db.relationship
 
 
+@event.listens_for(Engine, "savepoint")
+def _sqlite_begin_before_savepoint(connection, name):
+    # pysqlite only sends BEGIN before DML, so a SAVEPOINT outside a
+    # transaction would open one itself and releasing it would commit
+    # everything; begin first, which pysqlite then recognizes.
+    dbapi_connection = connection.connection.connection
+    if isinstance(dbapi_connection, sqlite3.Connection) and not dbapi_connection.in_transaction:
+        dbapi_connection.execute("BEGIN")
+
+
+def in_unit_of_work():
+    """Return ``True`` if writes are currently being grouped into a unit of work."""
+    return db.session.info.get("unit_of_work", 0) > 0
+
+
+def begin_unit_of_work():
+    """Start a unit of work on the current session, or a savepoint inside the open one."""
+    info = db.session.info
+    if info.get("unit_of_work", 0) > 0:
+        info.setdefault("unit_of_work_savepoints", []).append(db.session.begin_nested())
+    info["unit_of_work"] = info.get("unit_of_work", 0) + 1
+
+
+def end_unit_of_work(commit=True):
+    """Leave a unit of work, committing it or rolling it back if ``commit`` is false.
+
+    Inner units release or roll back their savepoint, so the writes of an
+    inner unit that failed are gone even if the outer one commits.
+    """
+    info = db.session.info
+    depth = info.get("unit_of_work", 0) - 1
+    info["unit_of_work"] = max(depth, 0)
+    if depth > 0:
+        savepoint = info["unit_of_work_savepoints"].pop()
+        if commit:
+            savepoint.commit()
+        else:
+            savepoint.rollback()
+        return
+    if commit:
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    else:
+        db.session.rollback()
+
+
+def commit_session():
+    """Commit the session, or only flush it while a unit of work is open."""
+    if in_unit_of_work():
+        db.session.flush()
+    else:
+        db.session.commit()
+
+
+@contextmanager
+def unit_of_work():
+    """Group writes into a single transaction.
+
+    CRUD calls inside the block flush instead of committing; the transaction is
+    committed once when the outermost block exits, or rolled back if it raises.
+    A nested block runs in a savepoint: if it raises, its writes are rolled
+    back even when the exception is caught and the outer block commits.
+
+    Usage: ::
+
+        with unit_of_work():
+            user.update(first_name="Foo")
+            Post.create(user=user, title="Hello", content="World")
+    """
+    begin_unit_of_work()
+    try:
+        yield db.session
+    except BaseException:
+        end_unit_of_work(commit=False)
+        raise
+    end_unit_of_work()
+
+
 class CRUDMixin(object):
     """Mixin that adds convenience methods for CRUD (create, read, update, delete) operations."""
 
@@ -27,13 +114,13 @@ class CRUDMixin(object):
         """Save the record."""
         db.session.add(self)
         if commit:
-            db.session.commit()
+            commit_session()
         return self
 
     def delete(self, commit=True):
         """Remove the record from the database."""
         db.session.delete(self)
-        return commit and db.session.commit()
+        return commit and commit_session()
 
 
 class Model(CRUDMixin, db.Model):
@@ -65,17 +152,25 @@ class SurrogatePK(object):
 
 
 def reference_col(
-    tablename, nullable=False, pk_name="id", foreign_key_kwargs=None, column_kwargs=None
+    tablename,
+    nullable=False,
+    pk_name="id",
+    foreign_key_kwargs=None,
+    column_kwargs=None,
+    index=True,
 ):
     """Column that adds primary key foreign key reference.
 
+    The column is indexed unless ``index=False``, e.g. when a composite
+    index in ``__table_args__`` already starts with it.
+
     Usage: ::
 
         category_id = reference_col('category')
         category = relationship('Category', backref='categories')
     """
     foreign_key_kwargs = foreign_key_kwargs or {}
-    column_kwargs = column_kwargs or {}
+    column_kwargs = dict({"index": index}, **(column_kwargs or {}))
 
     return Column(
         db.ForeignKey(f"{tablename}.{pk_name}", **foreign_key_kwargs),
@@ -1,19 +1,39 @@
 # -*- coding: utf-8 -*-
-"""Extensions module. Each extension is initialized in the app factory located in app.py."""
+"""Extensions module. Each extension is initialized in the app factory located in app.py.
+
+The extensions only the HTML site and the development tools use are lazy, so
+API-only workers (``APP_PROFILE = "api"``) never import them.
+"""
 from flask_bcrypt import Bcrypt
 from flask_caching import Cache
-from flask_debugtoolbar import DebugToolbarExtension
 from flask_login import LoginManager
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-from flask_static_digest import FlaskStaticDigest
-from flask_wtf.csrf import CSRFProtect
+
+from flask_blog_api.auth import AccessTokens, CredentialCache
+from flask_blog_api.budget import QueryBudget
+from flask_blog_api.caching import ResponseCache
+from flask_blog_api.compression import Compressor
+from flask_blog_api.hashing import PasswordHasher
+from flask_blog_api.lazy import LazyExtension
+from flask_blog_api.metrics import Metrics
+from flask_blog_api.pool import DatabasePool
+from flask_blog_api.replicas import ReplicaRouter, RoutingSQLAlchemy
+from flask_blog_api.serialization import JSONEncoder
 
 bcrypt = Bcrypt()
-csrf_protect = CSRFProtect()
+csrf_protect = LazyExtension("flask_wtf.csrf:CSRFProtect")
 login_manager = LoginManager()
-db = SQLAlchemy()
-migrate = Migrate()
+db = RoutingSQLAlchemy()
+migrate = LazyExtension("flask_migrate:Migrate")
 cache = Cache()
-debug_toolbar = DebugToolbarExtension()
-flask_static_digest = FlaskStaticDigest()
+debug_toolbar = LazyExtension("flask_debugtoolbar:DebugToolbarExtension")
+flask_static_digest = LazyExtension("flask_static_digest:FlaskStaticDigest")
+credential_cache = CredentialCache()
+access_tokens = AccessTokens()
+password_hasher = PasswordHasher(bcrypt)
+response_cache = ResponseCache(cache, db)
+compressor = Compressor(response_cache)
+database_pool = DatabasePool()
+metrics = Metrics(password_hasher, database_pool)
+request_budget = QueryBudget()
+json_encoder = JSONEncoder()
+replica_router = ReplicaRouter(db, cache)
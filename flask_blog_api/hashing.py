@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Password hashing executor.
+
+bcrypt is deliberately slow, and under ``gunicorn -k gevent`` a hash computed
+on the request greenlet blocks every other request served by that worker.
+:class:`PasswordHasher` runs the Flask-Bcrypt calls on a pool instead, chosen
+with ``BCRYPT_EXECUTOR``:
+
+* ``"inline"`` hashes on the calling thread (the previous behaviour).
+* ``"thread"`` uses native threads; bcrypt releases the GIL, so hashes run in
+  parallel. Under gevent the hub's native threadpool is used and the calling
+  greenlet yields until the hash is ready.
+* ``"process"`` uses a process pool, for interpreters where hashing holds the GIL.
+
+``BCRYPT_EXECUTOR_WORKERS`` sizes the pool and defaults to the number of cores.
+
+Callbacks registered with :meth:`PasswordHasher.timer` receive the seconds
+each call waited for its hashes, queueing on the pool included.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTORS = ("inline", "thread", "process")
+
+
+def _gevent_hub():
+    """Return the gevent hub if this process has been monkey-patched, else ``None``."""
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return None
+    if not monkey.is_module_patched("threading"):
+        return None
+    return get_hub()
+
+
+class PasswordHasher(object):
+    """Run Flask-Bcrypt hashing and verification through a configurable executor."""
+
+    def __init__(self, bcrypt, app=None):
+        """Create instance."""
+        self.bcrypt = bcrypt
+        self.mode = "inline"
+        self.workers = 1
+        self._executor = None
+        self._timers = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create the executor configured for ``app``."""
+        app.config.setdefault("BCRYPT_EXECUTOR", "inline")
+        app.config.setdefault("BCRYPT_EXECUTOR_WORKERS", None)
+        mode = app.config["BCRYPT_EXECUTOR"]
+        if mode not in EXECUTORS:
+            raise ValueError(f"BCRYPT_EXECUTOR must be one of {EXECUTORS}, not {mode!r}")
+        self.shutdown()
+        self.mode = mode
+        self.workers = app.config["BCRYPT_EXECUTOR_WORKERS"] or os.cpu_count() or 1
+        app.extensions["password_hasher"] = self
+
+    def _get_executor(self):
+        if self._executor is None and self.mode != "inline":
+            pool = ThreadPoolExecutor if self.mode == "thread" else ProcessPoolExecutor
+            # Created lazily so that gunicorn workers get their own pool after fork
+            self._executor = pool(max_workers=self.workers)
+        return self._executor
+
+    def timer(self, f):
+        """Register ``f(seconds)`` to be called after every hashing call."""
+        self._timers.append(f)
+        return f
+
+    def _timed(self, call, fn, *args):
+        if not self._timers:
+            return call(fn, *args)
+        started = time.perf_counter()
+        try:
+            return call(fn, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            for timer in self._timers:
+                timer(elapsed)
+
+    def _run(self, fn, *args):
+        if self.mode == "inline":
+            return fn(*args)
+        hub = _gevent_hub()
+        if hub is None:
+            return self._get_executor().submit(fn, *args).result()
+        threadpool = hub.threadpool
+        if threadpool.maxsize < self.workers:
+            threadpool.maxsize = self.workers
+        if self.mode == "thread":
+            return threadpool.apply(fn, args)
+        # Wait for the process pool on a native thread so the hub keeps running
+        future = self._get_executor().submit(fn, *args)
+        return threadpool.apply(future.result)
+
+    def _map(self, fn, items):
+        if self.mode == "inline":
+            return [fn(item) for item in items]
+        hub = _gevent_hub()
+        if hub is None:
+            return list(self._get_executor().map(fn, items))
+        threadpool = hub.threadpool
+        if threadpool.maxsize < self.workers:
+            threadpool.maxsize = self.workers
+        if self.mode == "thread":
+            return list(threadpool.imap(fn, items))
+        return threadpool.apply(lambda: list(self._get_executor().map(fn, items)))
+
+    def generate_password_hash(self, password):
+        """Hash ``password`` with bcrypt on the configured executor."""
+        return self._timed(self._run, self.bcrypt.generate_password_hash, password)
+
+    def generate_password_hashes(self, passwords):
+        """Hash many passwords, spread across the executor's workers."""
+        return self._timed(self._map, self.bcrypt.generate_password_hash, passwords)
+
+    def check_password_hash(self, pw_hash, password):
+        """Check ``password`` against ``pw_hash`` on the configured executor."""
+        return self._timed(self._run, self.bcrypt.check_password_hash, pw_hash, password)
+
+    def shutdown(self):
+        """Stop the current executor, if any."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
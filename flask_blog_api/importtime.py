@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Cold-start measurements of the app factory.
+
+:func:`measure` creates the app in a fresh interpreter started with
+``python -X importtime``, the way a new gunicorn worker does, and returns the
+wall time of importing and calling ``create_app`` together with the import
+time of every module. ``flask importtime`` prints them per package, for each
+``APP_PROFILE``.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from flask_blog_api.app import create_app
+create_app()
+sys.stdout.write(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+
+def parse(report):
+    """Parse ``-X importtime`` output into ``(module, self_us, cumulative_us)`` tuples, in import order."""
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # The header line
+        modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return modules
+
+
+def by_package(modules):
+    """Return ``[(package, self_us), ...]``: the import time of each top-level package, slowest first."""
+    totals = defaultdict(int)
+    for module, self_us, _ in modules:
+        totals[module.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def measure(profile, env=None, importtime=True):
+    """Create the app under ``APP_PROFILE=profile`` in a new interpreter.
+
+    Returns ``{"seconds": wall time of import + create_app, "modules": parse(...)}``.
+    ``env`` is added to the current environment. ``-X importtime`` slows
+    imports down; without ``importtime`` the seconds are accurate and the
+    module list is empty.
+    """
+    environ = dict(os.environ, APP_PROFILE=profile, **(env or {}))
+    flags = ["-X", "importtime"] if importtime else []
+    result = subprocess.run(
+        [sys.executable] + flags + ["-c", SCRIPT], env=environ,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"create_app failed under APP_PROFILE={profile}:\n{result.stderr[-2000:]}")
+    return dict(json.loads(result.stdout), modules=parse(result.stderr))
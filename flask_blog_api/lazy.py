@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Extensions created on first use."""
+import importlib
+
+
+class LazyExtension(object):
+    """Stand in for an extension, importing and creating it the first time it is used.
+
+    ``path`` is ``"module:Class"``; ``args`` and ``kwargs`` are passed to the
+    class. An app that never initializes the extension never imports it.
+    """
+
+    def __init__(self, path, *args, **kwargs):
+        """Create instance."""
+        self._path = path
+        self._args = args
+        self._kwargs = kwargs
+        self._instance = None
+
+    @property
+    def loaded(self):
+        """Whether the extension has been imported and created."""
+        return self._instance is not None
+
+    def _load(self):
+        if self._instance is None:
+            module, _, name = self._path.partition(":")
+            self._instance = getattr(importlib.import_module(module), name)(*self._args, **self._kwargs)
+        return self._instance
+
+    def __getattr__(self, name):
+        """Forward to the extension, creating it first."""
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyExtension({self._path}) {state}>"
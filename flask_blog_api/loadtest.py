@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""End-to-end load testing against gunicorn.
+
+``flask loadtest`` seeds a scratch database, boots the app the way
+``supervisord_programs/gunicorn.conf`` runs it (``-k gevent`` with
+``--max-requests``) and drives it from client threads, each with its own
+keep-alive connection and account. Every request is drawn from a weighted
+mix of scenarios (:data:`SCENARIOS`), and every combination of worker count
+and concurrency reports throughput and p50/p95/p99 latency per endpoint.
+
+The database defaults to a temporary SQLite file, which serializes writes
+across workers; pass an empty PostgreSQL database to measure the real thing.
+The client is plain Python threads, so check that it is not the bottleneck
+(it uses one core) before reading too much into the highest concurrencies.
+"""
+import base64
+import datetime as dt
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import sqlalchemy
+
+from flask_blog_api.extensions import db, password_hasher
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+PROJECT_ROOT = os.path.join(HERE, os.pardir)
+PASSWORD = "load-test-password"
+SEED_CHUNK_SIZE = 5000
+
+
+def _post_owner(post_id, users):
+    # Post ``i`` (1-based) was seeded for user ``(i - 1) % users``
+    return f"user{(post_id - 1) % users}"
+
+
+def _list_users(client):
+    return "GET", "/api/v0/users", "GET /users", None
+
+
+def _get_user(client):
+    return "GET", f"/api/v0/users/user{client.rng.randrange(client.users)}", "GET /users/<username>", None
+
+
+def _list_posts(client):
+    username = f"user{client.rng.randrange(client.users)}"
+    return "GET", f"/api/v0/users/{username}/posts", "GET /users/<username>/posts", None
+
+
+def _get_post(client):
+    post_id = client.rng.randrange(client.posts) + 1
+    path = f"/api/v0/users/{_post_owner(post_id, client.users)}/posts/{post_id}"
+    return "GET", path, "GET /users/<username>/posts/<id>", None
+
+
+def _search(client):
+    return "GET", f"/api/v0/posts/search?q=post+{client.rng.randrange(client.posts)}", "GET /posts/search", None
+
+
+def _create_post(client):
+    body = {"title": "load test", "content": "written by the load test", "active": True}
+    return "POST", f"/api/v0/users/{client.username}/posts", "POST /users/<username>/posts", body
+
+
+def _update_post(client):
+    post_id = client.rng.randrange(client.posts) + 1
+    path = f"/api/v0/users/{_post_owner(post_id, client.users)}/posts/{post_id}"
+    return "PUT", path, "PUT /users/<username>/posts/<id>", {"title": f"edited {post_id}"}
+
+
+def _issue_token(client):
+    return "POST", "/api/v0/token", "POST /token", None
+
+
+def _token_read(client):
+    username = f"user{client.rng.randrange(client.users)}"
+    return "GET", f"/api/v0/users/{username}", "GET /users/<username> (bearer)", None
+
+
+#: Scenario name -> function of a :class:`Client` returning ``(method, path, label, json body)``
+SCENARIOS = {
+    "list_users": _list_users,
+    "get_user": _get_user,
+    "list_posts": _list_posts,
+    "get_post": _get_post,
+    "search": _search,
+    "create_post": _create_post,
+    "update_post": _update_post,
+    "issue_token": _issue_token,
+    "token_read": _token_read,
+}
+#: Scenarios authenticated with the client's bearer token instead of HTTP Basic
+BEARER_SCENARIOS = frozenset(["token_read"])
+DEFAULT_MIX = {
+    "list_users": 5,
+    "get_user": 15,
+    "list_posts": 20,
+    "get_post": 25,
+    "search": 10,
+    "create_post": 8,
+    "update_post": 5,
+    "issue_token": 2,
+    "token_read": 10,
+}
+
+
+def parse_mix(value):
+    """Parse ``name=weight,...`` into a scenario mix; unnamed scenarios are left out."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of: {', '.join(SCENARIOS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {name!r}: {weight!r}")
+        if mix[name] < 0:
+            raise ValueError(f"Invalid weight for {name!r}: {weight!r}")
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one scenario with a positive weight")
+    return mix
+
+
+def percentile(ordered, point):
+    """Return the ``point`` percentile of the sorted list ``ordered`` (nearest rank)."""
+    index = min(len(ordered) - 1, max(0, int(round(point / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples, errors, seconds):
+    """Summarize latencies in seconds: count, errors, throughput and percentiles in milliseconds."""
+    ordered = sorted(samples)
+    summary = {"requests": len(ordered) + errors, "errors": errors, "rps": len(ordered) / seconds}
+    for point in (50, 95, 99):
+        summary[f"p{point}_ms"] = percentile(ordered, point) * 1e3 if ordered else None
+    return summary
+
+
+def seed(url, users, posts, clients):
+    """Create the schema at ``url`` and seed it; returns the number of posts.
+
+    ``users`` authors share ``posts`` posts, and every client thread gets its
+    own ``load<n>`` account. Refuses to touch a database that already has tables.
+    """
+    engine = sqlalchemy.create_engine(url)
+    try:
+        if sqlalchemy.inspect(engine).get_table_names():
+            raise ValueError(f"Refusing to seed {engine.url!r}: the database is not empty")
+        db.Model.metadata.create_all(engine)
+        now = dt.datetime.utcnow()
+        password = password_hasher.generate_password_hash(PASSWORD)
+        accounts = [f"user{i}" for i in range(users)] + [f"load{i}" for i in range(clients)]
+        with engine.begin() as connection:
+            connection.execute(db.Model.metadata.tables["users"].insert(), [
+                {"username": name, "email": f"{name}@example.com", "password": password,
+                 "first_name": "Load", "last_name": name, "created_at": now, "updated_at": now,
+                 "token_generation": 0, "active": True, "is_admin": False}
+                for name in accounts
+            ])
+            table = db.Model.metadata.tables["posts"]
+            for start in range(0, posts, SEED_CHUNK_SIZE):
+                connection.execute(table.insert(), [
+                    {"user_id": i % users + 1, "title": f"post {i}", "content": f"content of post {i} " * 5,
+                     "created_at": now + dt.timedelta(seconds=i), "updated_at": now, "active": True}
+                    for i in range(start, min(posts, start + SEED_CHUNK_SIZE))
+                ])
+    finally:
+        engine.dispose()
+    return posts
+
+
+def free_port(host="127.0.0.1"):
+    """Return a TCP port that is free on ``host``."""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class Server(object):
+    """A gunicorn process serving the app with the production worker settings."""
+
+    def __init__(self, database_url, workers, host="127.0.0.1", port=None, env=None, worker_class="gevent",
+                 app="flask_blog_api.app:create_app()"):
+        """Create instance; ``env`` is added to the server's environment."""
+        self.host = host
+        self.port = port or free_port(host)
+        self.command = [
+            sys.executable, "-m", "gunicorn", app,
+            "-c", os.path.join(PROJECT_ROOT, "gunicorn.conf.py"),
+            "-b", f"{host}:{self.port}",
+            "-w", str(workers),
+            "-k", worker_class,
+            "--max-requests=5000",
+            "--max-requests-jitter=500",
+            "--log-level=warning",
+        ]
+        self.env = dict(os.environ, DATABASE_URL=database_url, **(env or {}))
+        self.process = None
+
+    def start(self, timeout=30):
+        """Start gunicorn and wait until it answers; raises ``RuntimeError`` if it does not."""
+        self.process = subprocess.Popen(self.command, cwd=PROJECT_ROOT, env=self.env)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {self.process.returncode}")
+            try:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=1)
+                connection.request("GET", "/")
+                connection.getresponse().read()
+                connection.close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"gunicorn did not answer on {self.host}:{self.port} within {timeout}s")
+
+    def stop(self):
+        """Shut gunicorn down gracefully."""
+        if self.process is not None and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def __enter__(self):
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, *exc):
+        """Stop the server."""
+        self.stop()
+
+
+class Client(threading.Thread):
+    """A client thread sending requests drawn from ``mix`` over one keep-alive connection."""
+
+    def __init__(self, index, server, mix, users, posts, seed=0):
+        """Create instance; the client logs in as ``load<index>``."""
+        super(Client, self).__init__(name=f"loadtest-client-{index}", daemon=True)
+        self.server = server
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.users = users
+        self.posts = posts
+        self.username = f"load{index}"
+        self.rng = random.Random(seed * 100003 + index)
+        basic = base64.b64encode(f"{self.username}:{PASSWORD}".encode()).decode()
+        self.basic = f"Basic {basic}"
+        self.bearer = None
+        self.connection = None
+        self.recording = False
+        self.stopping = threading.Event()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def _connect(self):
+        self.connection = http.client.HTTPConnection(self.server.host, self.server.port, timeout=30)
+
+    def send(self, method, path, body=None, authorization=None):
+        """Send one request and return ``(status, body)``; reconnects once after a dropped connection."""
+        headers = {"Authorization": authorization or self.basic}
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in (1, 2):
+            if self.connection is None:
+                self._connect()
+            try:
+                self.connection.request(method, path, data, headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                # gunicorn recycles workers (--max-requests) and closes idle keep-alives
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+
+    def run(self):
+        """Send requests until stopped, recording latencies while ``recording`` is set."""
+        status, body = self.send("POST", "/api/v0/token")
+        if status == 200:
+            self.bearer = f"Bearer {json.loads(body)['token']}"
+        while not self.stopping.is_set():
+            name = self.rng.choices(self.names, self.weights)[0]
+            method, path, label, body = SCENARIOS[name](self)
+            authorization = self.bearer if name in BEARER_SCENARIOS else None
+            started = time.perf_counter()
+            try:
+                status, _ = self.send(method, path, body, authorization)
+            except (http.client.HTTPException, OSError):
+                status = None
+            elapsed = time.perf_counter() - started
+            if not self.recording:
+                continue
+            if status is None or status >= 400:
+                self.errors[label] += 1
+            else:
+                self.latencies[label].append(elapsed)
+        if self.connection is not None:
+            self.connection.close()
+
+
+def drive(server, mix, concurrency, duration, warmup, users, posts, seed=0):
+    """Run ``concurrency`` clients against ``server`` and summarize the requests per endpoint.
+
+    Requests sent during the first ``warmup`` seconds are not recorded.
+    Returns ``{"total": summary, "endpoints": {label: summary}}``.
+    """
+    clients = [Client(index, server, mix, users, posts, seed) for index in range(concurrency)]
+    for client in clients:
+        client.start()
+    time.sleep(warmup)
+    for client in clients:
+        client.recording = True
+    started = time.perf_counter()
+    time.sleep(duration)
+    for client in clients:
+        client.recording = False
+    seconds = time.perf_counter() - started
+    for client in clients:
+        client.stopping.set()
+    for client in clients:
+        client.join()
+
+    latencies, errors = defaultdict(list), defaultdict(int)
+    for client in clients:
+        for label, samples in client.latencies.items():
+            latencies[label].extend(samples)
+        for label, count in client.errors.items():
+            errors[label] += count
+    labels = sorted(set(latencies) | set(errors))
+    return {
+        "total": summarize([s for label in labels for s in latencies[label]], sum(errors.values()), seconds),
+        "endpoints": {label: summarize(latencies[label], errors[label], seconds) for label in labels},
+    }
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Request instrumentation exported in the Prometheus text format.
+
+Every request is recorded under its Flask endpoint (for Flask-RESTful
+resources, the resource name) and HTTP method, which together identify the
+resource method that served it:
+
+* ``http_request_duration_seconds``: latency until the response is handed to
+  the server (streamed bodies are generated later and not included).
+* ``http_response_size_bytes``: body size as sent, after compression.
+* ``http_request_sql_statements`` and ``http_request_sql_duration_seconds``:
+  statements executed per request and the time spent in them, from
+  SQLAlchemy engine events.
+* ``http_request_bcrypt_seconds_total``: time spent hashing passwords.
+
+The connection pool is recorded across requests:
+
+* ``db_pool_checkout_wait_seconds``: time each checkout waited for a pooled
+  connection, including opening a new one.
+* ``db_pool_checkout_timeouts_total``: checkouts that gave up after
+  ``DB_POOL_TIMEOUT``.
+
+The async handlers of the ASGI entry point record their requests too, with
+their statements counted by :meth:`Metrics.record_statement`.
+
+``GET /metrics`` serves them to the clients in ``METRICS_ALLOWED_NETWORKS``
+(loopback only by default) and answers 404 to everyone else. When ``PROMETHEUS_MULTIPROC_DIR`` is set (it
+must be before the app is imported, and ``gunicorn.conf.py`` empties it on
+start) every gunicorn worker writes its samples there, and the endpoint
+aggregates all workers, whichever one answers the scrape.
+"""
+import ipaddress
+import os
+import time
+from contextvars import ContextVar
+
+from flask import Response, abort, g, has_app_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LABELS = ("endpoint", "method")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency.", LABELS + ("status",)
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size as sent.", LABELS,
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000),
+)
+SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request.", LABELS,
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds", "Time spent executing SQL per request.", LABELS,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+BCRYPT_SECONDS = Counter(
+    "http_request_bcrypt_seconds", "Time spent hashing and checking passwords.", LABELS
+)
+
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts", "Checkouts that timed out waiting for a pooled database connection."
+)
+
+
+def multiprocess_dir():
+    """Return the directory shared by the worker processes, or ``None`` in single-process mode."""
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+
+class RequestStats(object):
+    """Counters of the request being served."""
+
+    __slots__ = ("started", "statements", "sql_seconds", "bcrypt_seconds")
+
+    def __init__(self):
+        """Create instance."""
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+
+
+#: Stats of the request served outside Flask, by the ASGI entry point's async handlers
+async_request_stats = ContextVar("async_request_stats", default=None)
+
+
+def _current():
+    if has_app_context():
+        return g.get("request_stats")
+    return async_request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    started = conn.info.get("query_started")
+    if stats is not None and started:
+        stats.statements += 1
+        stats.sql_seconds += time.perf_counter() - started.pop()
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    connection = context.connection
+    started = connection.info.get("query_started") if connection is not None else None
+    if started:
+        started.pop()
+
+
+class Metrics(object):
+    """Record per-endpoint request metrics and serve them on ``METRICS_PATH``.
+
+    Must be initialized before the extensions whose ``after_request`` hooks
+    change the body (compression), so that it measures the final response.
+    """
+
+    def __init__(self, password_hasher, database_pool, app=None):
+        """Create instance."""
+        self.password_hasher = password_hasher
+        self.database_pool = database_pool
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the request hooks, the SQL listeners and the ``/metrics`` route."""
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.config.setdefault("METRICS_PATH", "/metrics")
+        app.config.setdefault("METRICS_ALLOWED_NETWORKS", ["127.0.0.1/32", "::1/128"])
+        if not app.config["METRICS_ENABLED"]:
+            return
+        if not self._listening:
+            # On the Engine class, so every bind and replica is covered
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(Engine, "handle_error", _handle_error)
+            self.password_hasher.timer(self._record_bcrypt)
+            self.database_pool.checkout_stats.timer(self._record_checkout)
+            self._listening = True
+        self.allowed_networks = [
+            ipaddress.ip_network(network, strict=False) for network in app.config["METRICS_ALLOWED_NETWORKS"]
+        ]
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule(app.config["METRICS_PATH"], "metrics", self.export)
+        app.extensions["metrics"] = self
+
+    def _start_request(self):
+        g.request_stats = RequestStats()
+
+    def _record_bcrypt(self, seconds):
+        stats = _current()
+        if stats is not None:
+            stats.bcrypt_seconds += seconds
+
+    @staticmethod
+    def _record_checkout(seconds, timed_out):
+        POOL_WAIT.observe(seconds)
+        if timed_out:
+            POOL_TIMEOUTS.inc()
+
+    def _finish_request(self, response):
+        stats = g.pop("request_stats", None)
+        if stats is None:
+            return response
+        self.observe(request.endpoint or "unmatched", request.method, response.status_code, stats,
+                     response.content_length)
+        return response
+
+    def observe(self, endpoint, method, status, stats, size=None):
+        """Record a finished request measured by ``stats``, with a body of ``size`` bytes if known."""
+        REQUEST_LATENCY.labels(endpoint, method, status).observe(time.perf_counter() - stats.started)
+        SQL_STATEMENTS.labels(endpoint, method).observe(stats.statements)
+        SQL_DURATION.labels(endpoint, method).observe(stats.sql_seconds)
+        if stats.bcrypt_seconds:
+            BCRYPT_SECONDS.labels(endpoint, method).inc(stats.bcrypt_seconds)
+        if size is not None:
+            RESPONSE_SIZE.labels(endpoint, method).observe(size)
+
+    @staticmethod
+    def record_statement(seconds):
+        """Count a statement that took ``seconds`` against the current request, if any."""
+        stats = _current()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += seconds
+
+    def registry(self):
+        """Return the registry to export: every worker's samples in multiprocess mode."""
+        if multiprocess_dir() is None:
+            return REGISTRY
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    def is_allowed(self, address):
+        """Return ``True`` if ``address`` is in one of ``METRICS_ALLOWED_NETWORKS``."""
+        try:
+            address = ipaddress.ip_address(address or "")
+        except ValueError:
+            return False
+        return any(address in network for network in self.allowed_networks)
+
+    def export(self):
+        """Serve the metrics in the Prometheus text format to the allowed networks."""
+        if not self.is_allowed(request.remote_addr):
+            abort(404)
+        return Response(generate_latest(self.registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Database driver mode and connection pool tuning.
+
+Under ``gunicorn -k gevent`` the socket module is monkey-patched, but
+psycopg2 talks to PostgreSQL through libpq, which blocks the whole worker
+while a query runs. ``DB_COOPERATIVE`` installs a psycopg2 wait callback that
+polls the connection and yields to the gevent hub instead:
+
+* ``"auto"`` (the default) installs it when gevent has patched ``socket``.
+* ``True`` always installs it, and fails if psycopg2 or gevent is missing.
+* ``False`` never installs it.
+
+The pool is sized with ``DB_POOL_SIZE``, ``DB_MAX_OVERFLOW``,
+``DB_POOL_TIMEOUT``, ``DB_POOL_RECYCLE`` and ``DB_POOL_PRE_PING``, which are
+merged into ``SQLALCHEMY_ENGINE_OPTIONS`` (explicit engine options win).
+SQLite files keep Flask-SQLAlchemy's pool unless ``DB_POOL_SIZE`` is set, and
+in-memory SQLite always does.
+Time spent waiting for a pooled connection is recorded in :meth:`DatabasePool.stats`
+and passed to the callbacks registered with :meth:`CheckoutStats.timer`.
+"""
+import threading
+import time
+
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+COOPERATIVE_MODES = ("auto", True, False)
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """psycopg2 wait callback that yields to the gevent hub while the server works."""
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
+
+
+def _socket_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def make_psycopg_cooperative():
+    """Install :func:`gevent_wait_callback` as psycopg2's wait callback."""
+    from psycopg2 import extensions
+
+    extensions.set_wait_callback(gevent_wait_callback)
+
+
+class CheckoutStats(object):
+    """Counters of the time spent waiting for pooled connections."""
+
+    def __init__(self):
+        """Create instance."""
+        self._lock = threading.Lock()
+        self._timers = []
+        self.reset()
+
+    def reset(self):
+        """Zero every counter."""
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, seconds, timed_out=False):
+        """Record one checkout that waited ``seconds``."""
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        for timer in self._timers:
+            timer(seconds, timed_out)
+
+    def timer(self, f):
+        """Register ``f(seconds, timed_out)`` to be called after every checkout."""
+        self._timers.append(f)
+        return f
+
+
+def timed_pool_class(stats, base=QueuePool):
+    """Return a subclass of ``base`` recording how long each checkout waits in ``stats``.
+
+    The wait covers queueing for a free connection and, when the pool is
+    below capacity, opening a new one. The class is bound to ``stats`` so
+    that pools recreated after a disconnect keep reporting to it.
+    """
+
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                stats.record(time.perf_counter() - started, timed_out=True)
+                raise
+            stats.record(time.perf_counter() - started)
+            return connection
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+class DatabasePool(object):
+    """Configure the database driver mode and the connection pool.
+
+    Must be initialized before Flask-SQLAlchemy creates its engine.
+    """
+
+    def __init__(self, app=None):
+        """Create instance."""
+        self.cooperative = False
+        self.checkout_stats = CheckoutStats()
+        self.pool_class = timed_pool_class(self.checkout_stats)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Install the wait callback and merge the pool settings into the engine options."""
+        app.config.setdefault("DB_COOPERATIVE", "auto")
+        app.config.setdefault("DB_POOL_SIZE", None)
+        app.config.setdefault("DB_MAX_OVERFLOW", None)
+        app.config.setdefault("DB_POOL_TIMEOUT", None)
+        app.config.setdefault("DB_POOL_RECYCLE", None)
+        app.config.setdefault("DB_POOL_PRE_PING", False)
+        mode = app.config["DB_COOPERATIVE"]
+        if isinstance(mode, str) and mode.lower() in ("true", "false"):
+            mode = mode.lower() == "true"
+        if mode not in COOPERATIVE_MODES:
+            raise ValueError(f"DB_COOPERATIVE must be one of {COOPERATIVE_MODES}, not {mode!r}")
+
+        url = make_url(app.config.get("SQLALCHEMY_DATABASE_URI") or "sqlite://")
+        self.cooperative = False
+        postgres = url.get_backend_name() == "postgresql"
+        if postgres and (mode is True or (mode == "auto" and _socket_patched())):
+            make_psycopg_cooperative()
+            self.cooperative = True
+
+        options = {}
+        if app.config["DB_POOL_RECYCLE"] is not None:
+            options["pool_recycle"] = app.config["DB_POOL_RECYCLE"]
+        if app.config["DB_POOL_PRE_PING"]:
+            options["pool_pre_ping"] = True
+        sqlite = url.get_backend_name() == "sqlite"
+        in_memory = sqlite and url.database in (None, "", ":memory:")
+        if not in_memory and (not sqlite or app.config["DB_POOL_SIZE"]):
+            options["poolclass"] = self.pool_class
+            if sqlite:
+                # Pooled SQLite connections are handed between threads
+                options["connect_args"] = {"check_same_thread": False}
+            for name, key in (
+                ("pool_size", "DB_POOL_SIZE"),
+                ("max_overflow", "DB_MAX_OVERFLOW"),
+                ("pool_timeout", "DB_POOL_TIMEOUT"),
+            ):
+                if app.config[key] is not None:
+                    options[name] = app.config[key]
+        options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+        self.checkout_stats.reset()
+        app.extensions["database_pool"] = self
+
+    def stats(self):
+        """Return the checkout counters and wait times in seconds."""
+        stats = self.checkout_stats
+        return {
+            "cooperative": self.cooperative,
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "wait_seconds_total": stats.wait_seconds_total,
+            "wait_seconds_max": stats.wait_seconds_max,
+            "wait_seconds_mean": stats.wait_seconds_total / stats.checkouts if stats.checkouts else 0.0,
+        }
@@ -11,7 +11,7 @@ from flask import (
 )
 from flask_login import login_required, login_user, logout_user
 
-from flask_blog_api.extensions import login_manager
+from flask_blog_api.extensions import login_manager, replica_router
 from flask_blog_api.public.forms import LoginForm
 from flask_blog_api.user.forms import RegisterForm
 from flask_blog_api.user.models import User
@@ -27,6 +27,7 @@ def load_user(user_id):
 
 
 @blueprint.route("/", methods=["GET", "POST"])
+@replica_router.reads
 def home():
     """Home page."""
     form = LoginForm(request.form)
@@ -53,6 +54,7 @@ def logout():
 
 
 @blueprint.route("/register/", methods=["GET", "POST"])
+@replica_router.reads
 def register():
     """Register new user."""
     form = RegisterForm(request.form)
@@ -73,6 +75,7 @@ def register():
 
 
 @blueprint.route("/about/")
+@replica_router.reads
 def about():
     """About page."""
     form = LoginForm(request.form)
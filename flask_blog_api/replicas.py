@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Read-replica routing for the database session.
+
+``SQLALCHEMY_REPLICA_URIS`` lists read replicas of ``SQLALCHEMY_DATABASE_URI``.
+They are registered as the Flask-SQLAlchemy binds ``replica0``, ``replica1``...
+Queries run inside :meth:`ReplicaRouter.reads` (GET and HEAD requests only)
+go to one replica, picked per request; flushes, bulk ``UPDATE``/``DELETE``
+statements and everything else stay on the primary.
+
+A client that wrote successfully reads from the primary for the next
+``DB_REPLICA_STICKY_SECONDS``, so it sees its own writes despite replication
+lag. Clients are told apart by API username, then login session, then
+address. The markers live in the Flask-Caching backend, which must be shared
+by every worker process (redis or memcached) for a write served by one worker
+to be honoured by the others; :meth:`ReplicaRouter.init_app` refuses to route
+to replicas with a per-process backend unless ``SINGLE_PROCESS`` is set.
+"""
+import random
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import orm
+from sqlalchemy.sql.dml import UpdateBase
+
+from flask_blog_api.caching import require_shared_cache
+
+READ_METHODS = ("GET", "HEAD")
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends reads to the replica named in ``info["db_replica"]``."""
+
+    def get_bind(self, mapper=None, clause=None):
+        """Return the replica engine for reads while routed, else the usual bind."""
+        replica = self.info.get("db_replica")
+        if replica is None or self._flushing or isinstance(clause, UpdateBase):
+            return super().get_bind(mapper, clause)
+        if mapper is not None and mapper.persist_selectable.info.get("bind_key") is not None:
+            return super().get_bind(mapper, clause)
+        return get_state(self.app).db.get_engine(self.app, bind=replica)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy whose sessions can route reads to replicas."""
+
+    def create_session(self, options):
+        """Create the session factory for :class:`RoutingSession`."""
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReplicaRouter(object):
+    """Route read-only request handlers to the configured read replicas."""
+
+    def __init__(self, db, cache, app=None):
+        """Create instance."""
+        self.db = db
+        self.cache = cache
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the replica binds and the stickiness hook."""
+        app.config.setdefault("SQLALCHEMY_REPLICA_URIS", [])
+        app.config.setdefault("DB_REPLICA_STICKY_SECONDS", 5)
+        if app.config["SQLALCHEMY_REPLICA_URIS"] and app.config["DB_REPLICA_STICKY_SECONDS"]:
+            require_shared_cache(app, "DB_REPLICA_STICKY_SECONDS")
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        for index, uri in enumerate(app.config["SQLALCHEMY_REPLICA_URIS"]):
+            binds[f"replica{index}"] = uri
+        app.config["SQLALCHEMY_BINDS"] = binds or None
+        app.after_request(self._remember_write)
+        app.extensions["replica_router"] = self
+
+    def replica_binds(self):
+        """Return the bind keys of the configured replicas."""
+        return [f"replica{index}" for index in range(len(current_app.config["SQLALCHEMY_REPLICA_URIS"]))]
+
+    def _client_key(self):
+        username = g.get("api_username")
+        if username:
+            return f"db:primary:user:{username}"
+        user_id = session.get("_user_id")
+        if user_id:
+            return f"db:primary:session:{user_id}"
+        return f"db:primary:addr:{request.remote_addr}"
+
+    def _remember_write(self, response):
+        window = current_app.config["DB_REPLICA_STICKY_SECONDS"]
+        if not window or not current_app.config["SQLALCHEMY_REPLICA_URIS"]:
+            return response
+        if request.method not in READ_METHODS and response.status_code < 400:
+            self.cache.set(self._client_key(), True, timeout=window)
+        return response
+
+    def is_sticky(self):
+        """Return ``True`` if the current client wrote within the sticky window."""
+        return bool(current_app.config["DB_REPLICA_STICKY_SECONDS"] and self.cache.get(self._client_key()))
+
+    @contextmanager
+    def route(self, bind):
+        """Send the session's reads to the replica ``bind`` (``None`` for the primary) inside the block."""
+        info = self.db.session.info
+        previous = info.get("db_replica")
+        info["db_replica"] = bind
+        try:
+            yield
+        finally:
+            info["db_replica"] = previous
+
+    def current_replica(self):
+        """Return the replica bind reads are currently routed to, or ``None``."""
+        return self.db.session.info.get("db_replica")
+
+    def use_replica(self):
+        """Send the session's reads to a replica inside the block, if any is configured."""
+        binds = self.replica_binds()
+        current = self.current_replica()
+        return self.route(current or (random.choice(binds) if binds else None))
+
+    def reads(self, f):
+        """Decorate a view so its GET and HEAD requests read from a replica.
+
+        Clients inside their read-your-writes window stay on the primary.
+        """
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method not in READ_METHODS or not self.replica_binds() or self.is_sticky():
+                return f(*args, **kwargs)
+            with self.use_replica():
+                return f(*args, **kwargs)
+
+        return decorated
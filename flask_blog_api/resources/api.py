@@ -1,147 +1,279 @@
 # -*- coding: utf-8 -*-
 """The api definition."""
-from flask import Blueprint
-from flask_restful import Resource, reqparse
+from flask import Blueprint, current_app, g, request
+from flask_restful import Resource, abort
+from sqlalchemy.orm import joinedload, noload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from flask_blog_api.database import commit_session, db
+from flask_blog_api.extensions import (
+    access_tokens,
+    credential_cache,
+    json_encoder,
+    password_hasher,
+    replica_router,
+    response_cache,
+)
+from flask_blog_api.search import CURSOR_COLUMNS, search, search_terms
 from flask_blog_api.user.models import User as UserModel
 from flask_blog_api.user.models import Post as PostModel
 
+from .bulk import (
+    abort_if_invalid,
+    bulk_items,
+    check_unique,
+    insert_rows,
+    validate_items,
+)
+from .conditional import conditional
+from .fields import load_fields, requested_fields, wants
+from .pagination import decode_cursor, encode_cursor, keyset_page, page_args
+from .queries import delete_post, find_post, update_post
+from .schemas import POST_CREATE, POST_UPDATE, USER_CREATE, USER_UPDATE
+from .streaming import stream_listing, stream_requested
+
 blueprint = Blueprint('resources', __name__)
 
 
+class Token(Resource):
+    """Resource for the API access token endpoint."""
+
+    def post(self):
+        """Issue a token; only HTTP Basic credentials can, so a token cannot renew itself."""
+        if request.authorization is None:
+            abort(403, message="A token can only be issued for HTTP Basic credentials")
+        user = UserModel.query.filter_by(username=g.api_username).first()
+        token = access_tokens.issue(user.username, user.id, user.token_generation)
+        return {
+            'token': token,
+            'token_type': 'Bearer',
+            'expires_in': access_tokens.max_age,
+        }, 200
+
+    def delete(self):
+        """Revoke every token of the authenticated user."""
+        user = UserModel.query.filter_by(username=g.api_username).first()
+        user.revoke_tokens()
+        user.save()
+        access_tokens.invalidate(user.username)
+        return {}, 200
+
+
 class Users(Resource):
     """Resource for the users API endpoint"""
+    @replica_router.reads
+    @conditional('users')
+    @response_cache.cached('users')
     def get(self):
+        limit, after = page_args()
+        fields = requested_fields(UserModel)
+        query = load_fields(UserModel.query, UserModel, fields)
+
+        def serialize(user):
+            return json_encoder.fragment(user, fields)
+
+        if stream_requested():
+            return stream_listing('users', query, [UserModel.id], after, serialize)
+        users, next_cursor = keyset_page(query, [UserModel.id], limit, after)
         return {
-            'users': [user.as_dict() for user in UserModel.query.all()]
+            'users': [serialize(user) for user in users],
+            'next': next_cursor,
         }
 
     def post(self):
-        parser = reqparse.RequestParser()
-        parser.add_argument('username', type=str, required=True)
-        parser.add_argument('email', type=str, required=True)
-        parser.add_argument('password', type=str, required=True)
-        parser.add_argument('first_name', type=str, required=True)
-        parser.add_argument('last_name', type=str, required=True)
-        parser.add_argument('is_admin', type=bool, required=True)
-        args = parser.parse_args(strict=True)
-        user = UserModel.create(
-            username=args['username'],
-            email=args['email'],
-            password=args['password'],
-            first_name=args['first_name'],
-            last_name=args['last_name'],
-            is_admin=bool(args['is_admin']),
-        )
+        user = UserModel.create(**USER_CREATE.load())
         return user.as_dict(), 200
 
 
+class UsersBulk(Resource):
+    """Resource for the bulk users API endpoint."""
+
+    def post(self):
+        """Create every user in the body, or none if any item is invalid."""
+        items = bulk_items()
+        errors = validate_items(items, USER_CREATE)
+        check_unique(items, errors, UserModel, ('username', 'email'))
+        abort_if_invalid(errors)
+        hashes = password_hasher.generate_password_hashes(
+            [item['password'] for item in items]
+        )
+        insert_rows(UserModel.__table__, [
+            dict(item, password=pw_hash, active=True)
+            for item, pw_hash in zip(items, hashes)
+        ])
+        for item in items:
+            response_cache.invalidate_user(db.session, item['username'])
+        commit_session()
+        return {
+            'results': [
+                {'index': index, 'status': 'created', 'username': item['username']}
+                for index, item in enumerate(items)
+            ]
+        }, 200
+
+
 class User(Resource):
     """Resource for the user API endpoint"""
+    @replica_router.reads
+    @conditional('user')
+    @response_cache.cached('user')
     def get(self, username):
-        user = UserModel.query.filter_by(username=username).first()
-        return user.as_dict(), 200
+        fields = requested_fields(UserModel)
+        user = load_fields(UserModel.query, UserModel, fields).filter_by(username=username).first()
+        return json_encoder.fragment(user, fields), 200
 
     def delete(self, username):
         user = UserModel.query.filter_by(username=username).first()
         if user is not None:
             user.delete()
+        credential_cache.invalidate(username)
+        access_tokens.invalidate(username)
         return {}, 200
 
     def put(self, username):
         user = UserModel.query.filter_by(username=username).first()
         if user is None:
             raise Exception(f"ERROR: Can not update non-existent user {username}")
-        parser = reqparse.RequestParser()
-        parser.add_argument('username', type=str, default=user.username)
-        parser.add_argument('email', type=str, default=user.email)
-        parser.add_argument('password', type=str, default=user.password)
-        parser.add_argument('first_name', type=str, default=user.first_name)
-        parser.add_argument('last_name', type=str, default=user.last_name)
-        parser.add_argument('is_admin', type=bool, default=user.is_admin)
-        args = parser.parse_args(strict=True)
-
-        user = user.update(
-            username=args['username'],
-            email=args['email'],
-            password=args['password'],
-            first_name=args['first_name'],
-            last_name=args['last_name'],
-            is_admin=args['is_admin'],
-        )
+        values = USER_UPDATE.load()
+
+        password = values.pop('password', None)
+        if password is not None:
+            user.set_password(password)
+            user.revoke_tokens()
+        user = user.update(**values)
+        for name in {username, user.username}:
+            credential_cache.invalidate(name)
+            access_tokens.invalidate(name)
         return user.as_dict(), 201
 
 
 class Posts(Resource):
     """Resource for the posts API endpoint"""
+    @replica_router.reads
+    @conditional('posts')
+    @response_cache.cached('posts')
     def get(self, username):
         user = UserModel.query.filter_by(
                 username=username
             ).first()
-        posts = None
-        if user is not None:
-            posts = PostModel.query.filter_by(
-                user_id=user.id
-            )
-        if posts is None:
+        if user is None:
             return {}
+        limit, after = page_args()
+        fields = requested_fields(PostModel)
+        columns = [PostModel.created_at, PostModel.id]
+        query = load_fields(
+            PostModel.query.filter_by(user_id=user.id).options(noload(PostModel.user)),
+            PostModel, fields, *columns,
+        )
+
+        # Every post belongs to ``user``, so hand it the row we already have
+        # instead of letting ``as_dict`` lazy-load it per post.
+        def serialize(post):
+            set_committed_value(post, 'user', user)
+            return json_encoder.fragment(post, fields)
+
+        if stream_requested():
+            return stream_listing('posts', query, columns, after, serialize)
+        posts, next_cursor = keyset_page(query, columns, limit, after)
         return {
-            'posts': [post.as_dict() for post in posts]
+            'posts': [serialize(post) for post in posts],
+            'next': next_cursor,
         }
 
     def post(self, username):
-        parser = reqparse.RequestParser()
-        parser.add_argument('title', type=str, required=True)
-        parser.add_argument('content', type=str, required=True)
-        parser.add_argument('active', type=bool, required=True)
-        args = parser.parse_args(strict=True)
-        post = PostModel.create(
-            user=UserModel.query.filter_by(username=username).first(),
-            title=args['title'],
-            content=args['content'],
-            active=bool(args['active']),
-        )
+        values = POST_CREATE.load()
+        post = PostModel.create(user=UserModel.query.filter_by(username=username).first(), **values)
         return post.as_dict(), 200
 
 
+class PostSearch(Resource):
+    """Resource for the post search API endpoint."""
+
+    @replica_router.reads
+    @response_cache.cached('search')
+    def get(self):
+        """Return a page of the posts matching ``?q=``, best first."""
+        if not current_app.config["SEARCH_ENABLED"]:
+            abort(501, message="Full-text search is not supported on this database")
+        query = request.args.get('q', '')
+        if not search_terms(query):
+            abort(400, message="Pass the words to search for as ?q=")
+        limit, after = page_args()
+        fields = requested_fields(PostModel)
+        if after is not None:
+            after = decode_cursor(after, CURSOR_COLUMNS)
+        hits = search(query, limit + 1, after)
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_cursor([hits[-1].rank, hits[-1].id])
+        posts = {}
+        if hits:
+            rows = load_fields(PostModel.query, PostModel, fields)
+            if wants(fields, 'user'):
+                rows = rows.options(joinedload(PostModel.user))
+            posts = {
+                post.id: post
+                for post in rows.filter(PostModel.id.in_([hit.id for hit in hits]))
+            }
+        return {
+            'results': [
+                {'post': json_encoder.fragment(posts[hit.id], fields), 'rank': hit.rank, 'snippet': hit.snippet}
+                for hit in hits
+                if hit.id in posts
+            ],
+            'next': next_cursor,
+        }
+
+
+class PostsBulk(Resource):
+    """Resource for the bulk posts API endpoint."""
+
+    def post(self, username):
+        """Create every post in the body for ``username``, or none if any item is invalid."""
+        user = UserModel.query.filter_by(username=username).first()
+        if user is None:
+            abort(404, message=f"User {username} does not exist")
+        items = bulk_items()
+        errors = validate_items(items, POST_CREATE)
+        abort_if_invalid(errors)
+        ids = insert_rows(PostModel.__table__, [
+            dict(item, user_id=user.id) for item in items
+        ])
+        response_cache.invalidate(db.session, f"posts:{user.username}")
+        commit_session()
+        results = [{'index': index, 'status': 'created'} for index in range(len(items))]
+        for result, post_id in zip(results, ids or ()):
+            result['id'] = post_id
+        return {'results': results}, 200
+
+
 class Post(Resource):
     """Resource for the post API endpoint"""
+    @replica_router.reads
+    @conditional('post')
+    @response_cache.cached('post')
     def get(self, username, id):
-        user = UserModel.query.filter_by(
-                username=username
-        ).first()
-        post = None
-        if user is not None:
-            post = PostModel.query.filter_by(
-                user_id=user.id,
-                id=id,
-            ).first()
+        fields = requested_fields(PostModel)
+        post = find_post(username, id, fields)
         if post is None:
             return {}
         return {
-            'post': post.as_dict()
+            'post': json_encoder.fragment(post, fields)
         }
 
     def delete(self, username, id):
-        user = UserModel.query.filter_by(username=username).first()
-        post = PostModel.query.filter_by(user_id=user.id, id=id).first()
-        post.delete()
+        if not delete_post(username, id):
+            abort(404, message=f"Post {id} by {username} does not exist")
+        # Bulk statements bypass the flush hooks that invalidate the response cache
+        response_cache.invalidate(db.session, f"posts:{username}")
+        commit_session()
         return {}, 200
 
     def put(self, username, id):
-        user = UserModel.query.filter_by(username=username).first()
-        if user is None:
-            raise Exception(f"ERROR: Can not update post #{id} non-existent user {username}")
-        post = PostModel.query.filter_by(user_id=user.id, id=id).first()
-        if post is None:
-            raise Exception(f"ERROR: Can not update post #{id} user {username}")
-        parser = reqparse.RequestParser()
-        parser.add_argument('title', type=str, default=post.title)
-        parser.add_argument('content', type=str, default=post.content)
-        parser.add_argument('active', type=bool, default=post.active)
-        args = parser.parse_args(strict=True)
-        post = post.update(
-            title=args['title'],
-            content=args['content'],
-            active=args['active'],
-        )
-        return post.as_dict(), 201
+        values = POST_UPDATE.load()
+        if not update_post(username, id, values):
+            abort(404, message=f"Post {id} by {username} does not exist")
+        response_cache.invalidate(db.session, f"posts:{username}")
+        commit_session()
+        return find_post(username, id).as_dict(), 201
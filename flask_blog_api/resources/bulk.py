@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Bulk create helpers for the REST API."""
+from flask import current_app, request
+from flask_restful import abort
+from sqlalchemy.exc import IntegrityError
+
+from flask_blog_api.database import db
+
+DEFAULT_MAX_ITEMS = 10000
+DEFAULT_CHUNK_SIZE = 500
+
+
+def bulk_items():
+    """Return the JSON array posted to a bulk endpoint."""
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        abort(400, message="Expected a non-empty JSON array")
+    maximum = current_app.config.get("API_BULK_MAX_ITEMS", DEFAULT_MAX_ITEMS)
+    if len(items) > maximum:
+        abort(400, message=f"At most {maximum} items may be created per request")
+    return items
+
+
+def validate_items(items, schema):
+    """Check every item against ``schema``, a :class:`~flask_blog_api.resources.schemas.Schema`.
+
+    :returns: a list holding one ``{field: message}`` dict per item; empty dicts are valid items.
+    """
+    return [
+        schema.validate(item)[1] if isinstance(item, dict) else {'item': "Expected a JSON object"}
+        for item in items
+    ]
+
+
+def check_unique(items, errors, model, names):
+    """Flag values of the unique columns ``names`` that repeat in the batch or already exist."""
+    chunk_size = current_app.config.get("API_BULK_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+    for name in names:
+        column = getattr(model, name)
+        seen = set()
+        for item, item_errors in zip(items, errors):
+            if item_errors or name not in item:
+                continue
+            if item[name] in seen:
+                item_errors[name] = "Duplicated in this request"
+            seen.add(item[name])
+        values = list(seen)
+        existing = set()
+        for start in range(0, len(values), chunk_size):
+            rows = (
+                model.query.with_entities(column)
+                .filter(column.in_(values[start:start + chunk_size]))
+                .all()
+            )
+            existing.update(row[0] for row in rows)
+        for item, item_errors in zip(items, errors):
+            if not isinstance(item, dict) or name in item_errors:
+                continue
+            if item.get(name) in existing:
+                item_errors[name] = "Already exists"
+
+
+def abort_if_invalid(errors):
+    """Reject the whole batch with per-item results if any item is invalid."""
+    if not any(errors):
+        return
+    abort(
+        400,
+        message="No items were created; fix the invalid items and retry",
+        results=[
+            {'index': index, 'status': 'invalid', 'errors': item_errors}
+            if item_errors else {'index': index, 'status': 'valid'}
+            for index, item_errors in enumerate(errors)
+        ],
+    )
+
+
+def insert_rows(table, rows):
+    """Insert ``rows`` into ``table`` with multi-row INSERTs in the current transaction.
+
+    :returns: the new primary keys in row order if the backend supports
+        ``RETURNING``, otherwise ``None``.
+    """
+    chunk_size = current_app.config.get("API_BULK_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+    dialect = db.session.get_bind().dialect
+    returning = dialect.implicit_returning and dialect.supports_multivalues_insert
+    ids = [] if returning else None
+    try:
+        for start in range(0, len(rows), chunk_size):
+            statement = table.insert().values(rows[start:start + chunk_size])
+            if returning:
+                statement = statement.returning(table.c.id)
+                ids.extend(row[0] for row in db.session.execute(statement))
+            else:
+                db.session.execute(statement)
+    except IntegrityError:
+        db.session.rollback()
+        abort(409, message="No items were created; a conflicting row was written concurrently")
+    return ids
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""ETag and Last-Modified support for the REST API read endpoints."""
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import Response, g, request
+from flask_restful.utils import unpack
+from sqlalchemy import and_, func, select
+from werkzeug.http import http_date
+from werkzeug.wrappers import Response as ResponseBase
+
+from flask_blog_api.database import db
+from flask_blog_api.user.models import Post, User
+
+
+def _probe_users(kwargs):
+    users = User.__table__
+    return select([func.max(users.c.updated_at).label('updated_at'), func.count(users.c.id).label('count')])
+
+
+def _probe_user(kwargs):
+    users = User.__table__
+    return (
+        select([users.c.updated_at, users.c.id])
+        .where(users.c.username == kwargs['username'])
+        .limit(1)
+    )
+
+
+def _probe_posts(kwargs):
+    users, posts = User.__table__, Post.__table__
+    return (
+        select([
+            func.max(posts.c.updated_at).label('updated_at'),
+            func.count(posts.c.id).label('count'),
+            users.c.updated_at.label('author_updated_at'),
+        ])
+        .select_from(users.outerjoin(posts, posts.c.user_id == users.c.id))
+        .where(users.c.username == kwargs['username'])
+        .group_by(users.c.id)
+        .limit(1)
+    )
+
+
+def _probe_post(kwargs):
+    users, posts = User.__table__, Post.__table__
+    return (
+        select([posts.c.updated_at, users.c.updated_at.label('author_updated_at')])
+        .select_from(posts.join(users, posts.c.user_id == users.c.id))
+        .where(and_(users.c.username == kwargs['username'], posts.c.id == kwargs['id']))
+        .limit(1)
+    )
+
+
+#: Cheap selects whose row changes whenever the matching response would change
+PROBES = {
+    'users': _probe_users,
+    'user': _probe_user,
+    'posts': _probe_posts,
+    'post': _probe_post,
+}
+#: Listings lose rows without any remaining row getting a newer ``updated_at``,
+#: so they are only revalidated by ``ETag`` (which covers the row count)
+LISTINGS = frozenset(['users', 'posts'])
+
+
+def probe_statement(endpoint, kwargs):
+    """Return the probe select of ``endpoint`` for the view arguments ``kwargs``."""
+    return PROBES[endpoint](kwargs)
+
+
+def validators(endpoint, kwargs, version, args):
+    """Return the ``(etag, last_modified)`` of a response from its probe row ``version`` and query ``args``."""
+    seed = repr((endpoint, sorted(kwargs.items()), tuple(version), sorted(args.items(multi=True))))
+    etag = hashlib.sha1(seed.encode("utf-8")).hexdigest()
+    if endpoint in LISTINGS:
+        return etag, None
+    timestamps = [value for value in version if hasattr(value, 'isoformat')]
+    return etag, max(timestamps) if timestamps else None
+
+
+def not_modified(etag, last_modified, if_none_match, if_modified_since):
+    """Return ``True`` if the request's parsed validators match the current ones."""
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if if_modified_since and last_modified is not None:
+        since = if_modified_since
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _with_validators(rv, etag, last_modified):
+    """Add the ``ETag`` and ``Last-Modified`` headers to a ``200`` or ``304`` resource return value."""
+    if isinstance(rv, ResponseBase):
+        if rv.status_code in (200, 304):
+            rv.set_etag(etag)
+            if last_modified is not None:
+                rv.last_modified = last_modified
+        return rv
+    data, code, headers = unpack(rv)
+    if code == 200:
+        headers = dict(headers or {}, ETag=f'"{etag}"')
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+    return data, code, headers
+
+
+def conditional(endpoint):
+    """Add a strong ``ETag`` and ``Last-Modified`` to a resource ``get`` method.
+
+    Both are derived from a probe query over ``updated_at`` (and row counts
+    for listings) instead of from the response body, so a request carrying a
+    matching ``If-None-Match`` or ``If-Modified-Since`` gets a ``304`` without
+    loading or serializing any rows. Listings only get an ``ETag``. The ASGI
+    entry point computes the same validators from the same probes.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(resource, **kwargs):
+            version = db.session.execute(probe_statement(endpoint, kwargs)).first()
+            if version is None:
+                return f(resource, **kwargs)
+            etag, last_modified = validators(endpoint, kwargs, version, request.args)
+            if not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                return _with_validators(Response(status=304), etag, last_modified)
+            # Part of the response cache key, so a cached body matches its ETag
+            g.response_etag = etag
+            try:
+                rv = f(resource, **kwargs)
+            finally:
+                g.pop("response_etag", None)
+            return _with_validators(rv, etag, last_modified)
+
+        return decorated
+
+    return decorator
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Sparse fieldsets (``?fields=a,b,c``) for the REST API resources."""
+from flask import request
+from flask_restful import abort
+from sqlalchemy.orm import Load
+
+
+def requested_fields(model, args=None):
+    """Return the ``model`` fields asked for with ``?fields=``, or ``None`` for all of them.
+
+    Unknown field names are rejected with a ``400``. ``args`` defaults to the
+    current request's query string.
+    """
+    raw = (request.args if args is None else args).get("fields")
+    if raw is None:
+        return None
+    fields = frozenset(name.strip() for name in raw.split(",") if name.strip())
+    unknown = fields.difference(model.FIELD_COLUMNS)
+    if not fields or unknown:
+        abort(400, message=f"Invalid fields: {raw}; choose from {', '.join(model.FIELD_COLUMNS)}")
+    return fields
+
+
+def wants(fields, name):
+    """Return ``True`` if the field ``name`` is part of ``fields`` (``None`` meaning all)."""
+    return fields is None or name in fields
+
+
+def field_columns(model, fields, *columns):
+    """Return the names of the ``model`` columns that ``fields`` read (``None`` meaning all columns).
+
+    The model's ``KEY_COLUMNS`` (identity and fragment key) are always
+    included, as are the extra ``columns``, such as the sort key of a
+    paginated listing.
+    """
+    if fields is None:
+        return [column.key for column in model.__table__.columns]
+    names = set(model.KEY_COLUMNS)
+    names.update(column.key for column in columns)
+    for field in fields:
+        names.update(model.FIELD_COLUMNS[field])
+    return sorted(names)
+
+
+def load_fields(query, model, fields, *columns):
+    """Restrict the ``model`` rows of ``query`` to the columns ``fields`` read (see :func:`field_columns`)."""
+    if fields is None:
+        return query
+    return query.options(Load(model).load_only(*field_columns(model, fields, *columns)))
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Keyset (cursor) pagination helpers for the REST API."""
+import base64
+import datetime as dt
+import json
+
+from flask import current_app, request
+from flask_restful import abort
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    """Encode a tuple of sort key values as an opaque cursor string."""
+    values = [v.isoformat() if isinstance(v, dt.datetime) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor produced by :func:`encode_cursor` for the given sort columns."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match sort key")
+        return [
+            dt.datetime.fromisoformat(value)
+            if column.type.python_type is dt.datetime
+            else column.type.python_type(value)
+            for column, value in zip(columns, values)
+        ]
+    except (TypeError, ValueError):
+        abort(400, message=f"Invalid cursor: {cursor}")
+
+
+def page_args(args=None, config=None):
+    """Return the requested ``(limit, after)`` pair, clamped to the configured maximum.
+
+    ``args`` and ``config`` default to the current request's query string and
+    the current app's config.
+    """
+    args = request.args if args is None else args
+    config = current_app.config if config is None else config
+    default = config.get("API_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    maximum = config.get("API_MAX_PAGE_SIZE", DEFAULT_MAX_PAGE_SIZE)
+    limit = args.get("limit", default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        abort(400, message=f"Invalid limit: {limit}")
+    if limit < 1:
+        abort(400, message=f"Invalid limit: {limit}")
+    return min(limit, maximum), args.get("after") or None
+
+
+def keyset_condition(columns, after):
+    """Return the condition selecting rows that sort after the ``after`` cursor on ``columns``."""
+    values = decode_cursor(after, columns)
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column > values[i]))
+    return or_(*clauses)
+
+
+def keyset_filter(query, columns, after=None):
+    """Restrict ``query`` to rows that sort after the ``after`` cursor on ``columns``."""
+    if after is None:
+        return query
+    return query.filter(keyset_condition(columns, after))
+
+
+def split_page(rows, columns, limit):
+    """Split the ``limit + 1`` rows fetched for a page into ``(rows, next_cursor)``."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+
+def keyset_page(query, columns, limit, after=None):
+    """Fetch one page of ``query`` ordered by ``columns``, starting after the ``after`` cursor.
+
+    The sort key must be unique (end it with the primary key) and should be
+    backed by an index, so that every page costs the same index seek no
+    matter how deep into the listing the client is.
+
+    :returns: ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last page.
+    """
+    query = keyset_filter(query, columns, after)
+    return split_page(query.order_by(*columns).limit(limit + 1).all(), columns, limit)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Single-statement data access for the nested ``/users/<username>/posts/<id>`` routes."""
+from sqlalchemy.orm import contains_eager
+
+from flask_blog_api.database import db
+from flask_blog_api.user.models import Post, User
+
+from .fields import load_fields, wants
+
+
+def _author_id(username):
+    """Scalar subquery selecting the id of ``username``."""
+    return db.session.query(User.id).filter(User.username == username).as_scalar()
+
+
+def _post_query(username, id):
+    return Post.query.filter(Post.id == id, Post.user_id == _author_id(username))
+
+
+def _loaded_post(id):
+    """Return post ``id`` if it is already in the session's identity map."""
+    return db.session.identity_map.get(db.session.identity_key(Post, id))
+
+
+def find_post(username, id, fields=None):
+    """Return post ``id`` by ``username`` with its author loaded, or ``None``.
+
+    Both rows come back from a single ``posts JOIN users`` statement, so
+    serializing the post does not lazy-load the author afterwards. With
+    ``fields`` only their columns are selected, and the author is only joined
+    in when ``user`` is one of them.
+    """
+    if not wants(fields, 'user'):
+        return load_fields(_post_query(username, id), Post, fields).first()
+    return load_fields(
+        Post.query.join(Post.user)
+        .options(contains_eager(Post.user))
+        .filter(User.username == username, Post.id == id),
+        Post, fields,
+    ).first()
+
+
+def update_post(username, id, values):
+    """Apply ``values`` to post ``id`` by ``username`` with one ``UPDATE`` statement.
+
+    ``updated_at`` is bumped by the column's ``onupdate`` default. A copy of
+    the post already loaded in the session is expired rather than updated in
+    place, so reload it with :func:`find_post`.
+
+    :returns: ``True`` if the post exists.
+    """
+    if not values:
+        return db.session.query(_post_query(username, id).exists()).scalar()
+    updated = _post_query(username, id).update(values, synchronize_session=False) > 0
+    post = _loaded_post(id)
+    if updated and post is not None:
+        db.session.expire(post)
+    return updated
+
+
+def delete_post(username, id):
+    """Delete post ``id`` by ``username`` with one ``DELETE`` statement.
+
+    A copy of the post already loaded in the session is detached, as an ORM
+    delete would leave it.
+
+    :returns: ``True`` if a post was deleted.
+    """
+    deleted = _post_query(username, id).delete(synchronize_session=False) > 0
+    post = _loaded_post(id)
+    if deleted and post is not None:
+        db.session.expunge(post)
+    return deleted
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Request body schemas for the REST API.
+
+A :class:`Schema` is compiled once, at import, from a field table and checks
+a body in a single pass over its keys, collecting every error instead of
+stopping at the first one. JSON bodies must hold values of the declared
+types (``null`` counts as absent); form bodies are all strings, so ``bool``
+fields are coerced from ``true``/``false``, ``1``/``0``, ``yes``/``no``,
+``on``/``off`` or an empty value (false).
+"""
+from flask import request
+from flask_restful import abort
+
+#: name -> (type, required, max length)
+USER_FIELDS = {
+    'username': (str, True, 80),
+    'email': (str, True, 80),
+    'password': (str, True, None),
+    'first_name': (str, True, 30),
+    'last_name': (str, True, 30),
+    'is_admin': (bool, True, None),
+}
+POST_FIELDS = {
+    'title': (str, True, 200),
+    'content': (str, True, None),
+    'active': (bool, True, None),
+}
+
+FORM_BOOLEANS = {
+    'true': True, '1': True, 'yes': True, 'on': True,
+    'false': False, '0': False, 'no': False, 'off': False, '': False,
+}
+_INVALID = object()
+
+
+def _form_bool(value):
+    return FORM_BOOLEANS.get(value.strip().lower(), _INVALID)
+
+
+class Field(object):
+    """One compiled entry of a field table."""
+
+    __slots__ = ("type", "max_length", "from_form", "type_error", "length_error")
+
+    def __init__(self, type_, max_length):
+        """Create instance."""
+        self.type = type_
+        self.max_length = max_length
+        self.from_form = _form_bool if type_ is bool else None
+        self.type_error = f"Expected {type_.__name__}"
+        self.length_error = f"Longer than {max_length} characters"
+
+
+class Schema(object):
+    """Validates and coerces a request body against ``fields``, a ``{name: (type, required, max length)}`` table.
+
+    With ``partial`` every field is optional, for updates.
+    """
+
+    def __init__(self, fields, partial=False):
+        """Create instance."""
+        self.fields = {name: Field(type_, max_length) for name, (type_, _, max_length) in fields.items()}
+        self.required = () if partial else tuple(name for name, (_, required, _) in fields.items() if required)
+
+    def validate(self, data, form=False):
+        """Check the dict ``data`` (string values if ``form``).
+
+        :returns: ``(values, errors)``, the coerced values of the given fields
+            and a ``{field: message}`` dict that is empty for a valid body.
+        """
+        values, errors = {}, {}
+        fields = self.fields
+        for name, value in data.items():
+            field = fields.get(name)
+            if field is None:
+                errors[name] = "Unknown field"
+                continue
+            if value is None:
+                continue
+            if form and field.from_form is not None:
+                value = field.from_form(value)
+            if value.__class__ is not field.type and not isinstance(value, field.type):
+                errors[name] = field.type_error
+            elif field.max_length is not None and len(value) > field.max_length:
+                errors[name] = field.length_error
+            else:
+                values[name] = value
+        for name in self.required:
+            if name not in values and name not in errors:
+                errors[name] = "Missing required field"
+        return values, errors
+
+    def load(self):
+        """Return the validated values of the current request's JSON or form body.
+
+        Aborts with a ``400`` listing every invalid field.
+        """
+        if request.is_json:
+            data, form = request.get_json(silent=True), False
+            if not isinstance(data, dict):
+                abort(400, message="Expected a JSON object")
+        else:
+            data, form = request.form.to_dict(), True
+        values, errors = self.validate(data, form)
+        if errors:
+            abort(400, message="Invalid request body", errors=errors)
+        return values
+
+
+USER_CREATE = Schema(USER_FIELDS)
+USER_UPDATE = Schema(USER_FIELDS, partial=True)
+POST_CREATE = Schema(POST_FIELDS)
+POST_UPDATE = Schema(POST_FIELDS, partial=True)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Streaming JSON responses for the REST API list endpoints."""
+from flask import Response, current_app, request, stream_with_context
+
+from flask_blog_api.extensions import json_encoder, replica_router
+
+from .pagination import keyset_filter
+
+DEFAULT_BATCH_SIZE = 500
+#: Bytes buffered before a chunk is handed to the server
+CHUNK_SIZE = 64 * 1024
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def stream_requested():
+    """Return ``True`` if the client asked for a streamed listing with ``?stream=1``."""
+    return request.args.get("stream", "").lower() in TRUE_VALUES
+
+
+def stream_listing(key, query, columns, after, serialize):
+    """Stream every row of ``query`` after the ``after`` cursor as ``{"<key>": [...]}``.
+
+    Rows are read through a server-side cursor in batches of
+    ``API_STREAM_BATCH_SIZE`` and written out as they are serialized, so memory
+    use stays flat however long the listing is. The response has no
+    ``Content-Length`` and is sent with chunked transfer encoding. The whole
+    listing is sent, so ``next`` is always ``null``.
+    """
+    batch_size = current_app.config.get("API_STREAM_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    rows = (
+        keyset_filter(query, columns, after)
+        .order_by(*columns)
+        .execution_options(stream_results=True)
+        .yield_per(batch_size)
+    )
+
+    # The body is generated after the view returns, outside its replica routing
+    replica = replica_router.current_replica()
+
+    def generate():
+        with replica_router.route(replica):
+            yield from _chunks(key, rows, serialize)
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def _chunks(key, rows, serialize):
+    buffer = [json_encoder.dumps(key).join((b"{", b":["))]
+    size = 0
+    separator = b""
+    for row in rows:
+        item = separator + json_encoder.dumps(serialize(row))
+        separator = b","
+        buffer.append(item)
+        size += len(item)
+        if size >= CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    buffer.append(b'],"next":null}')
+    yield b"".join(buffer)
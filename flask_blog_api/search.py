@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Full-text search over post titles and content.
+
+The inverted index is maintained by the database itself, so every write path
+(``CRUDMixin``, the bulk endpoints and single-statement updates) keeps it in
+sync:
+
+* PostgreSQL: a generated ``posts.search_vector`` ``tsvector`` column (title
+  weighted above content) with a GIN index.
+* SQLite: an external-content FTS5 table ``posts_fts`` kept up to date by
+  triggers on ``posts``.
+
+:func:`attach_search_index` hooks the DDL onto the ``posts`` table so that
+``db.create_all()`` builds it; migration ``9b1f4c2d7a10`` carries its own copy
+of the DDL for existing databases, so keep the two in step. On other databases
+``SEARCH_ENABLED`` is off and ``/posts/search`` answers 501.
+"""
+import re
+
+from sqlalchemy import DDL, Float, Integer, event, text
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.sql import column
+
+from flask_blog_api.extensions import db
+
+#: Dialects with a search index
+DIALECTS = ("postgresql", "sqlite")
+LANGUAGE = "english"
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+#: Sort key of search results, for :func:`~flask_blog_api.resources.pagination.decode_cursor`
+CURSOR_COLUMNS = [column("rank", Float), column("id", Integer)]
+
+POSTGRES_DDL = [
+    f"""ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{LANGUAGE}', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('{LANGUAGE}', coalesce(content, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX ix_posts_search_vector ON posts USING GIN (search_vector)",
+]
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE posts_fts USING fts5(
+        title, content, content='posts', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+SQLITE_DROP_DDL = ["DROP TABLE IF EXISTS posts_fts"]
+
+SQLITE_SEARCH = f"""
+    SELECT id, rank, snippet FROM (
+        SELECT rowid AS id,
+               -bm25(posts_fts, 4.0, 1.0) AS rank,
+               snippet(posts_fts, -1, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', :words) AS snippet
+        FROM posts_fts
+        WHERE posts_fts MATCH :query
+    )
+    WHERE :after_rank IS NULL OR rank < :after_rank OR (rank = :after_rank AND id > :after_id)
+    ORDER BY rank DESC, id
+    LIMIT :limit
+"""
+POSTGRES_SEARCH = f"""
+    SELECT hit.id, hit.rank,
+           ts_headline('{LANGUAGE}', posts.title || ' — ' || posts.content, hit.query,
+                       :headline_options) AS snippet
+    FROM (
+        SELECT posts.id, ts_rank_cd(posts.search_vector, query)::float8 AS rank, query
+        FROM posts, websearch_to_tsquery('{LANGUAGE}', :query) AS query
+        WHERE posts.search_vector @@ query
+    ) AS hit
+    JOIN posts ON posts.id = hit.id
+    WHERE CAST(:after_rank AS float8) IS NULL
+          OR hit.rank < :after_rank OR (hit.rank = :after_rank AND hit.id > :after_id)
+    ORDER BY hit.rank DESC, hit.id
+    LIMIT :limit
+"""
+
+
+def check_dialect(dialect):
+    """Raise :class:`RuntimeError` unless ``dialect`` has a search index."""
+    if dialect not in DIALECTS:
+        raise RuntimeError(f"Full-text search is not supported on {dialect}")
+
+
+def init_app(app):
+    """Set ``SEARCH_ENABLED`` from the dialect of ``SQLALCHEMY_DATABASE_URI``, unless configured."""
+    dialect = make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name()
+    app.config.setdefault("SEARCH_ENABLED", dialect in DIALECTS)
+
+
+def _execute_all(connection, statements):
+    for statement in statements:
+        connection.execute(DDL(statement))
+
+
+def _execute_if(dialect, statements):
+    def execute(target, connection, **kw):
+        if connection.dialect.name == dialect:
+            _execute_all(connection, statements)
+
+    return execute
+
+
+def attach_search_index(table):
+    """Create (and drop) the search index together with ``table`` on the supported dialects."""
+    event.listen(table, "after_create", _execute_if("postgresql", POSTGRES_DDL))
+    event.listen(table, "after_create", _execute_if("sqlite", SQLITE_DDL))
+    event.listen(table, "before_drop", _execute_if("sqlite", SQLITE_DROP_DDL))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Alembic ``include_object`` hook hiding the search index from autogenerate."""
+    if type_ == "table" and name.startswith("posts_fts"):
+        return False
+    return name not in ("search_vector", "ix_posts_search_vector")
+
+
+def rebuild_index(connection):
+    """Rebuild the search index from the rows in ``posts``."""
+    dialect = connection.dialect.name
+    check_dialect(dialect)
+    if dialect == "postgresql":
+        # The generated column cannot drift; rebuild the GIN index itself
+        connection.execute(DDL("REINDEX INDEX ix_posts_search_vector"))
+    else:
+        connection.execute(text("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')"))
+
+
+def _sqlite_query(terms):
+    # Quote every term so user input can never be parsed as FTS5 syntax;
+    # the terms are ANDed, and the last one also matches as a prefix
+    # (prefix queries are not stemmed, so keep the stemmed match too)
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] = f"({quoted[-1]} OR {quoted[-1]}*)"
+    return " AND ".join(quoted)
+
+
+def search_terms(query):
+    """Split a user query into the words that are searched for."""
+    return re.findall(r"\w+", query or "")
+
+
+def search(query, limit, after=None, words=16):
+    """Return up to ``limit`` ``(id, rank, snippet)`` rows matching ``query``, best first.
+
+    :param after: ``(rank, id)`` of the last row of the previous page.
+    :param words: approximate length of each snippet in words.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    check_dialect(dialect)
+    if dialect == "postgresql":
+        # websearch_to_tsquery accepts any input, with quoted phrases and -exclusions
+        statement = POSTGRES_SEARCH
+    else:
+        statement, query = SQLITE_SEARCH, _sqlite_query(terms)
+    after_rank, after_id = after or (None, None)
+    rows = db.session.execute(text(statement), {
+        "query": query,
+        "limit": limit,
+        "words": words,
+        "headline_options": (
+            f"StartSel={SNIPPET_OPEN}, StopSel={SNIPPET_CLOSE}, MaxWords={words}, MinWords={words // 2}"
+        ),
+        "after_rank": after_rank,
+        "after_id": after_id,
+    })
+    return rows.fetchall()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Fast JSON encoding for the REST API."""
+import json
+
+from flask import make_response
+
+from flask_blog_api.auth import TTLCache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+DEFAULT_FRAGMENT_CACHE_SIZE = 10000
+DEFAULT_FRAGMENT_CACHE_TTL = 3600
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj)
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+BACKENDS = {"json": _stdlib_dumps}
+if orjson is not None:
+    BACKENDS["orjson"] = _orjson_dumps
+
+
+def _has_fragment(value):
+    if isinstance(value, Fragment):
+        return True
+    if isinstance(value, list):
+        # API listings are homogeneous, so the first item tells
+        return bool(value) and _has_fragment(value[0])
+    if isinstance(value, dict):
+        return any(_has_fragment(item) for item in value.values())
+    return False
+
+
+class Fragment(bytes):
+    """Already-encoded JSON that :class:`JSONEncoder` splices into a response verbatim."""
+
+    __slots__ = ()
+
+
+class JSONEncoder(object):
+    """Encode API responses with the fastest available JSON backend.
+
+    ``API_JSON_BACKEND`` picks ``orjson`` or the stdlib ``json`` module;
+    ``auto`` (the default) uses ``orjson`` when it is installed.
+
+    Rows are encoded once by :meth:`fragment` and kept in a bounded LRU of
+    ``API_FRAGMENT_CACHE_SIZE`` entries keyed by the model's ``fragment_key``,
+    which changes whenever the row (or anything else ``as_dict`` reads) is
+    updated. List responses are then assembled by joining cached fragments,
+    without calling ``as_dict`` or encoding the rows again.
+    """
+
+    def __init__(self, app=None):
+        """Create instance."""
+        self.backend = "json"
+        self._dumps = _stdlib_dumps
+        self.fragments = TTLCache(DEFAULT_FRAGMENT_CACHE_SIZE, DEFAULT_FRAGMENT_CACHE_TTL)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Pick the backend and size the fragment cache from the application config."""
+        app.config.setdefault("API_JSON_BACKEND", "auto")
+        app.config.setdefault("API_FRAGMENT_CACHE_SIZE", DEFAULT_FRAGMENT_CACHE_SIZE)
+        app.config.setdefault("API_FRAGMENT_CACHE_TTL", DEFAULT_FRAGMENT_CACHE_TTL)
+        backend = app.config["API_JSON_BACKEND"]
+        if backend == "auto":
+            backend = "orjson" if "orjson" in BACKENDS else "json"
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"API_JSON_BACKEND must be 'auto' or one of {sorted(BACKENDS)}, not {backend!r}"
+            )
+        self.backend = backend
+        self._dumps = BACKENDS[backend]
+        self.fragments = TTLCache(
+            app.config["API_FRAGMENT_CACHE_SIZE"], app.config["API_FRAGMENT_CACHE_TTL"]
+        )
+        app.extensions["json_encoder"] = self
+
+    def dumps(self, obj):
+        """Encode ``obj`` as UTF-8 JSON bytes, splicing in any :class:`Fragment` verbatim."""
+        if isinstance(obj, Fragment):
+            return bytes(obj)
+        if isinstance(obj, list) and _has_fragment(obj):
+            if isinstance(obj[0], Fragment):
+                return b"[" + b",".join(obj) + b"]"
+            return b"[" + b",".join(self.dumps(item) for item in obj) + b"]"
+        if isinstance(obj, dict) and _has_fragment(obj):
+            return b"{" + b",".join(
+                self._dumps(str(key)) + b":" + self.dumps(value) for key, value in obj.items()
+            ) + b"}"
+        return self._dumps(obj)
+
+    def fragment(self, row, fields=None):
+        """Return ``row.as_dict(fields)`` encoded as a :class:`Fragment`, from the cache if possible.
+
+        :param fields: a ``frozenset`` of the fields to include, ``None`` for all.
+        """
+        key = row.fragment_key(fields)
+        fragment = self.fragments.get(key)
+        if fragment is None:
+            fragment = Fragment(self._dumps(row.as_dict(fields)))
+            self.fragments.set(key, fragment)
+        return fragment
+
+    def output_json(self, data, code, headers=None):
+        """Flask-RESTful representation for ``application/json``."""
+        response = make_response(self.dumps(data), code)
+        response.headers["Content-Type"] = "application/json"
+        response.headers.extend(headers or {})
+        return response
+
+    def stats(self):
+        """Return the backend and the fragment cache counters."""
+        return dict(self.fragments.stats(), backend=self.backend)
@@ -19,5 +19,65 @@ SEND_FILE_MAX_AGE_DEFAULT = env.int("SEND_FILE_MAX_AGE_DEFAULT")
 BCRYPT_LOG_ROUNDS = env.int("BCRYPT_LOG_ROUNDS", default=13)
 DEBUG_TB_ENABLED = DEBUG
 DEBUG_TB_INTERCEPT_REDIRECTS = False
-CACHE_TYPE = "simple"  # Can be "memcached", "redis", etc.
+# "simple" is per process; caches that must agree across gunicorn workers need "redis" or "memcached"
+CACHE_TYPE = env.str("CACHE_TYPE", default="simple")
+CACHE_REDIS_URL = env.str("CACHE_REDIS_URL", default=None)
+# The app runs in a single process, so a per-process CACHE_TYPE is consistent
+SINGLE_PROCESS = env.bool("SINGLE_PROCESS", default=False)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+API_PAGE_SIZE = env.int("API_PAGE_SIZE", default=50)
+API_MAX_PAGE_SIZE = env.int("API_MAX_PAGE_SIZE", default=200)
+AUTH_CACHE_SIZE = env.int("AUTH_CACHE_SIZE", default=1024)
+# Per-process auth caches delay revocations on other workers; capped at 5 seconds unless SINGLE_PROCESS
+AUTH_CACHE_TTL = env.int("AUTH_CACHE_TTL", default=5)
+AUTH_TOKEN_TTL = env.int("AUTH_TOKEN_TTL", default=3600)
+BCRYPT_EXECUTOR = env.str("BCRYPT_EXECUTOR", default="thread")
+BCRYPT_EXECUTOR_WORKERS = env.int("BCRYPT_EXECUTOR_WORKERS", default=None)
+API_BULK_MAX_ITEMS = env.int("API_BULK_MAX_ITEMS", default=10000)
+API_BULK_CHUNK_SIZE = env.int("API_BULK_CHUNK_SIZE", default=500)
+DB_UNIT_OF_WORK = env.bool("DB_UNIT_OF_WORK", default=True)
+# Response cache TTLs in seconds; any non-zero TTL needs a shared CACHE_TYPE
+API_CACHE_TTL = {
+    "users": env.int("API_CACHE_TTL_USERS", default=0),
+    "user": env.int("API_CACHE_TTL_USER", default=0),
+    "posts": env.int("API_CACHE_TTL_POSTS", default=0),
+    "post": env.int("API_CACHE_TTL_POST", default=0),
+    "search": env.int("API_CACHE_TTL_SEARCH", default=0),
+}
+API_STREAM_BATCH_SIZE = env.int("API_STREAM_BATCH_SIZE", default=500)
+API_JSON_BACKEND = env.str("API_JSON_BACKEND", default="auto")
+API_FRAGMENT_CACHE_SIZE = env.int("API_FRAGMENT_CACHE_SIZE", default=10000)
+API_FRAGMENT_CACHE_TTL = env.int("API_FRAGMENT_CACHE_TTL", default=3600)
+# "auto" makes psycopg2 cooperative when running under gevent
+DB_COOPERATIVE = env.str("DB_COOPERATIVE", default="auto")
+DB_POOL_SIZE = env.int("DB_POOL_SIZE", default=None)
+DB_MAX_OVERFLOW = env.int("DB_MAX_OVERFLOW", default=None)
+DB_POOL_TIMEOUT = env.int("DB_POOL_TIMEOUT", default=None)
+DB_POOL_RECYCLE = env.int("DB_POOL_RECYCLE", default=1800)
+DB_POOL_PRE_PING = env.bool("DB_POOL_PRE_PING", default=True)
+# Comma-separated read replicas of DATABASE_URL; GET handlers read from them
+SQLALCHEMY_REPLICA_URIS = env.list("DATABASE_REPLICA_URLS", default=[])
+DB_REPLICA_STICKY_SECONDS = env.int("DB_REPLICA_STICKY_SECONDS", default=5)
+COMPRESS_ENABLED = env.bool("COMPRESS_ENABLED", default=True)
+# Bodies shorter than this many bytes are sent uncompressed
+COMPRESS_MIN_SIZE = env.int("COMPRESS_MIN_SIZE", default=500)
+COMPRESS_LEVEL = env.int("COMPRESS_LEVEL", default=6)
+COMPRESS_BROTLI_LEVEL = env.int("COMPRESS_BROTLI_LEVEL", default=4)
+# Prometheus metrics on METRICS_PATH; set PROMETHEUS_MULTIPROC_DIR to aggregate gunicorn workers
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=True)
+METRICS_PATH = env.str("METRICS_PATH", default="/metrics")
+# Client networks allowed to scrape METRICS_PATH; everyone else gets a 404
+METRICS_ALLOWED_NETWORKS = env.list("METRICS_ALLOWED_NETWORKS", default=["127.0.0.1/32", "::1/128"])
+# Staging: flag requests running more statements than QUERY_BUDGET, or one
+# statement QUERY_N_PLUS_ONE_THRESHOLD times; QUERY_BUDGET_ACTION is warn or raise
+QUERY_BUDGET = env.int("QUERY_BUDGET", default=None)
+QUERY_N_PLUS_ONE_THRESHOLD = env.int("QUERY_N_PLUS_ONE_THRESHOLD", default=None)
+QUERY_BUDGET_ACTION = env.str("QUERY_BUDGET_ACTION", default="warn")
+# "api" serves only /api/v0 and skips the HTML site, CSRF, the toolbar and migrations
+APP_PROFILE = env.str("APP_PROFILE", default="full")
+# ASGI entry point (flask_blog_api.asgi): async reads of /api/v0, the rest on WSGI threads
+ASGI_DATABASE_URL = env.str("ASGI_DATABASE_URL", default=None)
+ASGI_DB_POOL_SIZE = env.int("ASGI_DB_POOL_SIZE", default=10)
+ASGI_MAX_CONCURRENCY = env.int("ASGI_MAX_CONCURRENCY", default=100)
+ASGI_QUEUE_TIMEOUT = env.float("ASGI_QUEUE_TIMEOUT", default=5.0)
+ASGI_WSGI_THREADS = env.int("ASGI_WSGI_THREADS", default=10)
@@ -1,3 +1,4 @@
 # -*- coding: utf-8 -*-
 """The user module."""
-from . import views  # noqa
+# The views are imported by the app factory, only when the HTML site is served
+from . import models  # noqa
@@ -12,7 +12,8 @@ from flask_blog_api.database import (
     reference_col,
     relationship,
 )
-from flask_blog_api.extensions import bcrypt
+from flask_blog_api.extensions import password_hasher
+from flask_blog_api.search import attach_search_index
 
 
 class Role(SurrogatePK, Model):
@@ -41,10 +42,18 @@ class User(UserMixin, SurrogatePK, Model):
     #: The hashed password
     password = Column(db.LargeBinary(128), nullable=True)
     created_at = Column(db.DateTime, nullable=False, default=dt.datetime.utcnow)
+    updated_at = Column(
+        db.DateTime,
+        nullable=False,
+        default=dt.datetime.utcnow,
+        onupdate=dt.datetime.utcnow,
+    )
     first_name = Column(db.String(30), nullable=True)
     last_name = Column(db.String(30), nullable=True)
     active = Column(db.Boolean(), default=True)
     is_admin = Column(db.Boolean(), default=False)
+    #: Bumped to revoke every API access token issued to this user
+    token_generation = Column(db.Integer(), nullable=False, default=0)
 
     def __init__(self, username, email, password=None, **kwargs):
         """Create instance."""
@@ -54,24 +63,45 @@ class User(UserMixin, SurrogatePK, Model):
         else:
             self.password = None
 
-    def as_dict(self):
-        """Return User data as a dictionary."""
-        return {
-            'username': self.username,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'created_at': str(self.created_at),
-            'is_admin': self.is_admin
+    #: Columns read by each :meth:`as_dict` field, for sparse fieldsets
+    FIELD_COLUMNS = {
+        'username': ('username',),
+        'email': ('email',),
+        'first_name': ('first_name',),
+        'last_name': ('last_name',),
+        'created_at': ('created_at',),
+        'is_admin': ('is_admin',),
+    }
+    #: Columns every row needs whatever the fields: identity and :meth:`fragment_key`
+    KEY_COLUMNS = ('id', 'updated_at')
+
+    def as_dict(self, fields=None):
+        """Return User data as a dictionary, limited to ``fields`` if given."""
+        values = {
+            'username': lambda: self.username,
+            'email': lambda: self.email,
+            'first_name': lambda: self.first_name,
+            'last_name': lambda: self.last_name,
+            'created_at': lambda: str(self.created_at),
+            'is_admin': lambda: self.is_admin,
         }
+        return {name: value() for name, value in values.items() if fields is None or name in fields}
+
+    def fragment_key(self, fields=None):
+        """Return a key that changes whenever :meth:`as_dict` would."""
+        return ("user", self.id, self.updated_at, fields)
 
     def set_password(self, password):
         """Set password."""
-        self.password = bcrypt.generate_password_hash(password)
+        self.password = password_hasher.generate_password_hash(password)
 
     def check_password(self, value):
         """Check password."""
-        return bcrypt.check_password_hash(self.password, value)
+        return password_hasher.check_password_hash(self.password, value)
+
+    def revoke_tokens(self):
+        """Invalidate every API access token issued so far."""
+        self.token_generation = (self.token_generation or 0) + 1
 
     @property
     def full_name(self):
@@ -87,25 +117,65 @@ class Post(Model):
     """A blog post."""
 
     __tablename__ = "posts"
+    __table_args__ = (
+        # ``/users/<username>/posts`` listings: filter on the author, keyset on (created_at, id)
+        db.Index("ix_posts_user_id_created_at_id", "user_id", "created_at", "id"),
+        # ``/users/<username>/posts/<id>`` lookups and per-author counts
+        db.Index("ix_posts_user_id_id", "user_id", "id"),
+    )
     id = Column(db.Integer(), primary_key=True)
-    user_id = reference_col("users", nullable=True)
+    # Both composite indexes lead with user_id, so it needs none of its own
+    user_id = reference_col("users", nullable=True, index=False)
     user = relationship("User", backref="posts")
     title = Column(db.String(200), nullable=False)
     content = Column(db.Text(), nullable=False)
     created_at = Column(db.DateTime, nullable=False, default=dt.datetime.utcnow)
+    updated_at = Column(
+        db.DateTime,
+        nullable=False,
+        default=dt.datetime.utcnow,
+        onupdate=dt.datetime.utcnow,
+    )
     active = Column(db.Boolean(), default=False)
 
     def __init__(self, title, content, active=True, **kwargs):
         """Create instance."""
         db.Model.__init__(self, title=title, content=content, active=active, **kwargs)
 
-    def as_dict(self):
-        """Return Post data as a dictionary."""
-        return {
-            'id': self.id,
-            'user': self.user.full_name,
-            'created_at': str(self.created_at),
-            'active': self.active,
-            'title': self.title,
-            'content': self.content,
+    #: Columns read by each :meth:`as_dict` field, for sparse fieldsets
+    FIELD_COLUMNS = {
+        'id': ('id',),
+        'user': ('user_id',),
+        'created_at': ('created_at',),
+        'active': ('active',),
+        'title': ('title',),
+        'content': ('content',),
+    }
+    #: Columns every row needs whatever the fields: identity and :meth:`fragment_key`
+    KEY_COLUMNS = ('id', 'updated_at', 'user_id')
+
+    def as_dict(self, fields=None):
+        """Return Post data as a dictionary, limited to ``fields`` if given.
+
+        Fields that are left out are not read, so the author is only loaded
+        when ``user`` is requested.
+        """
+        values = {
+            'id': lambda: self.id,
+            'user': lambda: self.user.full_name,
+            'created_at': lambda: str(self.created_at),
+            'active': lambda: self.active,
+            'title': lambda: self.title,
+            'content': lambda: self.content,
         }
+        return {name: value() for name, value in values.items() if fields is None or name in fields}
+
+    def fragment_key(self, fields=None):
+        """Return a key that changes whenever :meth:`as_dict` would."""
+        key = ("post", self.id, self.updated_at, fields)
+        if fields is None or 'user' in fields:
+            key += (self.user_id, self.user.updated_at)
+        return key
+
+
+attach_search_index(Post.__table__)
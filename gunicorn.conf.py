@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Gunicorn server hooks, read from the working directory."""
+import os
+import shutil
+
+
+def on_starting(server):
+    """Start with an empty Prometheus multiprocess directory."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    """Drop the live-process gauges of an exited worker; its counters are kept."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
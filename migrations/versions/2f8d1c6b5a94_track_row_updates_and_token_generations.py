@@ -0,0 +1,42 @@
+"""Track row updates and token generations
+
+Revision ID: 2f8d1c6b5a94
+Revises: e6377d336fc8
+Create Date: 2026-10-18 19:15:01.052317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f8d1c6b5a94'
+down_revision = 'e6377d336fc8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows count as last updated when they were created, with no revoked tokens
+    for table in ('users', 'posts'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            if table == 'users':
+                batch_op.add_column(sa.Column('token_generation', sa.Integer(), nullable=True,
+                                              server_default='0'))
+        op.execute(f"UPDATE {table} SET updated_at = created_at")
+    op.execute("UPDATE users SET token_generation = 0 WHERE token_generation IS NULL")
+    for table in ('users', 'posts'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+            if table == 'users':
+                batch_op.alter_column('token_generation', existing_type=sa.Integer(), nullable=False,
+                                      existing_server_default='0')
+
+
+def downgrade():
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.drop_column('updated_at')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_generation')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,38 @@
+"""Index posts and roles by user
+
+Revision ID: 43237305d3dd
+Revises: 2f8d1c6b5a94
+Create Date: 2026-10-18 19:15:07.327811
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '43237305d3dd'
+down_revision = '2f8d1c6b5a94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build the indexes without blocking writes to the tables;
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+        with op.get_context().autocommit_block():
+            _create_indexes(postgresql_concurrently=True)
+    else:
+        _create_indexes()
+
+
+def _create_indexes(**kw):
+    op.create_index('ix_posts_user_id_created_at_id', 'posts', ['user_id', 'created_at', 'id'],
+                    unique=False, **kw)
+    op.create_index('ix_posts_user_id_id', 'posts', ['user_id', 'id'], unique=False, **kw)
+    op.create_index(op.f('ix_roles_user_id'), 'roles', ['user_id'], unique=False, **kw)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_roles_user_id'), table_name='roles')
+    op.drop_index('ix_posts_user_id_id', table_name='posts')
+    op.drop_index('ix_posts_user_id_created_at_id', table_name='posts')
@@ -0,0 +1,54 @@
+"""Add the full-text search index over posts
+
+Revision ID: 9b1f4c2d7a10
+Revises: 43237305d3dd
+Create Date: 2026-10-18 20:05:12.418903
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1f4c2d7a10'
+down_revision = '43237305d3dd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("""ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(content, '')), 'B')
+        ) STORED""")
+        op.execute("CREATE INDEX ix_posts_search_vector ON posts USING GIN (search_vector)")
+    elif dialect == 'sqlite':
+        op.execute("""CREATE VIRTUAL TABLE posts_fts USING fts5(
+            title, content, content='posts', content_rowid='id', tokenize='porter unicode61'
+        )""")
+        op.execute("""CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END""")
+        op.execute("""CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+        END""")
+        op.execute("""CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END""")
+        # Index the posts that already exist
+        op.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_posts_search_vector")
+        op.execute("ALTER TABLE posts DROP COLUMN IF EXISTS search_vector")
+    elif dialect == 'sqlite':
+        for name in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS posts_fts_{name}")
+        op.execute("DROP TABLE IF EXISTS posts_fts")
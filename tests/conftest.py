@@ -7,6 +7,7 @@ import pytest
 from webtest import TestApp
 
 from flask_blog_api.app import create_app
+from flask_blog_api.budget import query_budget as _query_budget
 from flask_blog_api.database import db as _db
 
 from .factories import UserFactory
@@ -51,3 +52,16 @@ def user(db):
     user = UserFactory(password="myprecious")
     db.session.commit()
     return user
+
+
+@pytest.fixture
+def query_budget(db):
+    """Return a context manager failing the test when its block runs more than ``limit`` SQL statements.
+
+    By default it also fails when one statement shape runs three times, a likely N+1.
+    """
+
+    def budget(limit, n_plus_one=3):
+        return _query_budget(limit, n_plus_one=n_plus_one)
+
+    return budget
@@ -10,3 +10,6 @@ DEBUG_TB_ENABLED = False
 CACHE_TYPE = "simple"  # Can be "memcached", "redis", etc.
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 WTF_CSRF_ENABLED = False  # Allows form testing
+DB_UNIT_OF_WORK = True  # Production default: one commit per request
+SINGLE_PROCESS = True  # Per-process caches are consistent
+API_CACHE_TTL = {"users": 30, "user": 60, "posts": 30, "post": 60, "search": 30}
@@ -4,6 +4,7 @@ import datetime as dt
 
 import json
 import pytest
+from werkzeug.http import http_date
 
 from flask_blog_api.user.models import Role, User, Post
 
@@ -26,7 +27,7 @@ class TestAPI:
         assert any([u["email"] == email for u in users_data])
         assert user.check_password(password)
 
-    def test_users_api(self, testapp):
+    def test_users_api(self, testapp, query_budget):
         """Test users endpoints"""
         # Create a user for auth
         username = "barqux"
@@ -45,7 +46,8 @@ class TestAPI:
                 "last_name": "bar",
                 "is_admin": False,
         }
-        response = testapp.post_json("/api/v0/users", data)
+        with query_budget(3):
+            response = testapp.post_json("/api/v0/users", data)
         assert response.json["username"] == data["username"]
         assert response.json["email"] == data["email"]
         assert response.json["first_name"] == data["first_name"]
@@ -54,7 +56,8 @@ class TestAPI:
 
         # Validate our user data from the API
         user = User.query.filter_by(username=data['username']).first()
-        response = testapp.get("/api/v0/users", data)
+        with query_budget(2):
+            response = testapp.get("/api/v0/users", data)
         users_data = json.loads(response.body)["users"]
         assert any([u['username'] == data['username'] for u in users_data])
         assert any([u["email"] == data["email"] for u in users_data])
@@ -69,20 +72,22 @@ class TestAPI:
         testapp.authorization = ('Basic', (user.username, password))
 
         # Get our auth user data
-        response = testapp.get(f"/api/v0/users/{username}")
+        with query_budget(3):
+            response = testapp.get(f"/api/v0/users/{username}")
         assert response.json["username"] == username
         assert response.json["email"] == email
         assert user.check_password(password)
 
         # Update our auth user data
         email = "qux2@foo.com"
-        response = testapp.put_json(
-            f"/api/v0/users/{username}",
-            {
-                'username': username,
-                'email': email,
-            }
-        )
+        with query_budget(3):
+            response = testapp.put_json(
+                f"/api/v0/users/{username}",
+                {
+                    'username': username,
+                    'email': email,
+                }
+            )
         assert response.json["email"] == email
         response = testapp.get(f"/api/v0/users/{username}")
         assert response.json["email"] == email
@@ -91,11 +96,12 @@ class TestAPI:
         response = testapp.get(f"/api/v0/users/{username}")
         assert response.status_code == 200
         assert response.json['username'] == username
-        response = testapp.delete(f"/api/v0/users/{username}")
+        with query_budget(4):
+            response = testapp.delete(f"/api/v0/users/{username}")
         assert response.status_code == 200
         assert User.query.filter_by(username=username).first() is None
 
-    def test_posts_api(self, testapp):
+    def test_posts_api(self, testapp, query_budget):
         """Test posts endpoints"""
         # Create a user for auth
         username = "barqux"
@@ -106,17 +112,19 @@ class TestAPI:
         testapp.authorization = ('Basic', (user.username, password))
 
         # Create some posts
-        response = testapp.post_json(
-            f"/api/v0/users/{username}/posts",
-            {
-                'title': 'post title',
-                'content': 'post content',
-                'active': False
-            }
-        )
+        with query_budget(5):
+            response = testapp.post_json(
+                f"/api/v0/users/{username}/posts",
+                {
+                    'title': 'post title',
+                    'content': 'post content',
+                    'active': False
+                }
+            )
 
         # Get our post
-        response = testapp.get(f"/api/v0/users/{username}/posts")
+        with query_budget(3):
+            response = testapp.get(f"/api/v0/users/{username}/posts")
         assert len(response.json['posts']) == 1
 
         # Create some more posts
@@ -129,35 +137,354 @@ class TestAPI:
                     'active': True
                 }
             )
-        response = testapp.get(f"/api/v0/users/{username}/posts")
+        with query_budget(3):
+            response = testapp.get(f"/api/v0/users/{username}/posts")
         assert len(response.json['posts']) == 11
 
         # Update our posts
-        posts = Post.query.all()
-        for post in posts:
-            response = testapp.get(f"/api/v0/users/{username}/posts/{post.id}")
+        # Plain ids: each request's commit expires the test's instances too
+        post_ids = [post.id for post in Post.query.all()]
+        for post_id in post_ids:
+            with query_budget(3):
+                response = testapp.get(f"/api/v0/users/{username}/posts/{post_id}")
             assert response.json['post']['title'].startswith('post title')
             assert response.json['post']['content'].startswith('post content')
-            response = testapp.put_json(
-                f"/api/v0/users/{username}/posts/{post.id}",
-                {
-                    'title': f"new post title",
-                    'content': f"new post content",
-                    'active': True
-                }
-            )
-            response = testapp.get(f"/api/v0/users/{username}/posts/{post.id}")
+            with query_budget(2):
+                response = testapp.put_json(
+                    f"/api/v0/users/{username}/posts/{post_id}",
+                    {
+                        'title': f"new post title",
+                        'content': f"new post content",
+                        'active': True
+                    }
+                )
+            with query_budget(2):
+                response = testapp.get(f"/api/v0/users/{username}/posts/{post_id}")
             assert response.json['post']['title'].startswith('new post title')
             assert response.json['post']['content'].startswith('new post content')
         response = testapp.get(f"/api/v0/users/{username}/posts")
         assert len(response.json['posts']) == 11
 
         # Delete our posts
-        for post in posts:
-            assert Post.query.filter_by(id=post.id).first() is not None
-            response = testapp.delete(f"/api/v0/users/{username}/posts/{post.id}")
+        for post_id in post_ids:
+            assert Post.query.filter_by(id=post_id).first() is not None
+            with query_budget(1):
+                response = testapp.delete(f"/api/v0/users/{username}/posts/{post_id}")
             assert response.status_code == 200
-            assert Post.query.filter_by(id=post.id).first() is None
+            assert Post.query.filter_by(id=post_id).first() is None
         response = testapp.get(f"/api/v0/users/{username}/posts")
         assert response.status_code == 200
         assert len(response.json['posts']) == 0
+
+    def test_users_pagination(self, testapp):
+        """Test keyset pagination of the users listing."""
+        password = "pagerpass"
+        user = User.create(username="pager", email="pager@example.com", password=password)
+        for i in range(4):
+            User.create(username=f"paged{i}", email=f"paged{i}@example.com")
+        testapp.authorization = ('Basic', (user.username, password))
+
+        seen = []
+        response = testapp.get("/api/v0/users", {'limit': 2})
+        while True:
+            assert len(response.json['users']) <= 2
+            seen.extend(u['username'] for u in response.json['users'])
+            if response.json['next'] is None:
+                break
+            response = testapp.get("/api/v0/users", {'limit': 2, 'after': response.json['next']})
+        assert seen == ["pager", "paged0", "paged1", "paged2", "paged3"]
+
+        # The page size is capped by the server
+        testapp.app.config['API_MAX_PAGE_SIZE'] = 3
+        response = testapp.get("/api/v0/users", {'limit': 1000})
+        assert len(response.json['users']) == 3
+
+        # Malformed parameters are rejected
+        testapp.get("/api/v0/users", {'limit': 0}, status=400)
+        testapp.get("/api/v0/users", {'after': 'not-a-cursor'}, status=400)
+
+    def test_posts_pagination(self, testapp, db, query_budget):
+        """Test posts are paginated with a fixed number of statements per page."""
+        password = "authorpass"
+        user = User.create(username="author", email="author@example.com", password=password)
+        for i in range(7):
+            Post.create(user=user, title=f"title{i}", content=f"content{i}")
+        db.session.expire_all()
+        testapp.authorization = ('Basic', (user.username, password))
+
+        # Each page costs at most the auth lookup, the ETag probe, the author
+        # lookup and one posts query, however many posts it holds
+        pages = 0
+        seen = []
+        after = None
+        while True:
+            params = {'limit': 3}
+            if after is not None:
+                params['after'] = after
+            with query_budget(4):
+                response = testapp.get(f"/api/v0/users/{user.username}/posts", params)
+            pages += 1
+            seen.extend(p['title'] for p in response.json['posts'])
+            assert all(p['user'] == user.full_name for p in response.json['posts'])
+            after = response.json['next']
+            if after is None:
+                break
+        assert seen == [f"title{i}" for i in range(7)]
+        assert pages == 3
+
+    def test_bulk_create(self, testapp, query_budget):
+        """Test bulk creation of users and posts."""
+        password = "bulkpass"
+        user = User.create(username="bulker", email="bulker@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+
+        users = [
+            {
+                "username": f"bulk{i}",
+                "email": f"bulk{i}@example.com",
+                "password": f"password{i}",
+                "first_name": "Bulk",
+                "last_name": f"User{i}",
+                "is_admin": False,
+            }
+            for i in range(3)
+        ]
+        with query_budget(4):
+            response = testapp.post_json("/api/v0/bulk/users", users)
+        assert [r['status'] for r in response.json['results']] == ['created'] * 3
+        created = User.query.filter_by(username="bulk1").first()
+        assert created.check_password("password1")
+        assert created.created_at is not None
+
+        # Nothing is written if any item is invalid
+        invalid = [dict(users[0], username="fresh", email="fresh@example.com"), {"username": "x" * 100}, users[2]]
+        response = testapp.post_json("/api/v0/bulk/users", invalid, status=400)
+        results = response.json['results']
+        assert results[0]['status'] == 'valid'
+        assert results[1]['errors']['username'] == "Longer than 80 characters"
+        assert results[1]['errors']['email'] == "Missing required field"
+        assert results[2]['errors']['username'] == "Already exists"
+        assert User.query.filter_by(username="fresh").first() is None
+
+        posts = [{"title": f"title{i}", "content": f"content{i}", "active": True} for i in range(25)]
+        with query_budget(3):
+            response = testapp.post_json(f"/api/v0/users/{user.username}/posts/bulk", posts)
+        assert len(response.json['results']) == 25
+        response = testapp.get(f"/api/v0/users/{user.username}/posts")
+        assert [p['title'] for p in response.json['posts']] == [f"title{i}" for i in range(25)]
+
+        testapp.post_json(f"/api/v0/users/{user.username}/posts/bulk", {"title": "x"}, status=400)
+        testapp.post_json("/api/v0/users/nobody/posts/bulk", posts, status=404)
+
+        # The bulk route does not shadow a user named "bulk"
+        User.create(username="bulk", email="bulk@example.com")
+        assert testapp.get("/api/v0/users/bulk").json['username'] == "bulk"
+
+    def test_conditional_get(self, testapp, db):
+        """Test ETag and Last-Modified revalidation."""
+        password = "etagpass"
+        user = User.create(username="etagger", email="etagger@example.com", password=password)
+        post = Post.create(user=user, title="title", content="content")
+        testapp.authorization = ('Basic', (user.username, password))
+
+        for url, listing in [
+            ("/api/v0/users", True),
+            (f"/api/v0/users/{user.username}", False),
+            (f"/api/v0/users/{user.username}/posts", True),
+            (f"/api/v0/users/{user.username}/posts/{post.id}", False),
+        ]:
+            response = testapp.get(url)
+            etag = response.headers['ETag']
+            testapp.get(url, headers={'If-None-Match': etag}, status=304)
+            testapp.get(url, headers={'If-None-Match': '"stale"'}, status=200)
+            if listing:
+                # Listings are only revalidated by ETag
+                assert 'Last-Modified' not in response.headers
+            else:
+                testapp.get(
+                    url,
+                    headers={'If-Modified-Since': response.headers['Last-Modified']},
+                    status=304,
+                )
+
+        # Deleting a post changes the listing without a newer updated_at
+        url = f"/api/v0/users/{user.username}/posts"
+        extra = Post.create(user=user, title="extra", content="content")
+        post.update(title="newest")
+        since = http_date(dt.datetime.utcnow() + dt.timedelta(seconds=1))
+        testapp.delete(f"{url}/{extra.id}")
+        response = testapp.get(url, headers={'If-Modified-Since': since}, status=200)
+        assert [p['title'] for p in response.json['posts']] == ["newest"]
+
+        # A change to a post gives the listing a new ETag
+        url = f"/api/v0/users/{user.username}/posts"
+        etag = testapp.get(url).headers['ETag']
+        post.update(title="changed")
+        response = testapp.get(url, headers={'If-None-Match': etag}, status=200)
+        assert response.headers['ETag'] != etag
+        assert response.json['posts'][0]['title'] == "changed"
+
+        # As does a change to the author, whose name is in every post
+        etag = response.headers['ETag']
+        user.update(first_name="Changed")
+        testapp.get(url, headers={'If-None-Match': etag}, status=200)
+
+        # Different pages have different ETags
+        first = testapp.get(url, {'limit': 1}).headers['ETag']
+        assert first != testapp.get(url, {'limit': 2}).headers['ETag']
+
+    def test_streamed_listings(self, testapp):
+        """Test streamed listings contain every row."""
+        password = "streampass"
+        user = User.create(username="streamer", email="streamer@example.com", password=password)
+        for i in range(30):
+            Post.create(user=user, title=f"title{i}", content=f"content{i}")
+        testapp.authorization = ('Basic', (user.username, password))
+        testapp.app.config['API_STREAM_BATCH_SIZE'] = 7
+
+        response = testapp.get(f"/api/v0/users/{user.username}/posts", {'stream': 1})
+        assert response.headers['ETag']
+        assert [p['title'] for p in response.json['posts']] == [f"title{i}" for i in range(30)]
+        assert response.json['posts'][0]['user'] == user.full_name
+        assert response.json['next'] is None
+
+        # Streams honour the cursor of a previous page
+        page = testapp.get(f"/api/v0/users/{user.username}/posts", {'limit': 10})
+        response = testapp.get(
+            f"/api/v0/users/{user.username}/posts",
+            {'stream': 1, 'after': page.json['next']},
+        )
+        assert len(response.json['posts']) == 20
+
+        response = testapp.get("/api/v0/users", {'stream': 'true'})
+        assert [u['username'] for u in response.json['users']] == [user.username]
+
+    def test_nested_post_statements(self, testapp, db, query_budget):
+        """Test nested post routes resolve the author and post in single statements."""
+        password = "nestedpass"
+        user = User.create(username="nested", email="nested@example.com", password=password)
+        post = Post.create(user=user, title="title", content="content", active=False)
+        post_id, url = post.id, f"/api/v0/users/{user.username}/posts/{post.id}"
+        testapp.authorization = ('Basic', (user.username, password))
+        testapp.get(f"/api/v0/users/{user.username}")
+        db.session.expire_all()
+
+        # The ETag probe and the joined post lookup
+        with query_budget(2):
+            response = testapp.get(url)
+        assert response.json['post']['user'] == user.full_name
+
+        # One UPDATE, then the joined lookup for the response body
+        with query_budget(2) as log:
+            response = testapp.put_json(url, {'title': "new title"})
+        assert response.json['title'] == "new title"
+        assert response.json['content'] == "content"
+        assert response.json['active'] is False
+        assert log.statements[0].startswith("UPDATE posts")
+
+        with query_budget(1) as log:
+            testapp.delete(url)
+        assert log.statements[0].startswith("DELETE FROM posts")
+
+        assert Post.query.get(post_id) is None
+        assert testapp.get(url).json == {}
+        testapp.delete(url, status=404)
+        testapp.put_json(url, {'title': "gone"}, status=404)
+        testapp.put_json(f"/api/v0/users/nobody/posts/{post_id}", {}, status=404)
+
+    def test_nested_post_update_is_visible(self, testapp):
+        """Test single-statement updates bump updated_at and refresh cached reads."""
+        password = "nestedpass"
+        user = User.create(username="nested", email="nested@example.com", password=password)
+        post = Post.create(user=user, title="title", content="content")
+        url = f"/api/v0/users/{user.username}/posts/{post.id}"
+        testapp.authorization = ('Basic', (user.username, password))
+        before = post.updated_at
+
+        etag = testapp.get(url).headers['ETag']
+        testapp.put_json(url, {'content': "changed"})
+        assert Post.query.get(post.id).updated_at > before
+        response = testapp.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.json['post']['content'] == "changed"
+        listing = testapp.get(f"/api/v0/users/{user.username}/posts")
+        assert [p['content'] for p in listing.json['posts']] == ["changed"]
+
+    def test_sparse_fieldsets(self, testapp, db, query_budget):
+        """Test ?fields= trims both the responses and the selected columns."""
+        password = "sparsepass"
+        user = User.create(username="sparse", email="sparse@example.com", password=password)
+        post = Post.create(user=user, title="title", content="long content")
+        testapp.authorization = ('Basic', (user.username, password))
+        username, post_id, full_name = user.username, post.id, user.full_name
+        db.session.expire_all()
+
+        with query_budget(5) as log:
+            response = testapp.get(f"/api/v0/users/{username}/posts",
+                                   {'fields': "id,title,created_at"})
+        assert response.json['posts'] == [
+            {'id': post_id, 'created_at': str(post.created_at), 'title': "title"}
+        ]
+        assert "posts.content" not in log.statements[-1]
+
+        with query_budget(2) as log:
+            response = testapp.get(f"/api/v0/users/{username}/posts/{post_id}",
+                                   {'fields': "title"})
+        assert response.json == {'post': {'title': "title"}}
+        assert "posts.content" not in log.statements[-1]
+        assert "users.first_name" not in log.statements[-1]
+
+        with query_budget(2) as log:
+            response = testapp.get(f"/api/v0/users/{username}/posts/{post_id}",
+                                   {'fields': "user,title"})
+        assert response.json == {'post': {'user': full_name, 'title': "title"}}
+        assert "posts.content" not in log.statements[-1]
+
+        with query_budget(2) as log:
+            response = testapp.get("/api/v0/users", {'fields': "username"})
+        assert response.json['users'] == [{'username': "sparse"}]
+        assert "users.email" not in log.statements[-1]
+
+        # Full responses are not served from the sparse fragments
+        response = testapp.get(f"/api/v0/users/{user.username}/posts/{post.id}")
+        assert response.json['post'] == post.as_dict()
+        testapp.get("/api/v0/users", {'fields': "username,password"}, status=400)
+        testapp.get("/api/v0/users", {'fields': ","}, status=400)
+
+    def test_body_validation(self, testapp):
+        """Test invalid bodies get a 400 listing every invalid field."""
+        password = "schemapass"
+        user = User.create(username="schema", email="schema@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        url = f"/api/v0/users/{user.username}/posts"
+
+        response = testapp.post_json(url, {'title': "x" * 201, 'active': "yes", 'extra': 1}, status=400)
+        assert response.json['message'] == "Invalid request body"
+        assert response.json['errors'] == {
+            'title': "Longer than 200 characters",
+            'active': "Expected bool",
+            'extra': "Unknown field",
+            'content': "Missing required field",
+        }
+        testapp.post_json(url, ["title"], status=400)
+        response = testapp.put_json(f"/api/v0/users/{user.username}", {'is_admin': 1}, status=400)
+        assert response.json['errors'] == {'is_admin': "Expected bool"}
+        assert Post.query.count() == 0
+
+        post_id = testapp.post_json(url, {'title': "title", 'content': "content", 'active': True}).json['id']
+        response = testapp.put_json(f"{url}/{post_id}", {'title': None, 'content': "changed"})
+        assert (response.json['title'], response.json['content']) == ("title", "changed")
+
+    def test_form_bodies(self, testapp):
+        """Test form bodies are coerced to the fields' types."""
+        password = "formpass"
+        user = User.create(username="former", email="former@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        url = f"/api/v0/users/{user.username}/posts"
+
+        assert testapp.post(url, {'title': "t", 'content': "c", 'active': "True"}).json['active'] is True
+        assert testapp.post(url, {'title': "t", 'content': "c", 'active': ""}).json['active'] is False
+        response = testapp.post(url, {'title': "t", 'content': "c", 'active': "maybe"}, status=400)
+        assert response.json['errors'] == {'active': "Expected bool"}
+        response = testapp.put(f"/api/v0/users/{user.username}", {'first_name': "Formal"})
+        assert response.json['first_name'] == "Formal"
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Authentication helper tests."""
+import pytest
+
+from flask_blog_api.auth import (
+    MAX_PER_PROCESS_TTL,
+    AccessTokens,
+    CredentialCache,
+    TTLCache,
+)
+from flask_blog_api.extensions import credential_cache
+from flask_blog_api.user.models import User
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        """Create instance."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class TestTTLCache:
+    """TTL cache tests."""
+
+    def test_entries_expire(self):
+        """Entries are dropped once their TTL has passed."""
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        clock.now = 5
+        assert cache.get("a") is None
+        assert cache.stats()["size"] == 0
+
+    def test_size_is_bounded(self):
+        """The least recently used entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+
+class TestCredentialCache:
+    """Credential cache tests."""
+
+    def test_check_requires_matching_password(self, app):
+        """Only the remembered password is accepted."""
+        cache = CredentialCache(app)
+        cache.remember("foo", "secret")
+        assert cache.check("foo", "secret") is True
+        assert cache.check("foo", "wrong") is False
+        assert cache.check("bar", "secret") is False
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+
+    def test_plaintext_is_not_stored(self, app):
+        """Entries hold a keyed digest, not the password."""
+        cache = CredentialCache(app)
+        cache.remember("foo", "secret")
+        stored = cache._cache.get("foo")
+        assert b"secret" not in stored
+
+    def test_invalidate(self, app):
+        """Invalidated credentials must be verified again."""
+        cache = CredentialCache(app)
+        cache.remember("foo", "secret")
+        cache.invalidate("foo")
+        assert cache.check("foo", "secret") is False
+
+    def test_ttl_is_capped_with_several_processes(self, app):
+        """Other workers never keep stale credentials for more than a few seconds."""
+        app.config.update(AUTH_CACHE_TTL=3600, SINGLE_PROCESS=False)
+        assert CredentialCache(app)._cache.ttl == MAX_PER_PROCESS_TTL
+        assert AccessTokens(app)._accounts.ttl == MAX_PER_PROCESS_TTL
+        app.config.update(SINGLE_PROCESS=True)
+        assert CredentialCache(app)._cache.ttl == 3600
+
+
+@pytest.mark.usefixtures("db")
+class TestCredentialCacheAPI:
+    """Credential cache integration with the REST API."""
+
+    def test_repeated_requests_hit_the_cache(self, testapp):
+        """Only the first request verifies the password."""
+        password = "cachedpass"
+        user = User.create(username="cached", email="cached@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        for _ in range(3):
+            testapp.get(f"/api/v0/users/{user.username}")
+        assert credential_cache.stats()["hits"] == 2
+        assert credential_cache.stats()["misses"] == 1
+
+    def test_deleted_user_is_rejected(self, testapp):
+        """Deleting an account evicts its cached credentials."""
+        password = "deletedpass"
+        user = User.create(username="deleted", email="deleted@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        testapp.get(f"/api/v0/users/{user.username}")
+        testapp.delete(f"/api/v0/users/{user.username}")
+        testapp.get(f"/api/v0/users/{user.username}", status=403)
+
+
+class TestAccessTokens:
+    """Access token tests."""
+
+    def test_round_trip(self, app):
+        """A freshly issued token verifies to its username."""
+        tokens = AccessTokens(app)
+        tokens.account_loader(lambda username: (1, 0))
+        assert tokens.verify(tokens.issue("foo", 1, 0)) == "foo"
+
+    def test_tampered_and_stale_tokens_are_rejected(self, app):
+        """Bad signatures and old generations do not verify."""
+        tokens = AccessTokens(app)
+        tokens.account_loader(lambda username: (1, 1))
+        assert tokens.verify(tokens.issue("foo", 1, 1) + "x") is None
+        assert tokens.verify(tokens.issue("foo", 1, 0)) is None
+        assert tokens.verify("garbage") is None
+
+    def test_expired_tokens_are_rejected(self, app):
+        """Tokens older than AUTH_TOKEN_TTL do not verify."""
+        app.config["AUTH_TOKEN_TTL"] = -1
+        tokens = AccessTokens(app)
+        tokens.account_loader(lambda username: (1, 0))
+        assert tokens.verify(tokens.issue("foo", 1, 0)) is None
+
+    def test_tokens_of_another_account_are_rejected(self, app):
+        """A token does not verify for a new account that reuses its username."""
+        tokens = AccessTokens(app)
+        tokens.account_loader(lambda username: (2, 0))
+        assert tokens.verify(tokens.issue("foo", 1, 0)) is None
+
+
+@pytest.mark.usefixtures("db")
+class TestAccessTokensAPI:
+    """Bearer token authentication on the REST API."""
+
+    def test_bearer_token_lifecycle(self, testapp):
+        """Exchange credentials for a token, use it, then revoke it."""
+        password = "tokenpass"
+        user = User.create(username="tokened", email="tokened@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        token = testapp.post("/api/v0/token").json['token']
+
+        testapp.authorization = ('Bearer', token)
+        response = testapp.get(f"/api/v0/users/{user.username}")
+        assert response.json['username'] == user.username
+
+        testapp.delete("/api/v0/token")
+        testapp.get(f"/api/v0/users/{user.username}", status=403)
+
+    def test_tokens_cannot_renew_themselves(self, testapp):
+        """Only HTTP Basic credentials are exchanged for a token."""
+        password = "renewpass"
+        user = User.create(username="renewer", email="renewer@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        token = testapp.post("/api/v0/token").json['token']
+
+        testapp.authorization = ('Bearer', token)
+        response = testapp.post("/api/v0/token", status=403)
+        assert response.json['message'] == "A token can only be issued for HTTP Basic credentials"
+
+    def test_recreated_accounts_do_not_inherit_tokens(self, testapp):
+        """A token of a deleted account is rejected once its username is registered again."""
+        password = "recreatedpass"
+        user = User.create(username="recreated", email="recreated@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        token = testapp.post("/api/v0/token").json['token']
+        testapp.delete(f"/api/v0/users/{user.username}")
+        # Like a PostgreSQL sequence, move past the deleted id (SQLite reuses the highest one)
+        User.create(username="bystander", email="bystander@example.com", password="otherpass")
+        User.create(username="recreated", email="recreated@example.com", password="otherpass")
+
+        testapp.authorization = ('Bearer', token)
+        testapp.get("/api/v0/users/recreated", status=403)
+
+    def test_password_change_revokes_tokens(self, testapp):
+        """Updating the password invalidates outstanding tokens."""
+        password = "tokenpass"
+        user = User.create(username="rotated", email="rotated@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        token = testapp.post("/api/v0/token").json['token']
+        testapp.put_json(f"/api/v0/users/{user.username}", {'password': "newpass"})
+        assert User.query.filter_by(username="rotated").first().check_password("newpass")
+
+        testapp.authorization = ('Bearer', token)
+        testapp.get(f"/api/v0/users/{user.username}", status=403)
+        testapp.authorization = ('Basic', (user.username, password))
+        testapp.get(f"/api/v0/users/{user.username}", status=403)
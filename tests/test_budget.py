@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Query budget tests."""
+import pytest
+
+from flask_blog_api.app import create_app
+from flask_blog_api.budget import QueryBudgetExceeded, query_budget, statement_shape
+from flask_blog_api.extensions import db as _db
+from flask_blog_api.user.models import Post, User
+
+from . import settings
+
+
+def make_posts(count):
+    """Create ``count`` posts, each by a different author, and forget the loaded authors."""
+    for i in range(count):
+        user = User.create(username=f"author{i}", email=f"author{i}@example.com")
+        Post.create(user=user, title=f"title{i}", content="content")
+    _db.session.expire_all()
+
+
+def serialize_posts():
+    """Serialize every post the slow way, lazy-loading each author."""
+    return [post.as_dict() for post in Post.query.all()]
+
+
+@pytest.mark.usefixtures("db")
+class TestQueryBudget:
+    """Query budget tests."""
+
+    def test_budget_exceeded(self):
+        """Blocks over their budget fail and list the statements."""
+        make_posts(2)
+        with query_budget(1) as log:
+            Post.query.all()
+        assert len(log) == 1
+
+        with pytest.raises(QueryBudgetExceeded, match="3 statements executed, the budget is 2"):
+            with query_budget(2):
+                serialize_posts()
+
+    def test_decorator(self):
+        """The budget also decorates functions."""
+        make_posts(2)
+        with pytest.raises(QueryBudgetExceeded):
+            query_budget(1)(serialize_posts)()
+
+    def test_n_plus_one(self):
+        """A statement shape repeated in a loop is reported with the code issuing it."""
+        make_posts(3)
+        with pytest.raises(QueryBudgetExceeded) as excinfo:
+            with query_budget(n_plus_one=3):
+                serialize_posts()
+        message = str(excinfo.value)
+        assert "Likely N+1: this statement ran 3 times" in message
+        assert "in as_dict" in message
+        assert "test_budget.py" in message
+
+    def test_statement_shape(self):
+        """Parameter styles, parameter lists and whitespace are normalized."""
+        assert statement_shape("SELECT *\n FROM posts WHERE id IN (?, ?, ?)") == \
+            "SELECT * FROM posts WHERE id IN (?)"
+        assert statement_shape("SELECT * FROM posts WHERE id = %(id_1)s") == \
+            "SELECT * FROM posts WHERE id = ?"
+
+
+def test_request_budget(tmp_path):
+    """Staging apps flag requests over budget or with N+1 patterns."""
+    config = {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+    config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'budget.db'}",
+        QUERY_N_PLUS_ONE_THRESHOLD=3,
+        QUERY_BUDGET_ACTION="raise",
+    )
+    app = create_app(type("BudgetConfig", (), config))
+    app.add_url_rule("/posts-slowly", "posts_slowly", lambda: {"posts": serialize_posts()})
+    app.add_url_rule("/posts-quickly", "posts_quickly", lambda: {"posts": len(Post.query.all())})
+    with app.app_context():
+        _db.create_all()
+        make_posts(3)
+        _db.session.remove()
+        client = app.test_client()
+        assert client.get("/posts-quickly").status_code == 200
+        with pytest.raises(QueryBudgetExceeded, match="GET /posts-slowly: Likely N\\+1"):
+            client.get("/posts-slowly")
+        _db.session.remove()
+        _db.drop_all()
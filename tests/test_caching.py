@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Response cache tests."""
+import pytest
+
+from flask_blog_api.extensions import response_cache
+from flask_blog_api.user.models import Post, User
+
+
+@pytest.fixture
+def author(db, testapp):
+    """Create an authenticated author for the API tests."""
+    password = "cachepass"
+    user = User.create(username="cacher", email="cacher@example.com", password=password)
+    testapp.authorization = ('Basic', (user.username, password))
+    return user
+
+
+@pytest.mark.usefixtures("db")
+class TestResponseCache:
+    """Response cache tests."""
+
+    def test_repeated_reads_hit_the_cache(self, testapp, author):
+        """Identical GETs are served from the cache."""
+        for _ in range(3):
+            testapp.get(f"/api/v0/users/{author.username}")
+            testapp.get(f"/api/v0/users/{author.username}/posts", {'limit': 5})
+        stats = response_cache.stats()
+        assert stats['user']['hits'] == 2
+        assert stats['user']['misses'] == 1
+        assert stats['posts']['hits'] == 2
+        assert stats['posts']['hit_ratio'] == pytest.approx(2 / 3)
+
+    def test_model_writes_invalidate(self, testapp, author):
+        """Saving or deleting through CRUDMixin evicts the affected responses."""
+        testapp.get(f"/api/v0/users/{author.username}/posts")
+        post = Post.create(user=author, title="fresh", content="content")
+        response = testapp.get(f"/api/v0/users/{author.username}/posts")
+        assert [p['title'] for p in response.json['posts']] == ["fresh"]
+
+        testapp.get(f"/api/v0/users/{author.username}/posts/{post.id}")
+        post.update(title="updated")
+        response = testapp.get(f"/api/v0/users/{author.username}/posts/{post.id}")
+        assert response.json['post']['title'] == "updated"
+
+        # The author's name is embedded in each post
+        author.update(first_name="Renamed")
+        response = testapp.get(f"/api/v0/users/{author.username}/posts/{post.id}")
+        assert response.json['post']['user'].startswith("Renamed")
+
+        post.delete()
+        response = testapp.get(f"/api/v0/users/{author.username}/posts")
+        assert response.json['posts'] == []
+
+    def test_rolled_back_writes_do_not_invalidate(self, db, testapp, author):
+        """Only committed changes bump the cached versions."""
+        testapp.get(f"/api/v0/users/{author.username}")
+        author.update(commit=False, first_name="Uncommitted")
+        db.session.flush()
+        db.session.rollback()
+        testapp.get(f"/api/v0/users/{author.username}")
+        assert response_cache.stats()['user']['hits'] == 1
+
+    def test_bulk_writes_invalidate(self, testapp, author):
+        """Bulk inserts evict the listing they change."""
+        testapp.get(f"/api/v0/users/{author.username}/posts")
+        posts = [{"title": "bulk", "content": "content", "active": True}]
+        testapp.post_json(f"/api/v0/users/{author.username}/posts/bulk", posts)
+        response = testapp.get(f"/api/v0/users/{author.username}/posts")
+        assert len(response.json['posts']) == 1
+
+    def test_zero_ttl_disables(self, testapp, author):
+        """Endpoints with a TTL of 0 are not cached."""
+        response_cache.ttls['user'] = 0
+        testapp.get(f"/api/v0/users/{author.username}")
+        testapp.get(f"/api/v0/users/{author.username}")
+        assert response_cache.stats()['user']['hits'] == 0
+
+    def test_off_without_ttls(self):
+        """Without API_CACHE_TTL nothing is cached."""
+        from flask import Flask
+
+        response_cache.init_app(Flask(__name__))
+        assert response_cache.stats() == {}
+
+    def test_ttls_need_a_shared_backend(self):
+        """Caching with a per-process backend is refused unless the app runs in one process."""
+        from flask import Flask
+
+        other = Flask(__name__)
+        other.config.update(API_CACHE_TTL={"users": 30}, CACHE_TYPE="simple")
+        with pytest.raises(ValueError):
+            response_cache.init_app(other)
+        other.config.update(CACHE_TYPE="redis")
+        response_cache.init_app(other)
+        assert response_cache.ttls == {"users": 30}
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Response compression tests.
+
+Webtest decodes compressed bodies, so these tests use Flask's test client.
+"""
+import base64
+import gzip
+import json
+
+import pytest
+
+from flask_blog_api import compression
+from flask_blog_api.user.models import Post, User
+
+PASSWORD = "zippass"
+GZIP = {'Accept-Encoding': "gzip"}
+
+
+@pytest.fixture
+def author(db):
+    """Create an author with enough posts to be worth compressing."""
+    user = User.create(username="zipper", email="zipper@example.com", password=PASSWORD)
+    for i in range(20):
+        Post.create(user=user, title=f"Post {i}", content="Highly compressible text. " * 10)
+    return user
+
+
+@pytest.fixture
+def client(app, author):
+    """Return a test client authenticated as ``author``."""
+    client = app.test_client()
+    credentials = base64.b64encode(f"{author.username}:{PASSWORD}".encode()).decode()
+    client.environ_base['HTTP_AUTHORIZATION'] = f"Basic {credentials}"
+    return client
+
+
+@pytest.fixture
+def compressions(monkeypatch):
+    """Count the bodies gzipped outside of streams."""
+    calls = []
+    compress, compress_stream, level_key = compression.ENCODINGS["gzip"]
+
+    def counting(data, level):
+        calls.append(level)
+        return compress(data, level)
+
+    monkeypatch.setitem(compression.ENCODINGS, "gzip", (counting, compress_stream, level_key))
+    return calls
+
+
+@pytest.mark.usefixtures("db")
+class TestCompression:
+    """Response compression tests."""
+
+    def test_negotiated_gzip(self, client, author):
+        """Clients accepting gzip get a gzipped body with a weak ETag."""
+        url = f"/api/v0/users/{author.username}/posts"
+        plain = client.get(url)
+        assert "Content-Encoding" not in plain.headers
+        assert plain.headers['Vary'] == "Accept-Encoding"
+
+        response = client.get(url, headers=GZIP)
+        assert response.headers['Content-Encoding'] == "gzip"
+        assert int(response.headers['Content-Length']) < len(plain.data)
+        assert json.loads(gzip.decompress(response.data)) == plain.json
+        assert response.headers['ETag'] == "W/" + plain.headers['ETag']
+
+        etag = response.headers['ETag']
+        assert client.get(url, headers=dict(GZIP, **{'If-None-Match': etag})).status_code == 304
+
+    def test_refused_and_small_responses_are_not_compressed(self, app, client, author):
+        """Refused encodings and bodies under the threshold are sent as they are."""
+        url = f"/api/v0/users/{author.username}/posts"
+        response = client.get(url, headers={'Accept-Encoding': "gzip;q=0, deflate"})
+        assert "Content-Encoding" not in response.headers
+
+        response = client.get(f"/api/v0/users/{author.username}", headers=GZIP)
+        assert len(response.data) < app.config["COMPRESS_MIN_SIZE"]
+        assert "Content-Encoding" not in response.headers
+
+        app.config["COMPRESS_ENABLED"] = False
+        assert "Content-Encoding" not in client.get(url, headers=GZIP).headers
+
+    def test_streamed_responses(self, client, author):
+        """Streamed listings are compressed chunk by chunk."""
+        url = f"/api/v0/users/{author.username}/posts?stream=1"
+        response = client.get(url, headers=GZIP)
+        assert response.headers['Content-Encoding'] == "gzip"
+        assert "Content-Length" not in response.headers
+        assert len(json.loads(gzip.decompress(response.data))['posts']) == 20
+
+    def test_cached_responses_keep_their_compressed_body(self, app, client, author, compressions):
+        """Cache hits reuse the stored gzipped body."""
+        url = f"/api/v0/users/{author.username}/posts"
+        first = client.get(url, headers=GZIP)
+        second = client.get(url, headers=GZIP)
+        assert second.data == first.data
+        assert compressions == [app.config["COMPRESS_LEVEL"]]
+
+        # A new version of the listing is compressed again
+        Post.create(user=author, title="Another", content="More text. " * 10)
+        client.get(url, headers=GZIP)
+        assert len(compressions) == 2
+
+    def test_html_pages(self, app):
+        """HTML pages are compressed too."""
+        response = app.test_client().get("/", headers=GZIP)
+        assert response.headers['Content-Encoding'] == "gzip"
+        assert b"</html>" in gzip.decompress(response.data)
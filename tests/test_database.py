@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Database utility tests."""
+import pytest
+from sqlalchemy import event
+
+from flask_blog_api.database import in_unit_of_work, unit_of_work
+from flask_blog_api.user.models import Post, User
+
+
+@pytest.fixture
+def commits(db):
+    """Record every COMMIT sent to the database (releasing a savepoint is not one)."""
+    recorded = []
+    engine = db.engine
+
+    def record(connection):
+        recorded.append(connection)
+
+    event.listen(engine, "commit", record)
+    yield recorded
+    event.remove(engine, "commit", record)
+
+
+@pytest.mark.usefixtures("db")
+class TestUnitOfWork:
+    """Unit of work tests."""
+
+    def test_commits_once(self, commits):
+        """CRUD calls inside the block flush; the block commits once."""
+        with unit_of_work():
+            assert in_unit_of_work()
+            user = User.create(username="foo", email="foo@bar.com")
+            Post.create(user=user, title="title", content="content")
+            user.update(first_name="Foo")
+            assert user.id is not None
+            assert commits == []
+        assert not in_unit_of_work()
+        assert len(commits) == 1
+
+    def test_nested_blocks_commit_at_the_outermost(self, commits):
+        """Only the outermost block commits."""
+        with unit_of_work():
+            with unit_of_work():
+                User.create(username="foo", email="foo@bar.com")
+            assert commits == []
+        assert len(commits) == 1
+
+    def test_failed_nested_block_rolls_back(self, commits):
+        """A nested block that raises loses its writes, even if the outer block commits."""
+        with unit_of_work():
+            with pytest.raises(RuntimeError):
+                with unit_of_work():
+                    User.create(username="inner", email="inner@bar.com")
+                    raise RuntimeError
+            User.create(username="outer", email="outer@bar.com")
+        assert len(commits) == 1
+        assert User.query.filter_by(username="inner").first() is None
+        assert User.query.filter_by(username="outer").first() is not None
+
+    def test_failed_outer_block_rolls_back_nested_writes(self, commits):
+        """Writes of a nested block that succeeded are rolled back with the outer block."""
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                with unit_of_work():
+                    User.create(username="inner", email="inner@bar.com")
+                raise RuntimeError
+        assert commits == []
+        assert User.query.filter_by(username="inner").first() is None
+
+    def test_rolls_back_on_error(self, commits):
+        """Nothing is written if the block raises."""
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                User.create(username="foo", email="foo@bar.com")
+                raise RuntimeError
+        assert commits == []
+        assert User.query.filter_by(username="foo").first() is None
+
+    def test_request_scoped(self, app, testapp, commits):
+        """With DB_UNIT_OF_WORK each request commits once, and only if it succeeded."""
+        app.config["DB_UNIT_OF_WORK"] = True
+        password = "uowpass"
+        user = User.create(username="uow", email="uow@example.com", password=password)
+        testapp.authorization = ('Basic', (user.username, password))
+        del commits[:]
+
+        testapp.put_json(f"/api/v0/users/{user.username}", {'first_name': "Changed"})
+        assert len(commits) == 1
+        assert not in_unit_of_work()
+
+        posts = [{"title": "ok", "content": "ok", "active": True}, {"title": 1}]
+        testapp.post_json(f"/api/v0/users/{user.username}/posts/bulk", posts, status=400)
+        assert len(commits) == 1
+        assert not in_unit_of_work()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Password hashing executor tests."""
+import threading
+
+import pytest
+
+from flask_blog_api.extensions import bcrypt
+from flask_blog_api.hashing import PasswordHasher
+
+
+class RecordingBcrypt:
+    """Wraps Flask-Bcrypt and records which thread did the hashing."""
+
+    def __init__(self):
+        """Create instance."""
+        self.threads = []
+
+    def generate_password_hash(self, password):
+        """Hash and record the current thread."""
+        self.threads.append(threading.current_thread())
+        return bcrypt.generate_password_hash(password)
+
+    def check_password_hash(self, pw_hash, password):
+        """Check and record the current thread."""
+        self.threads.append(threading.current_thread())
+        return bcrypt.check_password_hash(pw_hash, password)
+
+
+class TestPasswordHasher:
+    """Password hasher tests."""
+
+    @pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+    def test_hash_and_check(self, app, mode):
+        """Every executor produces hashes that verify."""
+        app.config["BCRYPT_EXECUTOR"] = mode
+        hasher = PasswordHasher(bcrypt, app)
+        try:
+            pw_hash = hasher.generate_password_hash("secret")
+            assert hasher.check_password_hash(pw_hash, "secret") is True
+            assert hasher.check_password_hash(pw_hash, "wrong") is False
+        finally:
+            hasher.shutdown()
+
+    def test_thread_executor_hashes_off_the_caller(self, app):
+        """The thread executor does not hash on the calling thread."""
+        app.config["BCRYPT_EXECUTOR"] = "thread"
+        recorder = RecordingBcrypt()
+        hasher = PasswordHasher(recorder, app)
+        try:
+            hasher.generate_password_hash("secret")
+        finally:
+            hasher.shutdown()
+        assert recorder.threads
+        assert threading.current_thread() not in recorder.threads
+
+    def test_unknown_executor(self, app):
+        """Misconfiguration is reported at startup."""
+        app.config["BCRYPT_EXECUTOR"] = "fibers"
+        with pytest.raises(ValueError):
+            PasswordHasher(bcrypt, app)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Load test harness tests."""
+import json
+
+import pytest
+
+from flask_blog_api.commands import loadtest
+from flask_blog_api.loadtest import parse_mix, seed, summarize
+
+
+class TestLoadTest:
+    """Load test harness tests."""
+
+    def test_parse_mix(self):
+        """Mixes are name=weight lists of known scenarios."""
+        assert parse_mix("get_post=3, search=1") == {"get_post": 3.0, "search": 1.0}
+        for value in ("nope=1", "get_post=x", "get_post=-1", "get_post=0", ""):
+            with pytest.raises(ValueError):
+                parse_mix(value)
+
+    def test_summarize(self):
+        """Summaries count errors and report throughput and percentiles."""
+        summary = summarize([i / 1000 for i in range(1, 101)], errors=2, seconds=10)
+        assert summary["requests"] == 102
+        assert summary["rps"] == 10
+        assert summary["p50_ms"] == pytest.approx(50)
+        assert summary["p99_ms"] == pytest.approx(99)
+        assert summarize([], errors=1, seconds=1)["p95_ms"] is None
+
+    def test_seed_refuses_used_databases(self, app, tmpdir):
+        """Seeding never touches a database that already has tables."""
+        url = f"sqlite:///{tmpdir.join('load.db')}"
+        assert seed(url, users=2, posts=5, clients=1) == 5
+        with pytest.raises(ValueError):
+            seed(url, users=2, posts=5, clients=1)
+
+    def test_command(self, app):
+        """The command serves the app under gunicorn and reports every endpoint of the mix."""
+        pytest.importorskip("gunicorn")
+        pytest.importorskip("gevent")
+        result = app.test_cli_runner().invoke(loadtest, [
+            "-w", "1", "-c", "2", "-d", "1", "--warmup", "0.5", "--users", "3", "--posts", "20",
+            "--mix", "get_post=1,create_post=1,token_read=1", "--json",
+        ])
+        assert result.exit_code == 0, result.output
+        run = json.loads(result.output)
+        assert (run["workers"], run["concurrency"]) == (1, 2)
+        assert run["total"]["errors"] == 0
+        assert set(run["endpoints"]) == {
+            "GET /users/<username>/posts/<id>",
+            "POST /users/<username>/posts",
+            "GET /users/<username> (bearer)",
+        }
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Request metrics tests."""
+import ipaddress
+import os
+import subprocess
+import sys
+
+import pytest
+from flask import g
+from prometheus_client import REGISTRY
+from sqlalchemy.exc import OperationalError
+
+from flask_blog_api.metrics import RequestStats
+from flask_blog_api.user.models import User
+
+WORKER = """
+from flask_blog_api.app import create_app
+client = create_app("tests.settings").test_client()
+for _ in range({requests}):
+    client.get("/missing")
+if {export}:
+    print(client.get("/metrics").get_data(as_text=True))
+"""
+
+
+def sample(name, **labels):
+    """Return the current value of a sample of the default registry, or 0."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def run_worker(tmpdir, requests, export=False):
+    """Serve ``requests`` requests in a new process sharing the multiprocess directory."""
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmpdir))
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER.format(requests=requests, export=export)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    return result.stdout
+
+
+@pytest.mark.usefixtures("db")
+class TestMetrics:
+    """Request metrics tests."""
+
+    def test_request_metrics(self, testapp):
+        """Latency, SQL, bcrypt time and response size are recorded per endpoint and method."""
+        labels = {'endpoint': "users", 'method': "GET"}
+        before = {
+            'requests': sample("http_request_duration_seconds_count", status="200", **labels),
+            'statements': sample("http_request_sql_statements_sum", **labels),
+            'bytes': sample("http_response_size_bytes_sum", **labels),
+            'bcrypt': sample("http_request_bcrypt_seconds_total", **labels),
+        }
+        user = User.create(username="metered", email="metered@example.com", password="meterpass")
+        testapp.authorization = ('Basic', (user.username, "meterpass"))
+        response = testapp.get("/api/v0/users")
+
+        assert sample("http_request_duration_seconds_count", status="200", **labels) == before['requests'] + 1
+        assert sample("http_request_sql_statements_sum", **labels) > before['statements']
+        assert sample("http_response_size_bytes_sum", **labels) == before['bytes'] + len(response.body)
+        assert sample("http_request_bcrypt_seconds_total", **labels) > before['bcrypt']
+
+    def test_metrics_endpoint(self, testapp):
+        """The metrics are served in the Prometheus text format."""
+        testapp.get("/missing", status=404)
+        response = testapp.get("/metrics", extra_environ={'REMOTE_ADDR': "127.0.0.1"})
+        assert response.content_type == "text/plain"
+        assert 'http_request_duration_seconds_count{endpoint="unmatched",method="GET",status="404"}' in response.text
+
+    def test_metrics_endpoint_is_restricted(self, app, testapp):
+        """Clients outside METRICS_ALLOWED_NETWORKS get a 404."""
+        testapp.get("/metrics", extra_environ={'REMOTE_ADDR': "203.0.113.5"}, status=404)
+        testapp.get("/metrics", status=404)
+        app.extensions["metrics"].allowed_networks = [ipaddress.ip_network("203.0.113.0/24")]
+        testapp.get("/metrics", extra_environ={'REMOTE_ADDR': "203.0.113.5"}, status=200)
+
+    def test_failed_statements_are_not_timed(self, db):
+        """A statement that raises does not leave its start time on the connection."""
+        g.request_stats = RequestStats()
+        try:
+            connection = db.session.connection()
+            with pytest.raises(OperationalError):
+                connection.execute("SELECT * FROM no_such_table")
+            assert connection.info.get("query_started") == []
+        finally:
+            g.pop("request_stats")
+            db.session.rollback()
+
+    def test_multiprocess_aggregation(self, tmpdir):
+        """Samples from every worker process are aggregated by whichever one is scraped."""
+        run_worker(tmpdir, 3)
+        run_worker(tmpdir, 2)
+        text = run_worker(tmpdir, 0, export=True)
+        assert 'http_request_duration_seconds_count{endpoint="unmatched",method="GET",status="404"} 5.0' in text
@@ -4,7 +4,7 @@ import datetime as dt
 
 import pytest
 
-from flask_blog_api.user.models import Role, User
+from flask_blog_api.user.models import Post, Role, User
 
 from .factories import UserFactory
 
@@ -64,3 +64,31 @@ class TestUser:
         user.roles.append(role)
         user.save()
         assert role in user.roles
+
+
+@pytest.mark.usefixtures("db")
+class TestPost:
+    """Post tests."""
+
+    def test_foreign_keys_are_indexed(self, db):
+        """Every reference to users is covered by an index that leads with it."""
+        for table in (Post.__table__, Role.__table__):
+            assert any(
+                list(index.columns)[0].name == "user_id" for index in table.indexes
+            ), table.name
+
+    def test_listing_uses_the_author_index(self, db):
+        """The posts listing seeks the composite index instead of scanning the table."""
+        user = UserFactory()
+        user.save()
+        query = (
+            Post.query.filter_by(user_id=user.id)
+            .order_by(Post.created_at, Post.id)
+            .limit(50)
+        )
+        statement = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        plan = " ".join(
+            row[-1] for row in db.session.execute(f"EXPLAIN QUERY PLAN {statement}")
+        )
+        assert "ix_posts_user_id_created_at_id" in plan
+        assert "TEMP B-TREE" not in plan
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Database pool tests."""
+import threading
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from flask_blog_api.app import create_app
+from flask_blog_api.extensions import database_pool, db
+from flask_blog_api.pool import DatabasePool
+
+from . import settings
+
+
+def sample(name):
+    """Return the current value of an unlabelled sample of the default registry, or 0."""
+    return REGISTRY.get_sample_value(name, {}) or 0
+
+
+def make_app(**overrides):
+    """Create an app from the test settings with ``overrides`` applied."""
+    config = {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+    config.update(overrides)
+    return create_app(type("PoolConfig", (), config))
+
+
+@pytest.fixture
+def slow_app(tmp_path):
+    """App on a SQLite file with a single pooled connection and a ``sleep(ms)`` SQL function."""
+    app = make_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'slow.db'}",
+        DB_POOL_SIZE=1,
+        DB_MAX_OVERFLOW=0,
+        DB_POOL_TIMEOUT=5,
+    )
+    with app.app_context():
+        engine = db.engine
+
+        @event.listens_for(engine, "connect")
+        def add_sleep(dbapi_connection, connection_record):
+            dbapi_connection.create_function("sleep", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+        yield app
+        engine.dispose()
+
+
+def run_slow_queries(app, count, ms):
+    """Run ``count`` concurrent ``sleep(ms)`` queries, collecting pool timeouts."""
+    errors = []
+
+    def query():
+        with app.app_context():
+            try:
+                with db.engine.connect() as connection:
+                    connection.execute(f"SELECT sleep({ms})")
+            except PoolTimeoutError as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=query) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class TestDatabasePool:
+    """Database pool tests."""
+
+    def test_engine_options(self, tmp_path):
+        """Pool settings end up on the engine; explicit engine options win."""
+        app = make_app(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'pool.db'}",
+            DB_POOL_SIZE=3,
+            DB_MAX_OVERFLOW=2,
+            DB_POOL_RECYCLE=60,
+            DB_POOL_PRE_PING=True,
+            SQLALCHEMY_ENGINE_OPTIONS={"pool_timeout": 7},
+        )
+        with app.app_context():
+            pool = db.engine.pool
+            assert isinstance(pool, database_pool.pool_class)
+            assert pool.size() == 3
+            assert pool._max_overflow == 2
+            assert pool._timeout == 7
+            assert pool._recycle == 60
+            assert pool._pre_ping is True
+            db.engine.dispose()
+
+    def test_in_memory_sqlite_keeps_its_pool(self):
+        """In-memory SQLite stays on a single shared connection."""
+        app = make_app(DB_POOL_SIZE=3)
+        with app.app_context():
+            assert not isinstance(db.engine.pool, database_pool.pool_class)
+
+    def test_invalid_mode(self, app):
+        """Unknown cooperative modes are rejected."""
+        app.config["DB_COOPERATIVE"] = "sometimes"
+        with pytest.raises(ValueError):
+            DatabasePool(app)
+
+    def test_not_cooperative_without_postgres(self, app):
+        """The psycopg2 wait callback is only installed for PostgreSQL."""
+        app.config["DB_COOPERATIVE"] = "true"
+        assert DatabasePool(app).cooperative is False
+
+    def test_checkout_wait_is_recorded(self, slow_app):
+        """Requests queueing behind a slow query show up as checkout wait."""
+        checkouts = sample("db_pool_checkout_wait_seconds_count")
+        waited = sample("db_pool_checkout_wait_seconds_sum")
+        assert run_slow_queries(slow_app, 3, 100) == []
+        stats = database_pool.stats()
+        assert stats["checkouts"] == 3
+        assert stats["timeouts"] == 0
+        # The last query waited for the two before it
+        assert stats["wait_seconds_max"] >= 0.15
+        assert stats["wait_seconds_total"] >= 0.25
+        assert sample("db_pool_checkout_wait_seconds_count") == checkouts + 3
+        assert sample("db_pool_checkout_wait_seconds_sum") - waited >= 0.25
+
+    def test_checkout_timeouts_are_recorded(self, slow_app):
+        """Checkouts that give up are counted."""
+        timeouts = sample("db_pool_checkout_timeouts_total")
+        db.engine.pool._timeout = 0.05
+        errors = run_slow_queries(slow_app, 2, 300)
+        assert len(errors) == 1
+        assert database_pool.stats()["timeouts"] == 1
+        assert sample("db_pool_checkout_timeouts_total") == timeouts + 1
+
+
+class TestCooperativeWaitCallback:
+    """psycopg2 wait callback tests."""
+
+    def test_polls_until_ready(self):
+        """The callback waits on the socket until the connection is ready."""
+        extensions = pytest.importorskip("psycopg2.extensions")
+        pytest.importorskip("gevent")
+        import socket
+
+        from flask_blog_api.pool import gevent_wait_callback
+
+        left, right = socket.socketpair()
+        right.send(b"x")
+
+        class Connection:
+            states = [extensions.POLL_WRITE, extensions.POLL_READ, extensions.POLL_OK]
+
+            def poll(self):
+                return self.states.pop(0)
+
+            def fileno(self):
+                return left.fileno()
+
+        connection = Connection()
+        gevent_wait_callback(connection, timeout=1)
+        assert connection.states == []
+        left.close()
+        right.close()
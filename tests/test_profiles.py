@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""App profile and cold-start tests."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from flask_blog_api.app import create_app
+from flask_blog_api.importtime import by_package, parse
+from flask_blog_api.lazy import LazyExtension
+
+from . import settings
+
+#: Packages only the HTML site and the development tools need
+SITE_PACKAGES = ["flask_migrate", "alembic", "flask_wtf", "wtforms", "flask_debugtoolbar", "flask_static_digest"]
+
+IMPORTS = """
+import json, sys
+from flask_blog_api.app import create_app
+from tests import settings
+config = {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+create_app(type("ProfileConfig", (), dict(config, APP_PROFILE="api")))
+print(json.dumps(sorted(sys.modules)))
+"""
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+
+
+def make_app(**overrides):
+    """Create an app from the test settings with ``overrides``."""
+    config = {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+    config.update(overrides)
+    return create_app(type("ProfileConfig", (), config))
+
+
+class TestProfiles:
+    """App profile tests."""
+
+    def test_api_profile_serves_only_the_api(self):
+        """The API profile has no HTML routes and answers errors in JSON."""
+        app = make_app(APP_PROFILE="api")
+        endpoints = {rule.endpoint for rule in app.url_map.iter_rules()}
+        assert "users" in endpoints
+        assert not any(endpoint.startswith(("public.", "user.")) for endpoint in endpoints)
+        assert "migrate" not in app.extensions
+
+        response = app.test_client().get("/missing")
+        assert response.status_code == 404
+        assert response.json["status"] == 404
+
+    def test_unknown_profile(self):
+        """Unknown profiles are rejected."""
+        with pytest.raises(ValueError):
+            make_app(APP_PROFILE="web")
+
+    def test_api_profile_skips_site_imports(self):
+        """API workers never import the site-only extensions."""
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORTS], cwd=ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+        )
+        modules = set(json.loads(result.stdout))
+        assert "flask_sqlalchemy" in modules
+        assert not modules.intersection(SITE_PACKAGES)
+
+    def test_lazy_extension(self):
+        """Lazy extensions are created on first use."""
+        extension = LazyExtension("collections:OrderedDict", [("a", 1)])
+        assert not extension.loaded
+        assert extension.get("a") == 1
+        assert extension.loaded
+
+    def test_parse_importtime(self):
+        """``-X importtime`` reports are summed per package."""
+        report = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |   alembic.util",
+            "import time:        50 |        150 | alembic",
+            "import time:        30 |         30 | json",
+        ])
+        modules = parse(report)
+        assert modules[0] == ("alembic.util", 100, 100)
+        assert by_package(modules) == [("alembic", 150), ("json", 30)]
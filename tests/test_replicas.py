@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Read-replica routing tests.
+
+The primary and the replica are two SQLite files; the replica is never
+written by replication, so a read shows which database served it.
+"""
+import pytest
+from sqlalchemy import create_engine
+
+from flask_blog_api.app import create_app
+from flask_blog_api.extensions import db, replica_router, response_cache
+from flask_blog_api.user.models import Post, User
+
+from . import settings
+
+PASSWORD = "replicapass"
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    """App with a primary and one replica holding the same user but different posts."""
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    config = {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+    config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{primary}",
+        SQLALCHEMY_REPLICA_URIS=[f"sqlite:///{replica}"],
+        DB_REPLICA_STICKY_SECONDS=5,
+    )
+    app = create_app(type("ReplicaConfig", (), config))
+    ctx = app.test_request_context()
+    ctx.push()
+    db.create_all()
+    user = User.create(username="replicated", email="replicated@example.com", password=PASSWORD)
+    reader = User.create(username="reader", email="reader@example.com", password=PASSWORD)
+    Post.create(user=user, title="on the primary", content="content")
+    # Seed the replica as a snapshot of the primary taken before the post
+    engine = create_engine(f"sqlite:///{replica}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {column.name: getattr(row, column.key) for column in User.__table__.columns}
+            for row in (user, reader)
+        ])
+    engine.dispose()
+
+    yield app
+
+    db.session.remove()
+    ctx.pop()
+
+
+@pytest.fixture
+def client(replicated):
+    """Authenticated Webtest client for the replicated app."""
+    from webtest import TestApp
+
+    testapp = TestApp(replicated)
+    testapp.authorization = ('Basic', ("replicated", PASSWORD))
+    return testapp
+
+
+class TestReplicaRouting:
+    """Read-replica routing tests."""
+
+    def test_binds(self, replicated):
+        """Replica URIs are registered as binds that hold no tables."""
+        assert replica_router.replica_binds() == ["replica0"]
+        assert str(db.get_engine(replicated, bind="replica0").url).endswith("replica.db")
+
+    def test_gets_read_from_the_replica(self, client):
+        """GET handlers read from the replica."""
+        response = client.get("/api/v0/users/replicated/posts")
+        assert response.json['posts'] == []
+
+    def test_writes_go_to_the_primary(self, client):
+        """Writes go to the primary, and the writer reads its own writes."""
+        client.post_json(
+            "/api/v0/users/replicated/posts",
+            {'title': "new", 'content': "content", 'active': True},
+        )
+        assert Post.query.filter_by(title="new").count() == 1
+        response = client.get("/api/v0/users/replicated/posts")
+        assert [p['title'] for p in response.json['posts']] == ["on the primary", "new"]
+
+    def test_cached_replica_reads_are_not_served_to_the_writer(self, replicated, client):
+        """A listing cached from the replica after a write is not served to the sticky writer."""
+        from webtest import TestApp
+
+        reader = TestApp(replicated)
+        reader.authorization = ('Basic', ("reader", PASSWORD))
+        client.post_json(
+            "/api/v0/users/replicated/posts",
+            {'title': "new", 'content': "content", 'active': True},
+        )
+        assert reader.get("/api/v0/users/replicated/posts").json['posts'] == []
+        response = client.get("/api/v0/users/replicated/posts")
+        assert [p['title'] for p in response.json['posts']] == ["on the primary", "new"]
+        assert reader.get("/api/v0/users/replicated/posts").json['posts'] == []
+        assert response_cache.stats()['posts']['hits'] == 1
+
+    def test_stickiness_expires(self, replicated, client):
+        """Outside the sticky window reads go back to the replica."""
+        replicated.config["DB_REPLICA_STICKY_SECONDS"] = 0
+        client.post_json(
+            "/api/v0/users/replicated/posts",
+            {'title': "new", 'content': "content", 'active': True},
+        )
+        response = client.get("/api/v0/users/replicated/posts")
+        assert response.json['posts'] == []
+
+    def test_stickiness_needs_a_shared_backend(self):
+        """Replicas with a sticky window are refused with a per-process cache in a multi-process app."""
+        from flask import Flask
+
+        from flask_blog_api.replicas import ReplicaRouter
+
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_REPLICA_URIS=["sqlite://"], CACHE_TYPE="simple")
+        with pytest.raises(ValueError):
+            ReplicaRouter(db, None, app)
+        app.config.update(DB_REPLICA_STICKY_SECONDS=0)
+        ReplicaRouter(db, None, app)
+
+    def test_flushes_use_the_primary_inside_replica_reads(self, replicated):
+        """Writes issued while routed to a replica still reach the primary."""
+        with replica_router.use_replica():
+            assert replica_router.current_replica() == "replica0"
+            assert Post.query.count() == 0
+            user = User.query.filter_by(username="replicated").one()
+            user.update(first_name="Changed")
+        assert replica_router.current_replica() is None
+        assert User.query.filter_by(first_name="Changed").count() == 1
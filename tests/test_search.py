@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Full-text search tests."""
+import pytest
+from flask import Flask
+
+from flask_blog_api import search
+from flask_blog_api.commands import rebuild_search_index
+from flask_blog_api.extensions import db as _db
+from flask_blog_api.user.models import Post, User
+
+PASSWORD = "searchpass"
+
+
+@pytest.fixture
+def author(db, testapp):
+    """Create an authenticated author for the search tests."""
+    user = User.create(username="searcher", email="searcher@example.com", password=PASSWORD,
+                       first_name="Sea", last_name="Rcher")
+    testapp.authorization = ('Basic', (user.username, PASSWORD))
+    return user
+
+
+def titles(testapp, q, **params):
+    """Return the titles of the search results for ``q``, best first."""
+    response = testapp.get("/api/v0/posts/search", dict(params, q=q))
+    return [result['post']['title'] for result in response.json['results']]
+
+
+@pytest.mark.usefixtures("db")
+class TestSearch:
+    """Full-text search tests."""
+
+    def test_ranked_results_with_snippets(self, testapp, author):
+        """Title matches outrank content matches, and results carry snippets."""
+        Post.create(user=author, title="Gardening", content="Notes about tomatoes and basil")
+        Post.create(user=author, title="Tomatoes", content="Growing them in pots")
+        Post.create(user=author, title="Unrelated", content="Nothing to see here")
+
+        response = testapp.get("/api/v0/posts/search", {'q': "tomatoes"})
+        results = response.json['results']
+        assert [r['post']['title'] for r in results] == ["Tomatoes", "Gardening"]
+        assert results[0]['rank'] > results[1]['rank']
+        assert results[0]['post']['user'] == author.full_name
+        assert "<mark>tomatoes</mark>" in results[1]['snippet']
+        assert response.json['next'] is None
+
+        response = testapp.get("/api/v0/posts/search", {'q': "tomatoes", 'fields': "id,title"})
+        assert set(response.json['results'][0]['post']) == {'id', 'title'}
+
+    def test_stemming_and_prefixes(self, testapp, author):
+        """Words match their stems, and the last word matches as a prefix."""
+        Post.create(user=author, title="Running", content="I ran and ran")
+        Post.create(user=author, title="Databases", content="Keep indexes small")
+        assert titles(testapp, "runs") == ["Running"]
+        assert titles(testapp, "small datab") == ["Databases"]
+
+    def test_pagination(self, testapp, author):
+        """Results are paginated with cursors."""
+        for i in range(5):
+            Post.create(user=author, title=f"Post {i}", content="shared words")
+        seen, after = [], None
+        while True:
+            params = {'q': "shared", 'limit': 2}
+            if after:
+                params['after'] = after
+            response = testapp.get("/api/v0/posts/search", params)
+            seen.extend(r['post']['title'] for r in response.json['results'])
+            after = response.json['next']
+            if after is None:
+                break
+        assert sorted(seen) == [f"Post {i}" for i in range(5)]
+
+    def test_index_follows_writes(self, testapp, author):
+        """CRUD, bulk and single-statement writes keep the index in sync."""
+        post = Post.create(user=author, title="Original", content="first draft")
+        assert titles(testapp, "draft") == ["Original"]
+
+        post.update(content="final version")
+        assert titles(testapp, "draft") == []
+        assert titles(testapp, "final") == ["Original"]
+
+        testapp.put_json(f"/api/v0/users/{author.username}/posts/{post.id}", {'title': "Renamed"})
+        assert titles(testapp, "final") == ["Renamed"]
+
+        testapp.post_json(f"/api/v0/users/{author.username}/posts/bulk", [
+            {'title': "Bulk", 'content': "final answer", 'active': True},
+        ])
+        assert sorted(titles(testapp, "final")) == ["Bulk", "Renamed"]
+
+        testapp.delete(f"/api/v0/users/{author.username}/posts/{post.id}")
+        assert titles(testapp, "final") == ["Bulk"]
+        Post.query.filter_by(title="Bulk").one().delete()
+        assert titles(testapp, "final") == []
+
+    def test_query_syntax_is_not_interpreted(self, testapp, author):
+        """Operators and quotes in the query are treated as plain words."""
+        Post.create(user=author, title="Quotes", content='say "hello" OR NOT')
+        assert titles(testapp, '"hello') == ["Quotes"]
+        assert titles(testapp, "hello NOT") == ["Quotes"]
+        testapp.get("/api/v0/posts/search", {'q': "  *  "}, status=400)
+        testapp.get("/api/v0/posts/search", status=400)
+        testapp.get("/api/v0/posts/search", {'q': "hello", 'after': "bogus"}, status=400)
+
+    def test_rebuild_command(self, app, author):
+        """The CLI command rebuilds the index from the posts table."""
+        Post.create(user=author, title="Lost", content="forgotten words")
+        _db.session.execute("INSERT INTO posts_fts (posts_fts) VALUES ('delete-all')")
+        _db.session.commit()
+        from flask_blog_api.search import search
+        assert search("forgotten", 10) == []
+
+        result = app.test_cli_runner().invoke(rebuild_search_index)
+        assert result.exit_code == 0, result.output
+        assert [hit.id for hit in search("forgotten", 10)] == [Post.query.one().id]
+
+    def test_unsupported_dialects(self, app, testapp, author):
+        """Other databases get a 501 from the endpoint and a RuntimeError from the helpers."""
+        other = Flask(__name__)
+        other.config["SQLALCHEMY_DATABASE_URI"] = "mysql://user@localhost/blog"
+        search.init_app(other)
+        assert other.config["SEARCH_ENABLED"] is False
+
+        app.config["SEARCH_ENABLED"] = False
+        response = testapp.get("/api/v0/posts/search", {'q': "hello"}, status=501)
+        assert "not supported" in response.json['message']
+        with pytest.raises(RuntimeError):
+            search.check_dialect("mysql")
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""JSON encoder tests."""
+import json
+
+import pytest
+
+from flask_blog_api.extensions import json_encoder
+from flask_blog_api.serialization import BACKENDS, Fragment, JSONEncoder
+from flask_blog_api.user.models import Post, User
+
+
+class TestJSONEncoder:
+    """JSON encoder tests."""
+
+    @pytest.mark.parametrize("backend", sorted(BACKENDS))
+    def test_backends_encode_alike(self, app, backend):
+        """Every backend produces the same document."""
+        app.config["API_JSON_BACKEND"] = backend
+        encoder = JSONEncoder(app)
+        data = {"users": [{"name": "é", "n": 1}], "next": None, "ok": True}
+        assert json.loads(encoder.dumps(data)) == data
+
+    def test_unknown_backend(self, app):
+        """An unknown backend is a configuration error."""
+        app.config["API_JSON_BACKEND"] = "yaml"
+        with pytest.raises(ValueError):
+            JSONEncoder(app)
+
+    def test_fragments_are_spliced(self, app):
+        """Fragments are copied into the document verbatim."""
+        rows = [Fragment(b'{"a":1}'), Fragment(b'{"a":2}')]
+        encoded = json_encoder.dumps({"rows": rows, "next": "abc"})
+        assert json.loads(encoded) == {"rows": [{"a": 1}, {"a": 2}], "next": "abc"}
+        assert json_encoder.dumps(rows[0]) == b'{"a":1}'
+        assert json.loads(json_encoder.dumps({"rows": [], "next": None})) == {"rows": [], "next": None}
+
+
+@pytest.mark.usefixtures("db")
+class TestFragmentCache:
+    """Per-row fragment cache tests."""
+
+    def test_fragment_matches_as_dict(self):
+        """A fragment decodes to the row's ``as_dict``."""
+        user = User.create(username="frag", email="frag@example.com", first_name="A", last_name="B")
+        post = Post.create(user=user, title="title", content="content")
+        assert json.loads(json_encoder.fragment(user)) == user.as_dict()
+        assert json.loads(json_encoder.fragment(post)) == post.as_dict()
+
+    def test_fragments_are_cached_until_the_row_changes(self):
+        """Repeated encodes hit the cache; updates produce a fresh fragment."""
+        user = User.create(username="frag", email="frag@example.com")
+        first = json_encoder.fragment(user)
+        assert json_encoder.fragment(user) is first
+        assert json_encoder.stats()["hits"] == 1
+
+        user.update(email="changed@example.com")
+        assert json.loads(json_encoder.fragment(user))["email"] == "changed@example.com"
+
+    def test_post_fragments_follow_the_author(self):
+        """Renaming the author re-encodes the author's posts."""
+        user = User.create(username="frag", email="frag@example.com", first_name="Old", last_name="Name")
+        post = Post.create(user=user, title="title", content="content")
+        assert json.loads(json_encoder.fragment(post))["user"] == "Old Name"
+        user.update(first_name="New")
+        assert json.loads(json_encoder.fragment(post))["user"] == "New Name"
+
+    def test_api_lists_use_fragments(self, testapp):
+        """List responses are assembled from fragments and decode to ``as_dict``."""
+        password = "fragpass"
+        user = User.create(username="frag", email="frag@example.com", password=password)
+        posts = [Post.create(user=user, title=f"t{i}", content="c") for i in range(3)]
+        testapp.authorization = ('Basic', (user.username, password))
+
+        response = testapp.get(f"/api/v0/users/{user.username}/posts")
+        assert response.content_type == "application/json"
+        assert response.json == {'posts': [post.as_dict() for post in posts], 'next': None}
+        assert json_encoder.stats()["size"] >= 3